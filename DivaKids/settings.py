@@ -64,12 +64,63 @@ WSGI_APPLICATION = 'DivaKids.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default) or postgresql. For PostgreSQL, DB_POOL=1 enables psycopg's
+# connection pool (requires psycopg[pool]); otherwise connections are reused via CONN_MAX_AGE.
+# Setting DB_REPLICA_HOST adds a read-only "replica" alias used by shop.db_routing.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+
+if DB_ENGINE == 'postgresql':
+    DB_POOL = os.environ.get('DB_POOL', '') in ('1', 'true', 'yes')
+    DB_PRIMARY = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'divakids'),
+        'USER': os.environ.get('DB_USER', 'divakids'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # The pool manages connection lifetime itself and requires CONN_MAX_AGE=0.
+        'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            },
+        } if DB_POOL else {},
+    }
+    DATABASES = {'default': DB_PRIMARY}
+    if os.environ.get('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DB_PRIMARY,
+            'HOST': os.environ['DB_REPLICA_HOST'],
+            'PORT': os.environ.get('DB_REPLICA_PORT', DB_PRIMARY['PORT']),
+            'USER': os.environ.get('DB_REPLICA_USER', DB_PRIMARY['USER']),
+            'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DB_PRIMARY['PASSWORD']),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # WAL lets readers work while a write is in progress; writers wait for the
+                # lock up to `timeout` seconds instead of failing with "database is locked".
+                'init_command': 'PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL',
+                'timeout': int(os.environ.get('DB_TIMEOUT', '20')),
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
-}
+
+DATABASE_ROUTERS = ['shop.db_routing.PrimaryReplicaRouter']
+
+# Seconds a user's reads stay on the primary after checkout (read-your-writes while the replica catches up).
+DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', '10'))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -100,6 +151,37 @@ USE_I18N = True
 
 USE_TZ = True
 
+# REST API (shop.api). Cart and checkout calls are authenticated by the Telegram Web App initData
+# ("Authorization: tma <initData>"), so there is no session authentication (and no CSRF check).
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': ['shop.webapp_auth.TelegramWebAppAuthentication'],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'UNAUTHENTICATED_USER': None,
+}
+# initData older than this (seconds) is rejected.
+WEBAPP_INIT_DATA_MAX_AGE = int(os.environ.get('WEBAPP_INIT_DATA_MAX_AGE', str(60 * 60 * 24)))
+
+# Caches. Carts (shop.cart) live in their own cache and are written behind to the Cart table.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'carts': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CART_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'carts')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+CART_CACHE_ALIAS = 'carts'
+CART_FLUSH_INTERVAL = float(os.environ.get('CART_FLUSH_INTERVAL', '5'))
+# Read-your-writes pins must be visible to both the web and the bot processes, so they use the file cache.
+DB_REPLICA_PIN_CACHE_ALIAS = 'carts'
+# The catalog page is the same for everyone: a shared proxy may serve it for this many seconds.
+CATALOG_HTTP_MAX_AGE = int(os.environ.get('CATALOG_HTTP_MAX_AGE', '60'))
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
@@ -110,6 +192,42 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# collectstatic adds content hashes to file names and writes .gz (and .br, if brotli is installed) copies.
+# Third-party CSS/JS is vendored into shop/static by `manage.py vendor_static`.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'shop.static_files.CompressedManifestStaticFilesStorage'},
+}
+
+# Static and media files are served by the app (shop.static_files). Hashed static files are cached for a year;
+# these are the browser cache lifetimes, in seconds, for unhashed static files and for uploaded media.
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', str(60 * 60)))
+MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', str(60 * 60 * 24 * 30)))
+
+# Telegram bot
+
+TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '7534268318:AAERP3Kbu5NS4K0MnoiFRzLcsDyIRzGYOJk')
+
+# Webhook mode: the bot runs inside the ASGI app (DivaKids/asgi.py) instead of `python shop/divakidsbot.py`.
+TELEGRAM_WEBHOOK_ENABLED = os.environ.get('TELEGRAM_WEBHOOK_ENABLED', '') == '1'
+TELEGRAM_WEBHOOK_PATH = os.environ.get('TELEGRAM_WEBHOOK_PATH', '/telegram/webhook/')
+TELEGRAM_WEBHOOK_URL = os.environ.get('TELEGRAM_WEBHOOK_URL', '')
+TELEGRAM_WEBHOOK_SECRET = os.environ.get('TELEGRAM_WEBHOOK_SECRET', '')
+
+# Telegram delivery limits used by outbox and broadcast senders (messages per second).
+TELEGRAM_GLOBAL_RATE = float(os.environ.get('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_PER_CHAT_RATE = float(os.environ.get('TELEGRAM_PER_CHAT_RATE', '1'))
+
+# How many updates the bot handles at once; updates of one user are always handled in order.
+BOT_CONCURRENT_UPDATES = int(os.environ.get('BOT_CONCURRENT_UPDATES', '16'))
+
+# Size of the bot's ORM thread pool (shop.bot_repository); each thread keeps a persistent DB connection.
+BOT_DB_THREADS = int(os.environ.get('BOT_DB_THREADS', '4'))
+
+# Background jobs (shop.jobs). With JOBS_EAGER jobs run right after commit instead of in `manage.py run_jobs`.
+
+JOBS_EAGER = os.environ.get('JOBS_EAGER', '') == '1'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -1,13 +1,18 @@
+import re
+
 from DivaKids import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from shop.static_files import media_view, static_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('shop/', include('shop.urls')),
+    path('api/v1/', include('shop.api')),
 
+    # Статика и фото товаров отдаются приложением с долгим сроком кэширования.
+    # При DEBUG статику из папок приложений раздаёт runserver.
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.STATIC_URL.lstrip('/')), static_view),
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), media_view),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
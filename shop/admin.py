@@ -1,7 +1,50 @@
+from datetime import date, timedelta
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.http import urlencode
 from django.utils.safestring import mark_safe
-from django.utils.timezone import now
-from shop.models import Product, ProductImage, Order, OrderItem, UserProfile, Size
+from django.utils.timezone import localdate, now
+from shop.analytics import sales_report
+from shop.exports import orders_csv_response
+from shop.jobs import enqueue, registered_tasks
+from shop.models import (Product, ProductImage, Order, OrderItem, UserProfile, Size, Job, Notification, Broadcast,
+                         BroadcastDelivery, DailySales)
+from shop.notifications import set_orders_status
+from shop.paginators import EXACT_COUNT_LIMIT, EstimatedCountPaginator, capped_count
+from shop.search import filter_products
+
+
+class LargeTableMixin:
+    """Список без COUNT(*) по всей таблице: оценка числа строк вместо точного подсчёта."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class NumberSearchMixin:
+    """
+    Числовой запрос (ID, Telegram-ID, телефон) ищется точным совпадением
+    по индексированным полям, а не icontains по всем search_fields.
+    """
+    number_search_fields = ()
+    phone_search_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        digits = term.removeprefix('+')
+        if not digits.isdigit() or len(digits) > 18:
+            return super().get_search_results(request, queryset, search_term)
+
+        query = Q()
+        for field in self.phone_search_fields:
+            query |= Q(**{f'{field}__in': [digits, f'+{digits}']})
+        if not term.startswith('+'):
+            for field in self.number_search_fields:
+                query |= Q(**{field: int(digits)})
+        return queryset.filter(query), False
 
 
 @admin.register(Size)
@@ -21,7 +64,7 @@ class ProductImageInline(admin.TabularInline):
     def image_preview(self, obj):
         """Предпросмотр изображения."""
         if obj.image:
-            return mark_safe(f'<img src="{obj.image.url}" width="50" height="50" style="object-fit: cover;" />')
+            return mark_safe(f'<img src="{obj.thumb_url}" width="50" height="50" style="object-fit: cover;" />')
         return "Нет изображения"
 
     image_preview.short_description = "Предпросмотр"
@@ -39,13 +82,23 @@ class ProductAdmin(admin.ModelAdmin):
     filter_horizontal = ('sizes',)
     inlines = [ProductImageInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо icontains по описанию."""
+        if not search_term.strip():
+            return queryset, False
+        return filter_products(queryset, search_term), False
+
 
 class OrderItemInline(admin.TabularInline):
     """Встроенная админ-панель для элементов заказа."""
     model = OrderItem
     extra = 1
-    readonly_fields = ('item_total', 'size_display')
-    fields = ('product', 'size_display', 'quantity', 'item_total')
+    readonly_fields = ('unit_price', 'item_total', 'size_display')
+    fields = ('product', 'size_display', 'quantity', 'unit_price', 'item_total')
+    autocomplete_fields = ('product',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product', 'size')
 
     def size_display(self, obj):
         """Отображает размер продукта, если он есть."""
@@ -54,19 +107,29 @@ class OrderItemInline(admin.TabularInline):
     size_display.short_description = 'Размер'
 
     def item_total(self, obj):
-        """Рассчитывает общую стоимость элемента заказа."""
-        return obj.quantity * obj.product.price if obj.product else 0
+        """Общая стоимость элемента заказа, зафиксированная при оформлении."""
+        return obj.line_total
 
     item_total.short_description = 'Общая стоимость'
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableMixin, NumberSearchMixin, admin.ModelAdmin):
     """Админ-панель для управления заказами."""
 
+    # Вкладки над списком: (название, параметры фильтра в адресе, условие для подсчёта).
+    STATUS_TABS = (
+        ('Новые', {'is_confirmed__exact': '0', 'is_rejected__exact': '0'}, Q(is_confirmed=False, is_rejected=False)),
+        ('Подтверждённые', {'is_confirmed__exact': '1'}, Q(is_confirmed=True)),
+        ('Отклонённые', {'is_rejected__exact': '1'}, Q(is_rejected=True)),
+    )
+
     list_display = ('id', 'user_id', 'name', 'phone_number', 'total_price', 'is_confirmed', 'is_rejected', 'created_at')
     list_filter = ('created_at', 'is_confirmed', 'is_rejected')
-    search_fields = ('user_id', 'name', 'phone_number', 'address')
+    date_hierarchy = 'created_at'
+    search_fields = ('name', 'address')
+    number_search_fields = ('id', 'user_id')
+    phone_search_fields = ('phone_number',)
     ordering = ('-created_at',)
     readonly_fields = ('total_price', 'created_at', 'confirmed_at', 'rejected_at')
     list_editable = ('is_confirmed', 'is_rejected')
@@ -82,38 +145,80 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
     inlines = [OrderItemInline]
-    actions = ['mark_as_confirmed', 'mark_as_rejected']
+    actions = ['mark_as_confirmed', 'mark_as_rejected', 'export_csv']
+
+    def changelist_view(self, request, extra_context=None):
+        """Добавляет вкладки статусов; каждая считается по индексу и не дальше EXACT_COUNT_LIMIT строк."""
+        params = {key: value for key, value in request.GET.items() if key not in ('p', 'is_confirmed__exact',
+                                                                                    'is_rejected__exact')}
+        tabs = []
+        for title, filters, condition in self.STATUS_TABS:
+            count = capped_count(Order.objects.filter(condition))
+            tabs.append({
+                'title': title,
+                'query': '?' + urlencode({**params, **filters}),
+                'count': min(count, EXACT_COUNT_LIMIT),
+                'more': count > EXACT_COUNT_LIMIT,
+                'active': all(request.GET.get(key) == value for key, value in filters.items()),
+            })
+        extra_context = {**(extra_context or {}), 'status_tabs': tabs}
+        return super().changelist_view(request, extra_context)
 
     def save_model(self, request, obj, form, change):
-        """Переопределяет сохранение заказа, чтобы пересчитать общую стоимость и обновить даты."""
+        """Переопределяет сохранение заказа, чтобы обновить даты."""
         if obj.is_confirmed and not obj.confirmed_at:
             obj.confirmed_at = now()
         if obj.is_rejected and not obj.rejected_at:
             obj.rejected_at = now()
         super().save_model(request, obj, form, change)
-        obj.calculate_total_price()
+
+    def save_related(self, request, form, formsets, change):
+        """После сохранения элементов заказа ставит пересчёт общей стоимости в фоновую очередь."""
+        super().save_related(request, form, formsets, change)
+        enqueue('shop.recalculate_order_total', order_id=form.instance.pk)
+
+    def get_urls(self):
+        urls = [
+            path('export/', self.admin_site.admin_view(self.export_view), name='shop_order_export'),
+        ]
+        return urls + super().get_urls()
+
+    def export_view(self, request):
+        """Выгрузка всех заказов, попадающих под текущие фильтры, поиск и период списка."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        changelist = self.get_changelist_instance(request)
+        return orders_csv_response(changelist.get_queryset(request))
+
+    @admin.action(description='Выгрузить выбранные заказы в CSV')
+    def export_csv(self, request, queryset):
+        """Массовое действие: потоковая выгрузка выбранных заказов с их элементами."""
+        return orders_csv_response(queryset)
 
     @admin.action(description='Подтвердить выбранные заказы')
     def mark_as_confirmed(self, request, queryset):
-        """Массовое действие: подтвердить выбранные заказы."""
-        queryset.update(is_confirmed=True, confirmed_at=now())
-        self.message_user(request, 'Выбранные заказы подтверждены.')
+        """Массовое действие: подтвердить выбранные заказы и уведомить покупателей."""
+        count = set_orders_status(queryset, Notification.EVENT_CONFIRMED)
+        self.message_user(request, f'Подтверждено заказов: {count}.')
 
     @admin.action(description='Отклонить выбранные заказы')
     def mark_as_rejected(self, request, queryset):
-        """Массовое действие: отклонить выбранные заказы."""
-        queryset.update(is_rejected=True, rejected_at=now())
-        self.message_user(request, 'Выбранные заказы отклонены.')
+        """Массовое действие: отклонить выбранные заказы и уведомить покупателей."""
+        count = set_orders_status(queryset, Notification.EVENT_REJECTED)
+        self.message_user(request, f'Отклонено заказов: {count}.')
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(LargeTableMixin, NumberSearchMixin, admin.ModelAdmin):
     """Админ-панель для управления элементами заказа."""
 
-    list_display = ('order', 'product', 'quantity', 'size_display', 'item_total')
-    search_fields = ('order__id', 'product__name', 'size__name')
-    list_filter = ('order', 'product', 'size')
-    readonly_fields = ('size_display',)  # Добавил в readonly_fields
+    list_display = ('order', 'product_name', 'quantity', 'size_display', 'unit_price', 'item_total')
+    list_select_related = ('order', 'size')
+    search_fields = ('product_name',)
+    number_search_fields = ('order_id',)
+    list_filter = ('size',)
+    autocomplete_fields = ('order', 'product', 'size')
+    readonly_fields = ('size_display', 'product_name', 'unit_price', 'line_total')  # Добавил в readonly_fields
 
     def size_display(self, obj):
         """Отображает размер продукта, если он есть, иначе показывает 'Без размера'."""
@@ -122,24 +227,37 @@ class OrderItemAdmin(admin.ModelAdmin):
     size_display.short_description = 'Размер'
 
     def item_total(self, obj):
-        """Рассчитывает общую стоимость элемента заказа."""
-        return obj.quantity * obj.product.price
+        """Общая стоимость элемента заказа, зафиксированная при оформлении."""
+        return obj.line_total
 
     item_total.short_description = 'Общая стоимость'
 
     def save_model(self, request, obj, form, change):
-        """Переопределяет сохранение элемента заказа, чтобы пересчитать общую стоимость заказа."""
+        """Переопределяет сохранение элемента заказа, чтобы пересчитать общую стоимость заказа в фоне."""
         super().save_model(request, obj, form, change)
-        obj.order.calculate_total_price()
+        enqueue('shop.recalculate_order_total', order_id=obj.order_id)
+
+    def delete_model(self, request, obj):
+        """После удаления элемента пересчитывает общую стоимость его заказа в фоне."""
+        super().delete_model(request, obj)
+        enqueue('shop.recalculate_order_total', order_id=obj.order_id)
+
+    def delete_queryset(self, request, queryset):
+        """Массовое удаление: пересчитывает общую стоимость каждого затронутого заказа в фоне."""
+        order_ids = set(queryset.values_list('order_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for order_id in sorted(order_ids):
+            enqueue('shop.recalculate_order_total', order_id=order_id)
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(LargeTableMixin, NumberSearchMixin, admin.ModelAdmin):
     """Админ-панель для управления профилями пользователей."""
 
     list_display = ("user_id", "name", "phone_number", "delivery_address")
-    search_fields = ("user_id", "name", "phone_number")
-    list_filter = ("name",)
+    search_fields = ("name",)
+    number_search_fields = ("user_id",)
+    phone_search_fields = ("phone_number",)
     fieldsets = (
         (None, {
             "fields": ("user_id", "name")
@@ -148,3 +266,110 @@ class UserProfileAdmin(admin.ModelAdmin):
             "fields": ("phone_number", "delivery_address"),
         }),
     )
+
+
+class JobNameFilter(admin.SimpleListFilter):
+    """Фильтр по имени задачи из реестра, без SELECT DISTINCT по всей очереди."""
+    title = 'Задача'
+    parameter_name = 'name'
+
+    def lookups(self, request, model_admin):
+        return [(name, name) for name in registered_tasks()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(name=self.value())
+        return queryset
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableMixin, admin.ModelAdmin):
+    """Админ-панель для просмотра фоновых задач."""
+
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'created_at', 'finished_at')
+    list_filter = ('status', JobNameFilter)
+    readonly_fields = ('name', 'payload', 'attempts', 'locked_until', 'last_error', 'created_at', 'finished_at')
+    fields = ('name', 'payload', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_until', 'last_error',
+              'created_at', 'finished_at')
+
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableMixin, admin.ModelAdmin):
+    """Админ-панель для просмотра уведомлений покупателям."""
+
+    list_display = ('id', 'order', 'event', 'chat_id', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'event')
+    list_select_related = ('order',)
+    search_fields = ('chat_id', 'order__id')
+    readonly_fields = ('order', 'event', 'chat_id', 'text', 'attempts', 'last_error', 'created_at', 'sent_at')
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    """Админ-панель для рассылок пользователям бота."""
+
+    list_display = ('id', 'status', 'sent_count', 'failed_count', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('status', 'last_profile_id', 'sent_count', 'failed_count', 'created_at', 'started_at',
+                       'heartbeat_at', 'finished_at')
+    actions = ['start_broadcast']
+
+    @admin.action(description='Запустить (или продолжить) рассылку')
+    def start_broadcast(self, request, queryset):
+        """Ставит отправку выбранных рассылок в фоновую очередь."""
+        broadcasts = list(queryset.exclude(status=Broadcast.STATUS_DONE))
+        for broadcast in broadcasts:
+            if broadcast.status == Broadcast.STATUS_DRAFT:
+                Broadcast.objects.filter(pk=broadcast.pk).update(status=Broadcast.STATUS_QUEUED)
+            enqueue('shop.run_broadcast', broadcast_id=broadcast.pk, max_attempts=20)
+        self.message_user(request, f'Запущено рассылок: {len(broadcasts)}.')
+
+
+@admin.register(BroadcastDelivery)
+class BroadcastDeliveryAdmin(LargeTableMixin, admin.ModelAdmin):
+    """Админ-панель для просмотра доставки рассылок."""
+
+    list_display = ('broadcast', 'user_id', 'status', 'error', 'updated_at')
+    list_select_related = ('broadcast',)
+    list_filter = ('status',)
+    search_fields = ('user_id',)
+    raw_id_fields = ('broadcast',)
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    """Панель аналитики продаж: читает только дневные сводки, а не заказы."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        """Итоги, продажи по дням и топ товаров за период (?since=ГГГГ-ММ-ДД&until=ГГГГ-ММ-ДД)."""
+        until = self._parse_date(request.GET.get('until')) or localdate()
+        since = self._parse_date(request.GET.get('since')) or until - timedelta(days=29)
+        report = sales_report(since, until)
+        max_revenue = max((day.revenue for day in report['days']), default=0)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Аналитика продаж',
+            'since': since,
+            'until': until,
+            'max_revenue': max_revenue or 1,
+            **report,
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/shop/dailysales/dashboard.html', context)
+
+    @staticmethod
+    def _parse_date(value):
+        try:
+            return date.fromisoformat(value) if value else None
+        except ValueError:
+            return None
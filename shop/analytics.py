@@ -0,0 +1,111 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyProductSales, DailySales, Order, OrderItem
+
+
+def day_bounds(start, end):
+    """Границы периода [start, end] в текущем часовом поясе: (начало start, начало дня после end)."""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def rebuild_daily_sales(start, end):
+    """
+    Пересобирает сводки продаж за даты с ``start`` по ``end`` по исходным заказам.
+
+    Выполняется в одной транзакции, поэтому период лучше брать небольшим
+    (команда ``rebuild_sales`` разбивает историю на части).
+    Возвращает число дней, за которые были заказы.
+    """
+    tz = timezone.get_current_timezone()
+    since, until = day_bounds(start, end)
+
+    with transaction.atomic():
+        DailySales.objects.filter(date__range=(start, end)).delete()
+        DailyProductSales.objects.filter(date__range=(start, end)).delete()
+
+        days = (
+            Order.objects.filter(created_at__gte=since, created_at__lt=until)
+            .annotate(day=TruncDate('created_at', tzinfo=tz))
+            .values('day')
+            .annotate(
+                orders_count=Count('id'),
+                revenue=Sum('total_price'),
+                confirmed_count=Count('id', filter=Q(is_confirmed=True)),
+                confirmed_revenue=Sum('total_price', filter=Q(is_confirmed=True)),
+                rejected_count=Count('id', filter=Q(is_rejected=True)),
+                rejected_revenue=Sum('total_price', filter=Q(is_rejected=True)),
+            )
+            .order_by()
+        )
+        products = (
+            OrderItem.objects.filter(order__created_at__gte=since, order__created_at__lt=until)
+            .annotate(day=TruncDate('order__created_at', tzinfo=tz))
+            .values('day', 'product_id')
+            .annotate(quantity=Sum('quantity'), revenue=Sum('line_total'))
+            .order_by()
+        )
+
+        product_rows = [
+            DailyProductSales(date=row['day'], product_id=row['product_id'], quantity=row['quantity'],
+                              revenue=row['revenue'])
+            for row in products
+        ]
+        items_count = {}
+        for row in product_rows:
+            items_count[row.date] = items_count.get(row.date, 0) + row.quantity
+
+        day_rows = [
+            DailySales(
+                date=row['day'],
+                orders_count=row['orders_count'],
+                items_count=items_count.get(row['day'], 0),
+                revenue=row['revenue'] or 0,
+                confirmed_count=row['confirmed_count'],
+                confirmed_revenue=row['confirmed_revenue'] or 0,
+                rejected_count=row['rejected_count'],
+                rejected_revenue=row['rejected_revenue'] or 0,
+            )
+            for row in days
+        ]
+        DailySales.objects.bulk_create(day_rows, batch_size=500)
+        DailyProductSales.objects.bulk_create(product_rows, batch_size=500)
+    return len(day_rows)
+
+
+def sales_report(start, end, top=10):
+    """
+    Отчёт за период только по сводкам: итоги, продажи по дням и самые продаваемые товары.
+
+    Стоимость зависит от длины периода и числа товаров, а не от числа заказов.
+    """
+    days = DailySales.objects.filter(date__range=(start, end))
+    totals = days.aggregate(
+        orders_count=Sum('orders_count'),
+        items_count=Sum('items_count'),
+        revenue=Sum('revenue'),
+        confirmed_count=Sum('confirmed_count'),
+        confirmed_revenue=Sum('confirmed_revenue'),
+        rejected_count=Sum('rejected_count'),
+        rejected_revenue=Sum('rejected_revenue'),
+    )
+    totals = {key: value or 0 for key, value in totals.items()}
+    top_products = list(
+        DailyProductSales.objects.filter(date__range=(start, end))
+        .values('product_id', 'product__name')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-quantity', '-revenue')[:top]
+    )
+    return {
+        'totals': totals,
+        'days': list(days.order_by('date')),
+        'top_products': top_products,
+    }
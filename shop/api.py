@@ -0,0 +1,224 @@
+"""
+REST API v1 для лёгких клиентов: каталог, корзина и оформление заказа.
+
+Каталог открыт всем; корзина и заказ — только покупателю, чей Telegram
+user_id подписан в initData Web App (см. shop.webapp_auth).
+"""
+import hashlib
+
+from django.db.models import Q
+from django.urls import path
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from rest_framework import generics, status
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .cart import CartStore
+from .catalog import (
+    get_catalog_state, get_catalog_version, parse_filters, PRICE_BUCKETS,
+    CATALOG_PAGE_SIZE, CATALOG_MAX_PAGE_SIZE,
+)
+from .checkout import CheckoutError, create_order, order_contacts
+from .db_routing import pin_to_primary
+from .models import Order, Product
+from .pricing import CartError, parse_cart_key, price_cart, validate_item
+from .search import filter_products
+from .serializers import CartItemSerializer, CartLineSerializer, CheckoutSerializer, OrderSerializer, ProductSerializer
+
+
+def conditional_response(request, etag, build):
+    """Ответ 304, если у клиента актуальная версия (If-None-Match), иначе ``build()``; оба с ETag."""
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build()
+    response['ETag'] = etag
+    return response
+
+
+def catalog_etag(request):
+    """ETag ответа каталога: версия снимка, время его смены и полный адрес запроса (поля, курсор, фильтры)."""
+    version, changed_at = get_catalog_state()
+    state = f'{version}:{changed_at.timestamp():.0f}:{request.get_full_path()}'
+    return 'products-' + hashlib.sha1(state.encode()).hexdigest()[:20]
+
+
+def get_user_id(request):
+    """Telegram user_id из проверенного initData; параметру user_id от клиента не доверяем."""
+    return request.user.id
+
+
+class ProductCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = CATALOG_PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = CATALOG_MAX_PAGE_SIZE
+
+
+class CatalogViewMixin:
+    """
+    Товары из базы (изображения и размеры — отдельными запросами) с условными
+    ответами: ETag меняется вместе с версией снимка каталога.
+
+    Тело читается с основной базы, как и версия каталога: с отстающей реплики
+    под новым ETag мог бы закэшироваться старый список товаров.
+    """
+    serializer_class = ProductSerializer
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = Product.objects.all()
+
+        query = params.get('q')
+        if query:
+            queryset = filter_products(queryset, query)
+
+        size_ids, price_keys = parse_filters(params)
+        if size_ids:
+            queryset = queryset.filter(
+                pk__in=Product.sizes.through.objects.filter(size_id__in=size_ids).values('product_id'),
+            )
+        if price_keys:
+            prices = Q()
+            for key, _, low, high in PRICE_BUCKETS:
+                if key in price_keys:
+                    prices |= Q(**{k: v for k, v in (('price__gte', low), ('price__lt', high)) if v is not None})
+            queryset = queryset.filter(prices)
+
+        return ProductSerializer.setup_eager_loading(queryset, self.request)
+
+    def get(self, request, *args, **kwargs):
+        # ETag вычисляется до чтения товаров: если каталог изменится между ними,
+        # клиент получит более новые данные под старым ETag и обновит их следующим запросом.
+        etag = catalog_etag(request)
+
+        def build():
+            return super(CatalogViewMixin, self).get(request, *args, **kwargs)
+
+        response = conditional_response(request, etag, build)
+        patch_cache_control(response, public=True, max_age=0)
+        return response
+
+
+class ProductList(CatalogViewMixin, generics.ListAPIView):
+    """
+    Список товаров: ?fields=id,name,price — только нужные поля, ?cursor=… — следующая
+    страница, ?limit=<n>, ?q=<поиск>, ?size=<id>, ?price=<ключ диапазона>.
+    """
+    pagination_class = ProductCursorPagination
+
+
+class ProductDetail(CatalogViewMixin, generics.RetrieveAPIView):
+    pass
+
+
+class CustomerView(APIView):
+    """Представление с данными одного покупателя: только с подписанным initData."""
+    permission_classes = [IsAuthenticated]
+
+
+class CartMixin:
+    def cart_response(self, contents):
+        priced = price_cart(contents.items())
+        response = Response({
+            'items': CartLineSerializer(priced.lines, many=True).data,
+            'total_price': str(priced.total),
+        })
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class CartView(CartMixin, CustomerView):
+    """Корзина покупателя: строки с ценами по снимку каталога и итог."""
+
+    def get(self, request):
+        user_id = get_user_id(request)
+        contents = CartStore.for_user(user_id).load()
+        etag = 'cart-' + hashlib.sha1(f'{get_catalog_version()}:{contents.to_compact()}'.encode()).hexdigest()[:20]
+        response = conditional_response(request, etag, lambda: self.cart_response(contents))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class CartItems(CartMixin, CustomerView):
+    """Изменение количества товара в корзине: {"product_id", "size_id", "quantity"} (может быть отрицательным)."""
+
+    def post(self, request):
+        user_id = get_user_id(request)
+        serializer = CartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        item = serializer.validated_data
+        try:
+            validate_item(item['product_id'], item['size_id'])
+        except CartError as e:
+            return Response({'detail': e.message}, status=e.status)
+
+        store = CartStore.for_user(user_id)
+        contents = store.load()
+        contents.add(item['product_id'], item['size_id'], item['quantity'])
+        store.save(contents)
+        return self.cart_response(contents)
+
+
+class CartItem(CartMixin, CustomerView):
+    """Удаление строки корзины по ключу "productID-sizeID"."""
+
+    def delete(self, request, key):
+        user_id = get_user_id(request)
+        product_id, size_id = parse_cart_key(key)
+        if product_id is None:
+            return Response({'detail': 'Некорректный ключ строки корзины.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        store = CartStore.for_user(user_id)
+        contents = store.load()
+        contents.remove(product_id, size_id)
+        store.save(contents)
+        return self.cart_response(contents)
+
+
+class Checkout(CustomerView):
+    """
+    Оформление заказа из корзины покупателя; отвечает созданным заказом.
+
+    Контакты в ответ не попадают: они могли быть взяты из профиля пользователя.
+    """
+
+    def post(self, request):
+        serializer = CheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user_id = get_user_id(request)
+
+        name, phone_number, address = order_contacts(
+            user_id, data.get('name'), data.get('phone_number'), data.get('address'),
+        )
+        if not all([name, phone_number, address]):
+            return Response(
+                {'detail': 'Не удалось получить полные данные пользователя.'}, status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        store = CartStore.for_user(user_id)
+        contents = store.load()
+        try:
+            order = create_order(user_id, name, phone_number, address, data['comment'], contents.items())
+        except CheckoutError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        store.clear()
+        pin_to_primary(user_id)
+
+        order = OrderSerializer.setup_eager_loading(Order.objects.filter(pk=order.pk)).get()
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+
+app_name = 'api'
+urlpatterns = [
+    path('products/', ProductList.as_view(), name='product_list'),
+    path('products/<int:pk>/', ProductDetail.as_view(), name='product_detail'),
+    path('cart/', CartView.as_view(), name='cart'),
+    path('cart/items/', CartItems.as_view(), name='cart_items'),
+    path('cart/items/<str:key>/', CartItem.as_view(), name='cart_item'),
+    path('checkout/', Checkout.as_view(), name='checkout'),
+]
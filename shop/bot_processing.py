@@ -0,0 +1,56 @@
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Параллельная обработка обновлений с сохранением порядка для каждого пользователя.
+
+    Обновления разных пользователей обрабатываются одновременно, не более
+    ``max_concurrent_updates`` за раз. Обновления одного пользователя
+    выполняются строго по очереди, так как шаги ввода данных
+    (awaiting_name / awaiting_phone / awaiting_address) зависят от порядка.
+    Ожидающие своей очереди обновления не занимают рабочих мест: общее
+    число принятых в обработку обновлений ограничено ``max_pending_updates``.
+    """
+
+    def __init__(self, max_concurrent_updates, max_pending_updates=None):
+        super().__init__(max_pending_updates or max_concurrent_updates * 16)
+        self._workers = asyncio.BoundedSemaphore(max_concurrent_updates)
+        # Блокировки пользователей: {ключ: [asyncio.Lock, число ожидающих]}
+        self._user_locks = {}
+
+    @staticmethod
+    def ordering_key(update):
+        """Ключ, внутри которого обновления должны идти по порядку: пользователь, иначе чат."""
+        if isinstance(update, Update):
+            if update.effective_user:
+                return update.effective_user.id
+            if update.effective_chat:
+                return f'chat:{update.effective_chat.id}'
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        key = self.ordering_key(update)
+        if key is None:
+            async with self._workers:
+                await coroutine
+            return
+
+        entry = self._user_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0], self._workers:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._user_locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,47 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import UserProfile
+
+# Фиксированный пул потоков для запросов бота к базе. Каждый поток держит
+# своё постоянное соединение (CONN_MAX_AGE), поэтому соединение не
+# открывается заново на каждое сообщение.
+_executor = ThreadPoolExecutor(max_workers=settings.BOT_DB_THREADS, thread_name_prefix='bot-db')
+
+
+def _call(func, *args, **kwargs):
+    close_old_connections()
+    return func(*args, **kwargs)
+
+
+async def run_db(func, *args, **kwargs):
+    """Выполняет синхронную функцию ORM в пуле потоков бота."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(_call, func, *args, **kwargs))
+
+
+def _save_profile_fields(user_id, fields):
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=user_id, **fields)],
+        update_conflicts=True,
+        unique_fields=['user_id'],
+        update_fields=list(fields),
+    )
+
+
+async def get_or_create_profile(user_id):
+    """Возвращает (профиль, создан ли он)."""
+    return await run_db(UserProfile.objects.get_or_create, user_id=user_id)
+
+
+async def save_profile_fields(user_id, **fields):
+    """
+    Записывает указанные поля профиля одним запросом INSERT ... ON CONFLICT DO UPDATE.
+
+    Остальные поля не перезаписываются; если профиля ещё нет, он создаётся.
+    """
+    await run_db(_save_profile_fields, user_id, fields)
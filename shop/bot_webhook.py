@@ -0,0 +1,102 @@
+import hmac
+import json
+import logging
+
+from django.conf import settings
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramWebhookMiddleware:
+    """
+    ASGI-обёртка, которая запускает бота внутри веб-процесса в режиме webhook.
+
+    POST-запросы на ``TELEGRAM_WEBHOOK_PATH`` передаются боту, остальные
+    запросы — приложению Django. Бот запускается и останавливается вместе с
+    сервером через ASGI lifespan и использует те же соединения с базой.
+    """
+
+    def __init__(self, django_app):
+        self.django_app = django_app
+        self.bot_app = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['path'] == settings.TELEGRAM_WEBHOOK_PATH:
+            await self.webhook(scope, receive, send)
+        else:
+            await self.django_app(scope, receive, send)
+
+    async def startup(self):
+        from shop.divakidsbot import build_application
+
+        self.bot_app = build_application(updater=False)
+        await self.bot_app.initialize()
+        await self.bot_app.start()
+        if settings.TELEGRAM_WEBHOOK_URL:
+            await self.bot_app.bot.set_webhook(
+                url=settings.TELEGRAM_WEBHOOK_URL,
+                secret_token=settings.TELEGRAM_WEBHOOK_SECRET or None,
+                allowed_updates=Update.ALL_TYPES,
+            )
+
+    async def shutdown(self):
+        if self.bot_app is not None:
+            await self.bot_app.stop()
+            await self.bot_app.shutdown()
+            self.bot_app = None
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as e:
+                    logger.exception('Не удалось запустить бота')
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def webhook(self, scope, receive, send):
+        if scope['method'] != 'POST':
+            return await self.respond(send, 405)
+
+        headers = dict(scope['headers'])
+        secret = headers.get(b'x-telegram-bot-api-secret-token', b'').decode()
+        if settings.TELEGRAM_WEBHOOK_SECRET and not hmac.compare_digest(secret, settings.TELEGRAM_WEBHOOK_SECRET):
+            return await self.respond(send, 403)
+        if self.bot_app is None:
+            return await self.respond(send, 503)
+
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+        try:
+            data = json.loads(body)
+            if not isinstance(data, dict) or 'update_id' not in data:
+                # null, массивы и объекты без update_id — корректный JSON, но не обновление.
+                raise TypeError('Обновление должно быть объектом JSON с update_id.')
+            update = Update.de_json(data, self.bot_app.bot)
+        except (ValueError, TypeError, KeyError):
+            return await self.respond(send, 400)
+
+        # Обновление обрабатывается в фоне, Telegram сразу получает ответ 200.
+        await self.bot_app.update_queue.put(update)
+        await self.respond(send, 200)
+
+    @staticmethod
+    async def respond(send, status):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+        await send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,156 @@
+import asyncio
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from telegram import Bot
+
+from .models import Broadcast, BroadcastDelivery, UserProfile
+from .telegram_delivery import TelegramRateLimiter, deliver
+
+BROADCAST_CHUNK_SIZE = 500
+BROADCAST_CONCURRENCY = 30
+BROADCAST_MAX_RETRIES = 3
+BROADCAST_STALE_AFTER = timedelta(minutes=5)  # после этого рассылку без активности может продолжить другой процесс
+
+
+def claim_broadcast(broadcast_id):
+    """
+    Переводит рассылку в статус «Отправляется», если её не отправляет другой процесс.
+
+    Возвращает рассылку или None, если она завершена или активна в другом месте.
+    """
+    now = timezone.now()
+    claimed = Broadcast.objects.filter(pk=broadcast_id).exclude(status=Broadcast.STATUS_DONE).exclude(
+        status=Broadcast.STATUS_RUNNING, heartbeat_at__gte=now - BROADCAST_STALE_AFTER,
+    ).update(status=Broadcast.STATUS_RUNNING, heartbeat_at=now)
+    if not claimed:
+        return None
+
+    broadcast = Broadcast.objects.get(pk=broadcast_id)
+    if not broadcast.started_at:
+        broadcast.started_at = now
+        broadcast.save(update_fields=['started_at'])
+
+    # Если процесс упал во время отправки, результат этих сообщений неизвестен.
+    # Повторно их не отправляем, чтобы не было дублей.
+    interrupted = broadcast.deliveries.filter(status=BroadcastDelivery.STATUS_SENDING).update(
+        status=BroadcastDelivery.STATUS_FAILED, error='Отправка прервана',
+    )
+    if interrupted:
+        Broadcast.objects.filter(pk=broadcast_id).update(failed_count=F('failed_count') + interrupted)
+    return broadcast
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+async def send_one(bot, limiter, semaphore, user_id, text, started, results):
+    """Отправляет сообщение одному пользователю с повторами при временных ошибках."""
+    async with semaphore:
+        started.add(user_id)
+        for attempt in range(BROADCAST_MAX_RETRIES):
+            result = await deliver(bot, limiter, user_id, text)
+            if result.ok or result.permanent:
+                break
+            if result.retry_after is None:
+                await asyncio.sleep(2 ** attempt)
+            # При RetryAfter ждать здесь не нужно: deliver уже приостановил общий ограничитель.
+        results[user_id] = result
+
+
+async def send_chunk(bot, limiter, user_ids, text, concurrency, started, results):
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [
+        asyncio.ensure_future(send_one(bot, limiter, semaphore, user_id, text, started, results))
+        for user_id in user_ids
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # Иначе оставшиеся задачи продолжили бы отправку в следующем runner.run()
+        # уже после сохранения контрольной точки, и при продолжении рассылки были бы дубли.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def process_chunk(runner, bot, limiter, broadcast, chunk, concurrency):
+    """Отправляет пачку получателей и сохраняет результаты и контрольную точку."""
+    user_ids = [user_id for _, user_id in chunk]
+    done = set(broadcast.deliveries.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    todo = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in done]
+
+    BroadcastDelivery.objects.bulk_create(
+        [BroadcastDelivery(broadcast=broadcast, user_id=user_id) for user_id in todo],
+        ignore_conflicts=True,
+    )
+
+    started, results = set(), {}
+    completed = False
+    try:
+        runner.run(send_chunk(bot, limiter, todo, broadcast.text, concurrency, started, results))
+        completed = True
+    finally:
+        sent = [user_id for user_id, result in results.items() if result.ok]
+        failed = {user_id: result.error for user_id, result in results.items() if not result.ok}
+        broadcast.deliveries.filter(user_id__in=sent).update(status=BroadcastDelivery.STATUS_SENT)
+        for user_id, error in failed.items():
+            broadcast.deliveries.filter(user_id=user_id).update(status=BroadcastDelivery.STATUS_FAILED, error=error)
+
+        update = {
+            'sent_count': F('sent_count') + len(sent),
+            'failed_count': F('failed_count') + len(failed),
+            'heartbeat_at': timezone.now(),
+        }
+        if completed:
+            update['last_profile_id'] = chunk[-1][0]
+        else:
+            # Тем, кому отправка ещё не начиналась, сообщение отправится при продолжении.
+            not_started = [user_id for user_id in todo if user_id not in started]
+            broadcast.deliveries.filter(user_id__in=not_started).delete()
+        Broadcast.objects.filter(pk=broadcast.pk).update(**update)
+
+
+def run_broadcast(broadcast_id, chunk_size=BROADCAST_CHUNK_SIZE, concurrency=BROADCAST_CONCURRENCY, bot=None):
+    """
+    Отправляет рассылку всем профилям, продолжая с последней контрольной точки.
+
+    Получатели читаются потоком через ``iterator(chunk_size=...)`` по возрастанию
+    id профиля; после каждой пачки сохраняется id последнего профиля.
+    Каждому пользователю сообщение отправляется не более одного раза.
+    Возвращает False, если рассылка уже завершена или выполняется в другом процессе.
+    """
+    broadcast = claim_broadcast(broadcast_id)
+    if broadcast is None:
+        return False
+
+    try:
+        with asyncio.Runner() as runner:
+            bot = bot or Bot(settings.TELEGRAM_BOT_TOKEN)
+            runner.run(bot.initialize())
+            try:
+                limiter = TelegramRateLimiter()
+                recipients = (
+                    UserProfile.objects.filter(pk__gt=broadcast.last_profile_id)
+                    .order_by('pk')
+                    .values_list('pk', 'user_id')
+                    .iterator(chunk_size=chunk_size)
+                )
+                for chunk in chunked(recipients, chunk_size):
+                    process_chunk(runner, bot, limiter, broadcast, chunk, concurrency)
+            finally:
+                runner.run(bot.shutdown())
+    except BaseException:
+        # Освобождаем рассылку, чтобы её можно было сразу продолжить.
+        Broadcast.objects.filter(pk=broadcast_id).update(heartbeat_at=None)
+        raise
+
+    Broadcast.objects.filter(pk=broadcast_id).update(status=Broadcast.STATUS_DONE, finished_at=timezone.now())
+    return True
@@ -0,0 +1,195 @@
+import atexit
+import logging
+import threading
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, close_old_connections
+from django.utils import timezone
+
+from .models import Cart
+from .pricing import parse_cart_key
+
+logger = logging.getLogger(__name__)
+
+CART_CACHE_KEY = 'shop:cart:{key}'
+CART_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+class CartItem(NamedTuple):
+    product_id: int
+    size_id: Optional[int]
+    quantity: int
+
+
+class CartContents:
+    """Содержимое корзины: {(id товара, id размера): количество} в порядке добавления."""
+
+    def __init__(self, lines=None):
+        self.lines = dict(lines or {})
+
+    @classmethod
+    def from_compact(cls, items):
+        return cls(((product_id, size_id), quantity) for product_id, size_id, quantity in items or ())
+
+    def to_compact(self):
+        return [[product_id, size_id, quantity] for (product_id, size_id), quantity in self.lines.items()]
+
+    def items(self):
+        return [CartItem(product_id, size_id, quantity) for (product_id, size_id), quantity in self.lines.items()]
+
+    def add(self, product_id, size_id, quantity):
+        """Изменяет количество на ``quantity`` (может быть отрицательным); ноль удаляет строку."""
+        key = (product_id, size_id)
+        total = self.lines.get(key, 0) + quantity
+        if total > 0:
+            self.lines[key] = total
+        else:
+            self.lines.pop(key, None)
+
+    def remove(self, product_id, size_id):
+        self.lines.pop((product_id, size_id), None)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+
+class CartStore:
+    """
+    Хранилище корзины с ключом по Telegram user_id (или по сессии, если он неизвестен).
+
+    Чтение и запись идут через кэш ``CART_CACHE_ALIAS``; в таблицу Cart
+    изменения записываются фоновым потоком пачками раз в ``CART_FLUSH_INTERVAL``
+    секунд. При промахе кэша корзина читается из таблицы.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.cache = caches[settings.CART_CACHE_ALIAS]
+
+    @classmethod
+    def for_user(cls, user_id):
+        return cls(f'u:{user_id}')
+
+    @classmethod
+    def for_request(cls, request, user_id=None, create=False):
+        """
+        Хранилище для запроса. Без user_id используется сессия; она создаётся
+        только при ``create=True``. Возвращает None, если корзины ещё нет.
+        """
+        if user_id:
+            store = cls.for_user(user_id)
+            if request.session.session_key:
+                # Покупатель добавлял товары до того, как стал известен его user_id.
+                store.merge(cls(f's:{request.session.session_key}'))
+        else:
+            if not request.session.session_key:
+                if not create:
+                    return None
+                request.session.save()
+            store = cls(f's:{request.session.session_key}')
+
+        # Корзина из старого формата сессии ("productID-sizeID": количество).
+        legacy = request.session.get('cart') if request.session.session_key else None
+        if legacy:
+            contents = store.load()
+            for cart_key, quantity in legacy.items():
+                product_id, size_id = parse_cart_key(cart_key)
+                if product_id is not None:
+                    contents.add(product_id, size_id, quantity)
+            store.save(contents)
+            del request.session['cart']
+        return store
+
+    @property
+    def cache_key(self):
+        return CART_CACHE_KEY.format(key=self.key)
+
+    def load(self):
+        items = self.cache.get(self.cache_key)
+        if items is None:
+            # Строка заново попадает в кэш, поэтому читаем её с основной базы, а не с реплики.
+            row = Cart.objects.using(DEFAULT_DB_ALIAS).filter(key=self.key).values_list('items', flat=True).first()
+            items = row or []
+            self.cache.set(self.cache_key, items, CART_CACHE_TIMEOUT)
+        return CartContents.from_compact(items)
+
+    def save(self, contents):
+        items = contents.to_compact()
+        self.cache.set(self.cache_key, items, CART_CACHE_TIMEOUT)
+        write_behind.mark_dirty(self.key, items, timezone.now())
+
+    def clear(self):
+        self.save(CartContents())
+
+    def merge(self, other):
+        """Переносит сюда товары из корзины ``other`` (например, анонимной корзины сессии) и очищает её."""
+        merged = other.load()
+        if not merged:
+            return
+        contents = self.load()
+        for product_id, size_id, quantity in merged.items():
+            contents.add(product_id, size_id, quantity)
+        self.save(contents)
+        other.clear()
+
+
+class WriteBehind:
+    """
+    Буфер изменённых корзин, который фоновый поток сбрасывает в таблицу Cart.
+
+    Каждая запись помечена временем ``CartStore.save()``: процессы сбрасывают
+    свои буферы независимо, и строка обновляется, только если запись новее
+    уже сохранённой. Пустая корзина остаётся строкой с пустым списком, чтобы
+    старая запись другого процесса не создала её заново.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.dirty = {}  # {ключ: (товары, время записи)}
+        self.thread = None
+
+    def mark_dirty(self, key, items, updated_at):
+        with self.lock:
+            self.dirty[key] = (items, updated_at)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='cart-write-behind', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        stop = threading.Event()
+        while not stop.wait(settings.CART_FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось сохранить корзины')
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        with self.lock:
+            dirty, self.dirty = self.dirty, {}
+        if not dirty:
+            return
+
+        try:
+            rows = [Cart(key=key, items=items, updated_at=updated_at) for key, (items, updated_at) in dirty.items()]
+            Cart.objects.bulk_create(rows, ignore_conflicts=True)
+            for row in rows:
+                Cart.objects.filter(key=row.key, updated_at__lt=row.updated_at).update(
+                    items=row.items, updated_at=row.updated_at,
+                )
+        except Exception:
+            # Возвращаем несохранённые корзины в буфер, если их не успели изменить снова.
+            with self.lock:
+                for key, value in dirty.items():
+                    self.dirty.setdefault(key, value)
+            raise
+
+
+write_behind = WriteBehind()
+atexit.register(write_behind.flush)
@@ -0,0 +1,294 @@
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import CatalogVersion, Product
+
+CATALOG_VERSION_ID = 1
+CATALOG_SNAPSHOT_KEY = 'shop:catalog:snapshot:{version}:{stamp}'
+CATALOG_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+CATALOG_PAGE_SIZE = 20
+CATALOG_MAX_PAGE_SIZE = 100
+
+# Ценовые диапазоны для фильтра: (ключ, подпись, от, до); границы в UZS, «до» не включается.
+PRICE_BUCKETS = (
+    ('to100', 'до 100 000', None, 100000),
+    ('100-200', '100 000 – 200 000', 100000, 200000),
+    ('200-300', '200 000 – 300 000', 200000, 300000),
+    ('300-500', '300 000 – 500 000', 300000, 500000),
+    ('from500', 'от 500 000', 500000, None),
+)
+
+# Снимок каталога, закэшированный в памяти процесса: {'state': (версия, время смены), 'snapshot': ...}
+_local = {'state': None, 'snapshot': None}
+
+
+class CatalogSnapshot:
+    """Снимок каталога: товары с предзагруженными изображениями и размерами."""
+
+    def __init__(self, version, products):
+        self.version = version
+        self.products = products
+        self.ids = [product.id for product in products]
+        self._index = None
+        self._facets = None
+
+    def __len__(self):
+        return len(self.products)
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_index'] = None
+        state['_facets'] = None
+        return state
+
+    def _build_index(self):
+        products = {product.id: product for product in self.products}
+        sizes = {size.id: size for product in self.products for size in product.sizes.all()}
+        product_sizes = {
+            product.id: frozenset(size.id for size in product.sizes.all())
+            for product in self.products
+        }
+        self._index = (products, sizes, product_sizes)
+        return self._index
+
+    @property
+    def index(self):
+        """Индекс цен и размеров в памяти: (товары по id, размеры по id, id размеров товара)."""
+        return self._index or self._build_index()
+
+    def get_product(self, product_id):
+        return self.index[0].get(product_id)
+
+    def get_size(self, size_id):
+        return self.index[1].get(size_id)
+
+    def has_size(self, product_id, size_id):
+        return size_id in self.index[2].get(product_id, ())
+
+    def _build_facets(self):
+        sizes = {}
+        prices = {key: 0 for key, _, _, _ in PRICE_BUCKETS}
+        for position, product in enumerate(self.products):
+            bit = 1 << position
+            for size in product.sizes.all():
+                sizes[size.id] = sizes.get(size.id, 0) | bit
+            key = price_bucket(product.price)
+            if key:
+                prices[key] |= bit
+        self._facets = (sizes, prices)
+        return self._facets
+
+    @property
+    def facets(self):
+        """
+        Битовые маски фасетов: (id размера -> маска, ключ ценового диапазона -> маска).
+
+        Бит i означает i-й товар снимка; маски пересобираются вместе со снимком.
+        """
+        return self._facets or self._build_facets()
+
+    def _mask(self, masks, keys):
+        """Объединение масок выбранных значений одного фасета; None, если фасет не выбран."""
+        if not keys:
+            return None
+        mask = 0
+        for key in keys:
+            mask |= masks.get(key, 0)
+        return mask
+
+    def filter_mask(self, size_ids=(), price_keys=()):
+        """
+        Маска товаров, у которых есть любой из размеров и цена в любом из диапазонов.
+
+        Возвращает None, если фильтры не заданы.
+        """
+        sizes, prices = self.facets
+        masks = [mask for mask in (self._mask(sizes, size_ids), self._mask(prices, price_keys)) if mask is not None]
+        if not masks:
+            return None
+        result = masks[0]
+        for mask in masks[1:]:
+            result &= mask
+        return result
+
+    def facet_counts(self, size_ids=(), price_keys=()):
+        """
+        Счётчики для каждого значения фасетов с учётом фильтра по другому фасету.
+
+        Считаются по битовым маскам в памяти, без запросов к базе.
+        """
+        sizes, prices = self.facets
+        size_filter = self._mask(sizes, size_ids)
+        price_filter = self._mask(prices, price_keys)
+        all_products = (1 << len(self.products)) - 1
+        size_names = self.index[1]
+        return {
+            'sizes': [
+                {
+                    'id': size_id,
+                    'size': size_names[size_id].size,
+                    'count': (mask & (all_products if price_filter is None else price_filter)).bit_count(),
+                    'selected': size_id in size_ids,
+                }
+                for size_id, mask in sorted(sizes.items())
+            ],
+            'prices': [
+                {
+                    'key': key,
+                    'label': label,
+                    'count': (prices[key] & (all_products if size_filter is None else size_filter)).bit_count(),
+                    'selected': key in price_keys,
+                }
+                for key, label, _, _ in PRICE_BUCKETS
+            ],
+        }
+
+    def page(self, after=None, limit=CATALOG_PAGE_SIZE, mask=None):
+        """
+        Возвращает страницу товаров с id больше ``after`` и курсор следующей страницы.
+
+        Поиск начала страницы идёт бинарным поиском по отсортированным id,
+        поэтому дальние страницы стоят столько же, сколько первая. С маской
+        фильтра ``mask`` берутся только отмеченные в ней товары.
+        """
+        start = bisect_right(self.ids, after) if after is not None else 0
+        if mask is None:
+            products = self.products[start:start + limit]
+            has_next = start + limit < len(self.products)
+        else:
+            products = []
+            remaining = mask >> start
+            position = start
+            while remaining and len(products) <= limit:
+                skip = (remaining & -remaining).bit_length() - 1
+                position += skip
+                products.append(self.products[position])
+                remaining >>= skip + 1
+                position += 1
+            has_next = len(products) > limit
+            products = products[:limit]
+        next_cursor = products[-1].id if products and has_next else None
+        return products, next_cursor
+
+
+def price_bucket(price):
+    """Ключ ценового диапазона для цены товара."""
+    for key, _, low, high in PRICE_BUCKETS:
+        if (low is None or price >= low) and (high is None or price < high):
+            return key
+    return None
+
+
+def parse_filters(params):
+    """Фильтры каталога из параметров запроса (?size=<id>&price=<ключ>, можно несколько)."""
+    size_ids = [int(value) for value in params.getlist('size') if value.isdigit()]
+    price_keys = [value for value in params.getlist('price') if value in {key for key, *_ in PRICE_BUCKETS}]
+    return size_ids, price_keys
+
+
+def get_catalog_state():
+    """
+    Версия каталога и время её смены: (version, changed_at).
+
+    Хранятся в таблице CatalogVersion на основной базе, а не в кэше процесса:
+    изменения из админки, обработчика задач и команд видны всем процессам
+    и переживают перезапуск.
+    """
+    versions = CatalogVersion.objects.using(DEFAULT_DB_ALIAS).filter(pk=CATALOG_VERSION_ID)
+    state = versions.values_list('version', 'changed_at').first()
+    if state is None:
+        CatalogVersion.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+            [CatalogVersion(pk=CATALOG_VERSION_ID)], ignore_conflicts=True,
+        )
+        state = versions.values_list('version', 'changed_at').first()
+    return state
+
+
+def get_catalog_version():
+    return get_catalog_state()[0]
+
+
+def get_catalog_changed_at():
+    """Время последнего изменения каталога (для заголовка Last-Modified)."""
+    return get_catalog_state()[1]
+
+
+def invalidate_catalog():
+    """
+    Повышает версию каталога, после чего все процессы пересоберут снимок.
+
+    Время смены не уменьшается, даже если часы процесса отстают от того,
+    кто менял каталог раньше: Last-Modified не должен идти назад.
+    """
+    versions = CatalogVersion.objects.using(DEFAULT_DB_ALIAS).filter(pk=CATALOG_VERSION_ID)
+    bump = {'version': F('version') + 1, 'changed_at': Greatest(F('changed_at'), Value(timezone.now()))}
+    if not versions.update(**bump):
+        get_catalog_state()
+        versions.update(**bump)
+    _local['state'] = None
+    _local['snapshot'] = None
+
+
+def build_catalog_snapshot(version):
+    """
+    Загружает каталог фиксированным числом запросов (товары, изображения, размеры).
+
+    Снимок кэшируется до следующего изменения каталога, поэтому читается
+    с основной базы: отстающая реплика закрепила бы устаревшие данные.
+    """
+    products = list(
+        Product.objects.using(DEFAULT_DB_ALIAS).order_by('id').prefetch_related('images', 'sizes')
+    )
+    return CatalogSnapshot(version, products)
+
+
+def get_catalog():
+    """
+    Возвращает снимок каталога для текущей версии.
+
+    Версия читается из базы одним запросом по первичному ключу; снимок
+    берётся из кэша процесса, затем из кэша Django и загружается заново
+    только при смене версии.
+    """
+    state = get_catalog_state()
+    if _local['state'] == state:
+        return _local['snapshot']
+
+    version, changed_at = state
+    key = CATALOG_SNAPSHOT_KEY.format(version=version, stamp=changed_at.timestamp())
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_catalog_snapshot(version)
+        cache.set(key, snapshot, CATALOG_SNAPSHOT_TIMEOUT)
+
+    _local['state'] = state
+    _local['snapshot'] = snapshot
+    return snapshot
+
+
+def serialize_product(product):
+    """Карточка товара для JSON-ответов каталога."""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'description': product.description,
+        'price': str(product.price),
+        'images': [
+            {
+                'url': image.card_url,
+                'srcset': image.srcset,
+                'width': image.width,
+                'height': image.height,
+            }
+            for image in product.images.all() if image.image
+        ],
+        'sizes': [{'id': size.id, 'size': size.size} for size in product.sizes.all()],
+    }
@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import DailyProductSales, Order, OrderItem, Product, Size, UserProfile
+
+
+class CheckoutError(Exception):
+    """Ошибка оформления заказа; транзакция при этом откатывается."""
+
+
+def order_contacts(user_id, name=None, phone_number=None, address=None):
+    """Имя, телефон и адрес для заказа: из профиля пользователя, недостающие — из переданных значений."""
+    try:
+        profile = UserProfile.objects.get(user_id=user_id)
+    except UserProfile.DoesNotExist:
+        return name, phone_number, address
+    return profile.name or name, profile.phone_number or phone_number, profile.delivery_address or address
+
+
+def create_order(user_id, name, phone_number, address, comment, cart_items):
+    """
+    Оформляет заказ из строк корзины (CartItem) в одной транзакции.
+
+    Товары и размеры загружаются двумя запросами, элементы заказа создаются
+    через ``bulk_create``, общая стоимость записывается один раз при создании
+    заказа. Дневные сводки продаж обновляются в той же транзакции.
+    При любой ошибке заказ не сохраняется.
+    """
+    lines = [(product_id, size_id, quantity) for product_id, size_id, quantity in cart_items if quantity > 0]
+
+    if not lines:
+        raise CheckoutError('Ваша корзина пуста.')
+
+    with transaction.atomic():
+        products = Product.objects.in_bulk({product_id for product_id, _, _ in lines})
+        sizes = Size.objects.in_bulk({size_id for _, size_id, _ in lines if size_id})
+
+        items = []
+        total_price = 0
+        for product_id, size_id, quantity in lines:
+            product = products.get(product_id)
+            if not product:
+                raise CheckoutError(f'Товар #{product_id} не найден.')
+            size = sizes.get(size_id) if size_id else None
+            if size_id and not size:
+                raise CheckoutError(f'Размер #{size_id} не найден.')
+
+            item = OrderItem(product=product, size=size, quantity=quantity)
+            item.snapshot_price(product)
+            items.append(item)
+            total_price += item.line_total
+
+        order = Order.objects.create(
+            user_id=user_id,
+            name=name,
+            phone_number=phone_number,
+            address=address,
+            comment=comment,
+            total_price=total_price,
+        )
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        DailyProductSales.add_items(timezone.localdate(order.created_at), items)
+        enqueue('shop.notify_order_placed', order_id=order.pk)
+
+    return order
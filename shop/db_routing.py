@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+REPLICA_PIN_KEY = 'shop:db:pin:{user_id}'
+
+# Включается только на время обработчиков, которым допустимо отставание реплики.
+_replica_reads = ContextVar('shop_replica_reads', default=False)
+
+
+def replica_enabled():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def pin_to_primary(user_id):
+    """После записи читает данные пользователя с основной базы, пока реплика догоняет."""
+    if user_id and replica_enabled():
+        caches[settings.DB_REPLICA_PIN_CACHE_ALIAS].set(
+            REPLICA_PIN_KEY.format(user_id=user_id), True, settings.DB_REPLICA_PIN_SECONDS,
+        )
+
+
+def is_pinned(user_id):
+    return bool(user_id) and caches[settings.DB_REPLICA_PIN_CACHE_ALIAS].get(
+        REPLICA_PIN_KEY.format(user_id=user_id), False,
+    )
+
+
+@contextmanager
+def replica_reads(user_id=None):
+    """
+    Направляет чтения моделей магазина внутри блока на реплику.
+
+    Если пользователь недавно оформил заказ, чтения остаются на основной базе.
+    """
+    use_replica = replica_enabled() and not is_pinned(user_id)
+    token = _replica_reads.set(use_replica)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Все записи — в основную базу; чтения моделей shop — на реплику,
+    но только внутри ``replica_reads()`` и вне транзакции основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        # Связанные объекты читаются из той же базы, что и исходный объект.
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if (
+            _replica_reads.get()
+            and model._meta.app_label == 'shop'
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DB_ALIAS
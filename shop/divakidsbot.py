@@ -2,18 +2,23 @@ import os
 import django
 import sys
 import pytz
-from telegram import Bot, ReplyKeyboardMarkup, KeyboardButton, Update, WebAppInfo
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
-from asgiref.sync import sync_to_async
-from django.db.models import Prefetch
+from datetime import datetime, timedelta, timezone as dt_timezone
+from telegram import (Bot, ReplyKeyboardMarkup, KeyboardButton, Update, WebAppInfo, InlineKeyboardButton,
+                      InlineKeyboardMarkup)
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes, MessageHandler, filters
+from django.db.models import Prefetch, Q
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DivaKids.settings')
 django.setup()
 
-from shop.models import Order, OrderItem, UserProfile
+from django.conf import settings
+from shop.bot_processing import PerUserUpdateProcessor
+from shop.bot_repository import get_or_create_profile, run_db, save_profile_fields
+from shop.db_routing import replica_reads
+from shop.models import Order, OrderItem
 
-TOKEN = '7534268318:AAERP3Kbu5NS4K0MnoiFRzLcsDyIRzGYOJk'
+TOKEN = settings.TELEGRAM_BOT_TOKEN
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -35,60 +40,177 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(greeting_message, reply_markup=markup)
 
 
-@sync_to_async
-def get_user_orders(user_id):
-    return list(Order.objects.filter(user_id=user_id).prefetch_related('orderitem_set__product'))
+ORDERS_PAGE_SIZE = 5
+MESSAGE_LIMIT = 4096
+ORDERS_CALLBACK_PREFIX = 'orders'
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
 
 
-async def get_user_orders_async(user_id):
-    """Асинхронно получает заказы пользователя."""
-    return await sync_to_async(list)(
-        Order.objects.prefetch_related(
-            Prefetch('orderitem_set', queryset=OrderItem.objects.select_related('product', 'size'))
-        ).filter(user_id=user_id)
+def encode_orders_cursor(order):
+    """Курсор страницы заказов: время создания в микросекундах и id заказа."""
+    created_us = (order.created_at - EPOCH) // timedelta(microseconds=1)
+    return f"{created_us}:{order.id}"
+
+
+def decode_orders_cursor(cursor):
+    created_us, order_id = cursor.split(':')
+    return EPOCH + timedelta(microseconds=int(created_us)), int(order_id)
+
+
+def get_orders_page(user_id, cursor=None, direction='next'):
+    """
+    Возвращает страницу заказов пользователя (от новых к старым) с флагами соседних страниц.
+
+    Используется курсор по (created_at, id), поэтому время ответа зависит
+    только от размера страницы, а не от общего числа заказов. Чтение идёт
+    с реплики, кроме нескольких секунд после оформления заказа.
+    """
+    with replica_reads(user_id):
+        return _get_orders_page(user_id, cursor, direction)
+
+
+def _get_orders_page(user_id, cursor, direction):
+    queryset = Order.objects.filter(user_id=user_id).prefetch_related(
+        Prefetch('orderitem_set', queryset=OrderItem.objects.select_related('size'))
+    )
+
+    if cursor is None:
+        orders = list(queryset.order_by('-created_at', '-id')[:ORDERS_PAGE_SIZE + 1])
+        return orders[:ORDERS_PAGE_SIZE], False, len(orders) > ORDERS_PAGE_SIZE
+
+    created_at, order_id = decode_orders_cursor(cursor)
+    if direction == 'next':
+        orders = list(
+            queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=order_id))
+            .order_by('-created_at', '-id')[:ORDERS_PAGE_SIZE + 1]
+        )
+        return orders[:ORDERS_PAGE_SIZE], True, len(orders) > ORDERS_PAGE_SIZE
+
+    orders = list(
+        queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=order_id))
+        .order_by('created_at', 'id')[:ORDERS_PAGE_SIZE + 1]
+    )
+    has_prev = len(orders) > ORDERS_PAGE_SIZE
+    return list(reversed(orders[:ORDERS_PAGE_SIZE])), has_prev, True
+
+
+def render_order(order):
+    """Формирует HTML-описание одного заказа."""
+    tz = pytz.timezone("Asia/Tashkent")
+    order_time = order.created_at.astimezone(tz).strftime("%d-%m-%Y %H:%M")
+    message = (
+        f"━━━━━━━━━━━━━━━━━━━━━━\n"
+        f"🛒 <b>Заказ №{order.id}</b>\n"
+        f"📅 <i>Дата заказа:</i> {order_time}\n"
+        f"━━━━━━━━━━━━━━━━━━━━━━\n"
+        f"<b>📋 Товары в заказе:</b>\n"
+    )
+
+    items = []
+    for item in order.orderitem_set.all():
+        size_text = f"📏 Размер: <code>{item.size.size}</code>" if item.size else "📏 Размер: <i>Не указан</i>"
+        items.append(
+            f"🔹 <b>{item.product_name}</b>\n"
+            f"   {size_text}\n"
+            f"   🛍 Количество: <b>{item.quantity}</b>\n"
+            f"   💰 Цена: <b>{item.line_total:,} UZS</b>\n\n"
+        )
+
+    footer = (
+        f"💳 <b>Общая стоимость:</b> <code>{order.total_price:,} UZS</code>\n"
+        "━━━━━━━━━━━━━━━━━━━━━━\n\n"
     )
+    return message + "".join(items) + footer
+
+
+def split_message(blocks, header="", limit=MESSAGE_LIMIT):
+    """
+    Собирает блоки в сообщения не длиннее ``limit`` символов.
+
+    Сообщения делятся по границам блоков (заказов); блок, который сам по себе
+    длиннее лимита, делится по строкам. Заголовок никогда не уходит
+    отдельным сообщением: он начинает первое сообщение.
+    """
+    messages = []
+    current = header
+    has_blocks = False
+    for block in blocks:
+        if len(current) + len(block) <= limit:
+            current += block
+            has_blocks = True
+            continue
+        if has_blocks:
+            messages.append(current)
+            current = ""
+        # До первого блока в current только заголовок: он делится вместе с блоком.
+        block = current + block
+        has_blocks = True
+        while len(block) > limit:
+            cut = block.rfind("\n", 0, limit) + 1 or limit
+            messages.append(block[:cut])
+            block = block[cut:]
+        current = block
+    if current:
+        messages.append(current)
+    return messages
+
+
+def orders_keyboard(orders, has_prev, has_next):
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton(
+            "⬅️ Новее", callback_data=f"{ORDERS_CALLBACK_PREFIX}:prev:{encode_orders_cursor(orders[0])}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton(
+            "Старее ➡️", callback_data=f"{ORDERS_CALLBACK_PREFIX}:next:{encode_orders_cursor(orders[-1])}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
 
 
 async def my_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
-    orders = await get_user_orders_async(user_id)
+    orders, has_prev, has_next = await run_db(get_orders_page, user_id)
 
     if not orders:
         await update.message.reply_text("📭 <b>У вас пока нет заказов.</b>", parse_mode="HTML")
         return
 
-    tz = pytz.timezone("Asia/Tashkent")
-    message = "<b>📦 Ваши заказы:</b>\n\n"
-
-    for order in orders:
-        order_time = order.created_at.astimezone(tz).strftime("%d-%m-%Y %H:%M")
-        message += (
-            f"━━━━━━━━━━━━━━━━━━━━━━\n"
-            f"🛒 <b>Заказ №{order.id}</b>\n"
-            f"📅 <i>Дата заказа:</i> {order_time}\n"
-            f"━━━━━━━━━━━━━━━━━━━━━━\n"
-            f"<b>📋 Товары в заказе:</b>\n"
-        )
+    messages = split_message([render_order(order) for order in orders], header="<b>📦 Ваши заказы:</b>\n\n")
+    markup = orders_keyboard(orders, has_prev, has_next)
+    for i, message in enumerate(messages):
+        is_last = i == len(messages) - 1
+        await update.message.reply_text(message, parse_mode="HTML", reply_markup=markup if is_last else None)
 
-        for item in order.orderitem_set.all():
-            size_text = f"📏 Размер: <code>{item.size.size}</code>" if item.size else "📏 Размер: <i>Не указан</i>"
-            price_total = item.product.price * item.quantity
-            message += (
-                f"🔹 <b>{item.product.name}</b>\n"
-                f"   {size_text}\n"
-                f"   🛍 Количество: <b>{item.quantity}</b>\n"
-                f"   💰 Цена: <b>{price_total:,} UZS</b>\n\n"
-            )
 
-        message += f"💳 <b>Общая стоимость:</b> <code>{order.total_price:,} UZS</code>\n"
-        message += "━━━━━━━━━━━━━━━━━━━━━━\n\n"
+async def orders_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обрабатывает кнопки «Новее» / «Старее» под списком заказов."""
+    query = update.callback_query
+    await query.answer()
 
-    await update.message.reply_text(message, parse_mode="HTML")
+    try:
+        _, direction, cursor = query.data.split(':', 2)
+        orders, has_prev, has_next = await run_db(get_orders_page, query.from_user.id, cursor, direction)
+    except ValueError:
+        return
+
+    if not orders:
+        await query.edit_message_reply_markup(reply_markup=None)
+        return
+
+    messages = split_message([render_order(order) for order in orders], header="<b>📦 Ваши заказы:</b>\n\n")
+    markup = orders_keyboard(orders, has_prev, has_next)
+    if len(messages) == 1:
+        await query.edit_message_text(messages[0], parse_mode="HTML", reply_markup=markup)
+        return
+
+    await query.edit_message_reply_markup(reply_markup=None)
+    for i, message in enumerate(messages):
+        is_last = i == len(messages) - 1
+        await query.message.reply_text(message, parse_mode="HTML", reply_markup=markup if is_last else None)
 
 
 async def my_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
-    profile, created = await sync_to_async(UserProfile.objects.get_or_create)(user_id=user_id)
+    profile, created = await get_or_create_profile(user_id)
 
     if created or not profile.name:
         await update.message.reply_text("📝 У вас пока нет сохраненных данных. Пожалуйста, введите ваше имя:")
@@ -114,9 +236,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text
 
     if context.user_data.get('awaiting_name'):
-        profile = await sync_to_async(UserProfile.objects.get)(user_id=user_id)
-        profile.name = text
-        await sync_to_async(profile.save)()
+        await save_profile_fields(user_id, name=text)
         context.user_data['awaiting_name'] = False
         context.user_data['awaiting_phone'] = True
 
@@ -130,9 +250,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
     elif context.user_data.get('awaiting_address'):
-        profile = await sync_to_async(UserProfile.objects.get)(user_id=user_id)
-        profile.delivery_address = text
-        await sync_to_async(profile.save)()
+        await save_profile_fields(user_id, delivery_address=text)
         context.user_data['awaiting_address'] = False
 
         keyboard = [
@@ -168,9 +286,7 @@ async def handle_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
     contact = update.message.contact
 
     if context.user_data.get('awaiting_phone'):
-        profile = await sync_to_async(UserProfile.objects.get)(user_id=user_id)
-        profile.phone_number = contact.phone_number
-        await sync_to_async(profile.save)()
+        await save_profile_fields(user_id, phone_number=contact.phone_number)
         context.user_data['awaiting_phone'] = False
         context.user_data['awaiting_address'] = True
 
@@ -189,9 +305,7 @@ async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
     location = update.message.location
 
     if context.user_data.get('awaiting_address'):
-        profile = await sync_to_async(UserProfile.objects.get)(user_id=user_id)
-        profile.delivery_address = f"{location.latitude}, {location.longitude}"
-        await sync_to_async(profile.save)()
+        await save_profile_fields(user_id, delivery_address=f"{location.latitude}, {location.longitude}")
         context.user_data['awaiting_address'] = False
 
         keyboard = [
@@ -207,15 +321,27 @@ async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
-def main():
-    application = Application.builder().token(TOKEN).build()
+def build_application(updater=True):
+    """Создаёт приложение бота со всеми обработчиками. Для режима webhook ``updater=False``."""
+    builder = Application.builder().token(TOKEN).concurrent_updates(
+        PerUserUpdateProcessor(settings.BOT_CONCURRENT_UPDATES)
+    )
+    if not updater:
+        builder = builder.updater(None)
+    application = builder.build()
     application.add_handler(CommandHandler("start", start))
     application.add_handler(MessageHandler(filters.Text("📦 Мои заказы"), my_orders))
+    application.add_handler(CallbackQueryHandler(orders_page, pattern=rf"^{ORDERS_CALLBACK_PREFIX}:"))
     application.add_handler(MessageHandler(filters.Text("📝 Мои данные"), my_data))
     application.add_handler(CommandHandler("edit_data", edit_data))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     application.add_handler(MessageHandler(filters.CONTACT, handle_contact))
     application.add_handler(MessageHandler(filters.LOCATION, handle_location))
+    return application
+
+
+def main():
+    application = build_application()
     application.run_polling()
 
 
@@ -0,0 +1,91 @@
+import csv
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import OrderItem
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_HEADER = (
+    'Заказ', 'Дата', 'Telegram-ID', 'Имя', 'Телефон', 'Адрес', 'Комментарий', 'Статус', 'Сумма заказа',
+    'Товар', 'Размер', 'Количество', 'Цена за единицу', 'Сумма позиции',
+)
+
+
+# Ячейки с такого символа Excel считает формулой (или числом, как телефон «+998…»).
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """Псевдофайл для csv.writer: возвращает строку вместо записи в буфер."""
+
+    def write(self, value):
+        return value
+
+
+def order_status(order):
+    if order.is_rejected:
+        return 'Отклонён'
+    if order.is_confirmed:
+        return 'Подтверждён'
+    return 'Новый'
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Строки выгрузки: заголовок, затем по строке на каждый элемент заказа.
+
+    Заказы читаются потоком по ``chunk_size`` штук, элементы подгружаются
+    одним запросом на пачку, поэтому память не зависит от размера выгрузки.
+    """
+    yield EXPORT_HEADER
+    orders = queryset.order_by('pk').prefetch_related(
+        Prefetch('orderitem_set', queryset=OrderItem.objects.select_related('size').order_by('pk'))
+    )
+    for order in orders.iterator(chunk_size=chunk_size):
+        head = (
+            order.pk,
+            timezone.localtime(order.created_at).strftime('%d.%m.%Y %H:%M'),
+            order.user_id,
+            order.name or '',
+            order.phone_number or '',
+            order.address or '',
+            order.comment or '',
+            order_status(order),
+            order.total_price,
+        )
+        items = order.orderitem_set.all()
+        if not items:
+            yield head + ('', '', '', '', '')
+        for item in items:
+            yield head + (
+                item.product_name,
+                item.size.size if item.size else '',
+                item.quantity,
+                item.unit_price,
+                item.line_total,
+            )
+
+
+def safe_cell(value):
+    """Текст из Telegram (имя, адрес, комментарий) экранируется апострофом, чтобы Excel не выполнил его как формулу."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(rows):
+    """CSV построчно; BOM в начале нужен Excel, чтобы распознать UTF-8 с кириллицей."""
+    writer = csv.writer(Echo(), delimiter=';')
+    yield '\ufeff'
+    for row in rows:
+        yield writer.writerow([safe_cell(value) for value in row])
+
+
+def orders_csv_response(queryset, filename=None):
+    """Потоковый ответ с CSV: первые байты уходят клиенту до чтения всех заказов."""
+    filename = filename or f"orders-{timezone.localtime():%Y%m%d-%H%M}.csv"
+    response = StreamingHttpResponse(iter_csv(export_rows(queryset)), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,76 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+WEBP_QUALITY = 85
+
+# Производные изображения товара: (вид, ширина в пикселях)
+IMAGE_DERIVATIVES = (
+    ('thumb', 160),
+    ('card', 480),
+    ('full', 1080),
+)
+
+DERIVATIVES_DIR = 'products/derivatives'
+
+
+def convert_to_webp(image_file):
+    """Перекодирует файл изображения в WEBP. Возвращает ContentFile или None, если файл уже WEBP."""
+    ext = os.path.splitext(image_file.name)[-1].lower()
+    if ext == '.webp':
+        return None
+
+    img = Image.open(image_file)
+    img = img.convert('RGB')
+    output = BytesIO()
+    img.save(output, format='WEBP', quality=WEBP_QUALITY)
+    output.seek(0)
+
+    new_name = f"{os.path.splitext(os.path.basename(image_file.name))[0]}.webp"
+    return ContentFile(output.read(), new_name)
+
+
+def derivative_name(name, width):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f"{DERIVATIVES_DIR}/{stem}-{width}w.webp"
+
+
+def build_derivatives(name, storage=default_storage):
+    """
+    Создаёт производные изображения для файла ``name`` в хранилище.
+
+    Изображение не увеличивается: виды шире оригинала пропускаются.
+    Возвращает (ширина, высота, {вид: {'name', 'width', 'height'}}).
+    Функция не обращается к базе данных, поэтому её можно вызывать
+    из отдельных процессов.
+    """
+    with storage.open(name) as source:
+        img = Image.open(source)
+        img = img.convert('RGB')
+    width, height = img.size
+
+    derivatives = {}
+    for kind, target_width in IMAGE_DERIVATIVES:
+        if target_width >= width:
+            continue
+        target_height = round(height * target_width / width)
+        resized = img.resize((target_width, target_height), Image.LANCZOS)
+        output = BytesIO()
+        resized.save(output, format='WEBP', quality=WEBP_QUALITY)
+
+        path = derivative_name(name, target_width)
+        if storage.exists(path):
+            storage.delete(path)
+        path = storage.save(path, ContentFile(output.getvalue()))
+        derivatives[kind] = {'name': path, 'width': target_width, 'height': target_height}
+
+    return width, height, derivatives
+
+
+def delete_derivatives(derivatives, storage=default_storage):
+    for derivative in (derivatives or {}).values():
+        if storage.exists(derivative['name']):
+            storage.delete(derivative['name'])
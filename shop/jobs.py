@@ -0,0 +1,125 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_BACKOFF_BASE = 10  # секунд до первой повторной попытки
+JOB_BACKOFF_MAX = 60 * 60
+
+# Зарегистрированные обработчики задач: {имя: функция}
+_registry = {}
+
+
+def job(name):
+    """Регистрирует функцию как обработчик фоновой задачи с именем ``name``."""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def registered_tasks():
+    """Имена всех зарегистрированных задач по алфавиту."""
+    return sorted(_registry)
+
+
+def enqueue(name, delay=0, max_attempts=5, **payload):
+    """
+    Ставит задачу в очередь.
+
+    Запись создаётся в текущей транзакции, поэтому задача становится видна
+    обработчику только вместе с изменениями, которые её вызвали. Если включён
+    ``JOBS_EAGER``, задача выполняется сразу после фиксации транзакции.
+    """
+    if name not in _registry:
+        raise KeyError(f'Неизвестная задача: {name}')
+
+    job_obj = Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(lambda: run_job(job_obj.pk))
+    return job_obj
+
+
+def _available_jobs(now):
+    """Задачи, готовые к запуску, и задачи, у которых истёк таймаут видимости."""
+    return Job.objects.filter(
+        Q(status=Job.STATUS_PENDING, run_at__lte=now)
+        | Q(status=Job.STATUS_RUNNING, locked_until__lt=now)
+    )
+
+
+def claim_jobs(limit, visibility_timeout):
+    """
+    Захватывает до ``limit`` задач и возвращает их id.
+
+    Захваченная задача скрыта от других обработчиков на ``visibility_timeout``
+    секунд; если обработчик упадёт, задача снова станет доступной.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            _available_jobs(now)
+            .select_for_update(skip_locked=True)
+            .order_by('run_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        _available_jobs(now).filter(id__in=ids).update(
+            status=Job.STATUS_RUNNING,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            attempts=F('attempts') + 1,
+        )
+    return ids
+
+
+def backoff_delay(attempts):
+    return min(JOB_BACKOFF_BASE * 2 ** max(attempts - 1, 0), JOB_BACKOFF_MAX)
+
+
+def run_job(job_id):
+    """Выполняет задачу и записывает результат; при ошибке планирует повтор с задержкой."""
+    close_old_connections()
+    try:
+        job_obj = Job.objects.get(pk=job_id)
+        handler = _registry.get(job_obj.name)
+        try:
+            if handler is None:
+                raise KeyError(f'Неизвестная задача: {job_obj.name}')
+            handler(**job_obj.payload)
+        except Exception:
+            error = traceback.format_exc()
+            logger.exception('Ошибка в задаче %s', job_obj)
+            attempts = max(job_obj.attempts, 1)
+            if attempts >= job_obj.max_attempts:
+                Job.objects.filter(pk=job_id).update(
+                    status=Job.STATUS_FAILED, last_error=error, locked_until=None, finished_at=timezone.now(),
+                )
+            else:
+                Job.objects.filter(pk=job_id).update(
+                    status=Job.STATUS_PENDING,
+                    last_error=error,
+                    locked_until=None,
+                    run_at=timezone.now() + timedelta(seconds=backoff_delay(attempts)),
+                )
+            return False
+
+        Job.objects.filter(pk=job_id).update(
+            status=Job.STATUS_DONE, locked_until=None, finished_at=timezone.now(),
+        )
+        return True
+    finally:
+        close_old_connections()
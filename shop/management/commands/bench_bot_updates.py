@@ -0,0 +1,72 @@
+import asyncio
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from telegram import Update
+from telegram.ext import SimpleUpdateProcessor
+
+from shop.bot_processing import PerUserUpdateProcessor
+
+
+def make_updates(count, users, seed=0):
+    """Синтетическая пачка текстовых сообщений от ``users`` пользователей."""
+    rnd = random.Random(seed)
+    updates = []
+    for update_id in range(1, count + 1):
+        user_id = rnd.randint(1, users)
+        updates.append(Update.de_json({
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': 0,
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': user_id, 'is_bot': False, 'first_name': 'Bench'},
+                'text': '📦 Мои заказы',
+            },
+        }, None))
+    return updates
+
+
+async def replay(processor, updates, latency):
+    """Прогоняет обновления через обработчик так же, как Application, и проверяет порядок."""
+    seen = {}
+    violations = 0
+
+    async def handle(update):
+        nonlocal violations
+        await asyncio.sleep(latency)
+        user_id = update.effective_user.id
+        if seen.get(user_id, 0) > update.update_id:
+            violations += 1
+        seen[user_id] = update.update_id
+
+    async with processor:
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(processor.process_update(u, handle(u))) for u in updates]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    return elapsed, violations
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает последовательную и параллельную обработку пачки обновлений бота.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--updates', type=int, default=500)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--latency', type=float, default=0.02,
+                            help='Время обработки одного обновления, секунд (запрос к базе и ответ).')
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def handle(self, *args, **options):
+        updates = make_updates(options['updates'], options['users'])
+        for title, processor in (
+            ('последовательно', SimpleUpdateProcessor(1)),
+            (f'параллельно ({options["concurrency"]})', PerUserUpdateProcessor(options['concurrency'])),
+        ):
+            elapsed, violations = asyncio.run(replay(processor, updates, options['latency']))
+            self.stdout.write(
+                f'{title}: {elapsed:.2f} c, {len(updates) / elapsed:.0f} обновлений/с, '
+                f'нарушений порядка: {violations}'
+            )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.broadcast import BROADCAST_CHUNK_SIZE, BROADCAST_CONCURRENCY, run_broadcast
+from shop.models import Broadcast
+
+
+class Command(BaseCommand):
+    help = 'Создаёт рассылку всем пользователям бота и отправляет её либо продолжает прерванную.'
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument('--text', help='Текст новой рассылки (HTML).')
+        group.add_argument('--resume', type=int, metavar='ID', help='Продолжить рассылку с указанным id.')
+        parser.add_argument('--chunk-size', type=int, default=BROADCAST_CHUNK_SIZE)
+        parser.add_argument('--concurrency', type=int, default=BROADCAST_CONCURRENCY)
+
+    def handle(self, *args, **options):
+        if options['text']:
+            broadcast = Broadcast.objects.create(text=options['text'], status=Broadcast.STATUS_QUEUED)
+            self.stdout.write(f'Создана рассылка #{broadcast.pk}.')
+        else:
+            broadcast = Broadcast.objects.filter(pk=options['resume']).first()
+            if not broadcast:
+                raise CommandError(f'Рассылка #{options["resume"]} не найдена.')
+
+        if not run_broadcast(broadcast.pk, options['chunk_size'], options['concurrency']):
+            raise CommandError(f'Рассылка #{broadcast.pk} уже завершена или отправляется другим процессом.')
+
+        broadcast.refresh_from_db()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рассылка #{broadcast.pk} завершена: отправлено {broadcast.sent_count}, ошибок {broadcast.failed_count}.'
+        ))
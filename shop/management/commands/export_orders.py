@@ -0,0 +1,41 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from shop.analytics import day_bounds
+from shop.exports import export_rows, iter_csv
+from shop.models import Order
+
+STATUS_FILTERS = {
+    'new': {'is_confirmed': False, 'is_rejected': False},
+    'confirmed': {'is_confirmed': True},
+    'rejected': {'is_rejected': True},
+}
+
+
+class Command(BaseCommand):
+    help = 'Выгружает заказы с элементами в CSV (в файл или stdout) потоком, не загружая их в память.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='Первая дата (ГГГГ-ММ-ДД).')
+        parser.add_argument('--until', type=date.fromisoformat, help='Последняя дата (ГГГГ-ММ-ДД).')
+        parser.add_argument('--status', choices=sorted(STATUS_FILTERS))
+        parser.add_argument('--output', '-o', help='Файл для записи, по умолчанию stdout.')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['since']:
+            orders = orders.filter(created_at__gte=day_bounds(options['since'], options['since'])[0])
+        if options['until']:
+            orders = orders.filter(created_at__lt=day_bounds(options['until'], options['until'])[1])
+        if options['status']:
+            orders = orders.filter(**STATUS_FILTERS[options['status']])
+
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for line in iter_csv(export_rows(orders)):
+                output.write(line)
+        finally:
+            if options['output']:
+                output.close()
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет истёкшие сессии небольшими пачками, не блокируя таблицу надолго. '
+        'Запускайте по расписанию (например, cron раз в час).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.1, help='Пауза между пачками, в секундах.')
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in ('django.contrib.sessions.backends.db',
+                                           'django.contrib.sessions.backends.cached_db'):
+            raise CommandError('Команда работает только с сессиями в базе данных.')
+
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:options['batch_size']]
+            )
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'Удалено истёкших сессий: {deleted}.'))
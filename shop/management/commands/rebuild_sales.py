@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from shop.analytics import rebuild_daily_sales
+from shop.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает дневные сводки продаж по заказам частями по несколько дней. '
+        'Без параметров обрабатывает всю историю заказов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='Первая дата (ГГГГ-ММ-ДД).')
+        parser.add_argument('--until', type=date.fromisoformat, help='Последняя дата (ГГГГ-ММ-ДД), по умолчанию сегодня.')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Дней в одной транзакции.')
+
+    def handle(self, *args, **options):
+        until = options['until'] or timezone.localdate()
+        since = options['since']
+        if since is None:
+            first = Order.objects.order_by('created_at').values_list('created_at', flat=True).first()
+            if first is None:
+                self.stdout.write('Заказов нет.')
+                return
+            since = timezone.localdate(first)
+        if since > until:
+            raise CommandError('--since не может быть позже --until.')
+
+        days = 0
+        start = since
+        while start <= until:
+            end = min(start + timedelta(days=options['chunk_days'] - 1), until)
+            days += rebuild_daily_sales(start, end)
+            self.stdout.write(f'{start} — {end}: готово.')
+            start = end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Сводки пересобраны с {since} по {until}, дней с заказами: {days}.'))
@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from shop.catalog import invalidate_catalog
+from shop.images import build_derivatives
+from shop.models import ProductImage
+
+
+def _render(pk, name):
+    """Выполняется в дочернем процессе: только работа с файлами, без базы данных."""
+    width, height, derivatives = build_derivatives(name)
+    return pk, width, height, derivatives
+
+
+class Command(BaseCommand):
+    help = 'Пересоздаёт уменьшенные копии изображений товаров параллельно на всех ядрах процессора.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Количество процессов (по умолчанию — число ядер).')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Сколько записей сохранять в базу за один запрос.')
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Обрабатывать только изображения без уменьшенных копий.')
+
+    def handle(self, *args, **options):
+        queryset = ProductImage.objects.exclude(image='').order_by('pk')
+        if options['missing_only']:
+            queryset = queryset.filter(derivatives={})
+        images = list(queryset.values_list('pk', 'image'))
+        if not images:
+            self.stdout.write('Нет изображений для обработки.')
+            return
+
+        # Дочерние процессы не должны наследовать открытые соединения с базой.
+        connections.close_all()
+
+        batch_size = options['batch_size']
+        pending = []
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [executor.submit(_render, pk, name) for pk, name in images]
+            for future in as_completed(futures):
+                try:
+                    pk, width, height, derivatives = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'Ошибка при обработке изображения: {e}')
+                    continue
+                pending.append(ProductImage(pk=pk, width=width, height=height, derivatives=derivatives))
+                if len(pending) >= batch_size:
+                    done += self._flush(pending)
+        done += self._flush(pending)
+        invalidate_catalog()
+
+        self.stdout.write(self.style.SUCCESS(f'Обработано изображений: {done}, ошибок: {failed}.'))
+
+    def _flush(self, pending):
+        count = len(pending)
+        if pending:
+            ProductImage.objects.bulk_update(pending, ['width', 'height', 'derivatives'])
+            pending.clear()
+        return count
@@ -0,0 +1,61 @@
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from shop.jobs import claim_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Запускает обработчик фоновых задач из очереди в базе данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Количество параллельных задач.')
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread',
+                            help='Пул потоков или процессов (для задач, нагружающих процессор).')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза между опросами пустой очереди, в секундах.')
+        parser.add_argument('--visibility-timeout', type=int, default=300,
+                            help='Через сколько секунд незавершённая задача снова станет доступной.')
+        parser.add_argument('--once', action='store_true', help='Выполнить доступные задачи и завершиться.')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        if options['pool'] == 'process':
+            # Дочерние процессы открывают собственные соединения с базой.
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+
+        self.stdout.write(f'Обработчик задач запущен ({options["pool"]}, {workers}).')
+        running = set()
+        processed = 0
+        with executor:
+            while not self.stopping:
+                free = workers - len(running)
+                job_ids = claim_jobs(free, options['visibility_timeout']) if free else []
+                for job_id in job_ids:
+                    running.add(executor.submit(run_job, job_id))
+
+                if running:
+                    done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    processed += len(done)
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+
+            wait(running)
+            processed += len(running)
+
+        self.stdout.write(self.style.SUCCESS(f'Обработчик задач остановлен, выполнено задач: {processed}.'))
+
+    def _stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,31 @@
+import json
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Отправляет записанные JSON-обновления Telegram на webhook бота (для локальной проверки).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='JSON-файлы с одним обновлением или списком обновлений.')
+        parser.add_argument('--url', default=f'http://127.0.0.1:8000{settings.TELEGRAM_WEBHOOK_PATH}',
+                            help='Адрес webhook.')
+
+    def handle(self, *args, **options):
+        headers = {}
+        if settings.TELEGRAM_WEBHOOK_SECRET:
+            headers['X-Telegram-Bot-Api-Secret-Token'] = settings.TELEGRAM_WEBHOOK_SECRET
+
+        with httpx.Client(headers=headers) as client:
+            for path in options['files']:
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    raise CommandError(f'Не удалось прочитать {path}: {e}')
+
+                for update in data if isinstance(data, list) else [data]:
+                    response = client.post(options['url'], json=update)
+                    self.stdout.write(f"update_id={update.get('update_id')}: {response.status_code}")
@@ -0,0 +1,35 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from telegram import Bot
+
+from shop.notifications import send_notifications
+from shop.telegram_delivery import TelegramRateLimiter
+
+
+class Command(BaseCommand):
+    help = 'Отправляет уведомления из outbox покупателям в Telegram с учётом лимитов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Пауза между опросами пустой очереди, в секундах.')
+        parser.add_argument('--once', action='store_true', help='Отправить готовые уведомления и завершиться.')
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(self.run(options['poll_interval'], options['once']))
+        except KeyboardInterrupt:
+            pass
+
+    async def run(self, poll_interval, once):
+        limiter = TelegramRateLimiter()
+        async with Bot(settings.TELEGRAM_BOT_TOKEN) as bot:
+            while True:
+                sent = await send_notifications(bot, limiter)
+                if sent:
+                    self.stdout.write(f'Обработано уведомлений: {sent}')
+                elif once:
+                    return
+                else:
+                    await asyncio.sleep(poll_interval)
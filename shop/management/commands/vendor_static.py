@@ -0,0 +1,60 @@
+import os
+import posixpath
+import re
+from urllib.parse import urljoin
+from urllib.request import urlopen
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.static_files import VENDOR_ASSETS
+
+# Ссылки на source map убираем: самих карт нет, а collectstatic требует, чтобы файлы существовали.
+SOURCE_MAP_RE = re.compile(r'/[*/]# sourceMappingURL=[^\s*]+(?:\s*\*/)?')
+CSS_URL_RE = re.compile(r'url\(\s*["\']?([^"\')]+)["\']?\s*\)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Скачивает сторонние CSS/JS (Bootstrap, Font Awesome) вместе со шрифтами '
+        'в shop/static, чтобы страницы Web App не обращались к CDN. '
+        'Запускается перед collectstatic, скачанные файлы хранятся в репозитории.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=30, help='Таймаут одного запроса, секунд.')
+
+    def handle(self, *args, **options):
+        self.timeout = options['timeout']
+        self.static_root = os.path.join(apps.get_app_config('shop').path, 'static')
+        self.fetched = set()
+        for path, url in VENDOR_ASSETS.values():
+            self.fetch(url, path)
+        self.stdout.write(f'Скачано файлов: {len(self.fetched)}.')
+
+    def fetch(self, url, path):
+        if path in self.fetched:
+            return
+        self.fetched.add(path)
+        try:
+            with urlopen(url, timeout=self.timeout) as response:
+                data = response.read()
+        except OSError as e:
+            raise CommandError(f'Не удалось скачать {url}: {e}')
+
+        if path.endswith(('.css', '.js')):
+            text = SOURCE_MAP_RE.sub('', data.decode('utf-8'))
+            if path.endswith('.css'):
+                # Шрифты и картинки, на которые ссылается CSS, кладём по тем же относительным путям.
+                for ref in set(CSS_URL_RE.findall(text)):
+                    if ref.startswith(('data:', '#', '/', 'http:', 'https:')):
+                        continue
+                    ref = ref.split('#')[0].split('?')[0]
+                    self.fetch(urljoin(url, ref), posixpath.normpath(posixpath.join(posixpath.dirname(path), ref)))
+            data = text.encode('utf-8')
+
+        target = os.path.join(self.static_root, *path.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        self.stdout.write(f'{url} -> {path}')
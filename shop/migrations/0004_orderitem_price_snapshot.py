@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:01
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_price_snapshot(apps, schema_editor):
+    """Заполняет название, цену и сумму существующих элементов заказов пачками."""
+    OrderItem = apps.get_model('shop', 'OrderItem')
+    last_pk = 0
+    while True:
+        batch = list(
+            OrderItem.objects.filter(pk__gt=last_pk).select_related('product').order_by('pk')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for item in batch:
+            item.product_name = item.product.name
+            item.unit_price = item.product.price
+            item.line_total = item.product.price * item.quantity
+        OrderItem.objects.bulk_update(batch, ['product_name', 'unit_price', 'line_total'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_orderitem_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Общая стоимость'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Название товара'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Цена за единицу'),
+        ),
+        migrations.RunPython(backfill_price_snapshot, migrations.RunPython.noop),
+    ]
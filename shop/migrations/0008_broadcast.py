@@ -0,0 +1,50 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Broadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(verbose_name='Текст (HTML)')),
+                ('status', models.CharField(choices=[('draft', 'Черновик'), ('queued', 'В очереди'), ('running', 'Отправляется'), ('done', 'Завершена')], default='draft', max_length=10, verbose_name='Статус')),
+                ('last_profile_id', models.BigIntegerField(default=0, verbose_name='Обработано до профиля')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='Отправлено')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Ошибок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало отправки')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+            ],
+            options={
+                'verbose_name': 'Рассылка',
+                'verbose_name_plural': 'Рассылки',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BroadcastDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField(verbose_name='ID пользователя в Telegram')),
+                ('status', models.CharField(choices=[('sending', 'Отправляется'), ('sent', 'Доставлено'), ('failed', 'Ошибка')], default='sending', max_length=10, verbose_name='Статус')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Ошибка')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='shop.broadcast', verbose_name='Рассылка')),
+            ],
+            options={
+                'verbose_name': 'Доставка рассылки',
+                'verbose_name_plural': 'Доставки рассылки',
+                'constraints': [models.UniqueConstraint(fields=('broadcast', 'user_id'), name='shop_broadcast_delivery_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_broadcast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Ключ')),
+                ('items', models.JSONField(blank=True, default=list, verbose_name='Товары [id товара, id размера, количество]')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Корзина',
+                'verbose_name_plural': 'Корзины',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_cart'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user_id', '-created_at', '-id'], name='shop_order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='shop_order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_confirmed', False), ('is_rejected', False)), fields=['-created_at', '-id'], name='shop_order_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['is_confirmed', '-created_at', '-id'], name='shop_order_confirmed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['is_rejected', '-created_at', '-id'], name='shop_order_rejected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['phone_number'], name='shop_order_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['phone_number'], name='shop_profile_phone_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_order_profile_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='Заказов')),
+                ('items_count', models.IntegerField(default=0, verbose_name='Товаров (шт.)')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма заказов')),
+                ('confirmed_count', models.IntegerField(default=0, verbose_name='Подтверждено')),
+                ('confirmed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма подтверждённых')),
+                ('rejected_count', models.IntegerField(default=0, verbose_name='Отклонено')),
+                ('rejected_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма отклонённых')),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи по дням',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Количество')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.product', verbose_name='Продукт')),
+            ],
+            options={
+                'verbose_name': 'Продажи товара за день',
+                'verbose_name_plural': 'Продажи товаров по дням',
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='shop_daily_product_sales_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:22
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+# Миграция не импортирует shop.search: его изменения не должны менять уже применённую схему.
+SQLITE_TABLE = 'shop_product_fts'
+POSTGRES_TABLE = 'shop_product_search'
+POSTGRES_CONFIG = 'russian'
+
+_APOSTROPHES = str.maketrans('', '', "'`‘’ʻʼ")
+
+
+def normalize(text):
+    return (text or '').lower().replace('ё', 'е').translate(_APOSTROPHES)
+
+
+def build_search_index(apps, schema_editor):
+    """Создаёт поисковый индекс товаров и заполняет его пачками."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # unicode61 понимает кириллицу и латиницу; prefix ускоряет поиск по началу слова.
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+                f"name, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            insert = f'INSERT INTO {SQLITE_TABLE} (rowid, name, description) VALUES (%s, %s, %s)'
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+                f"product_id bigint PRIMARY KEY REFERENCES shop_product (id) ON DELETE CASCADE, "
+                f"document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_idx ON {POSTGRES_TABLE} USING gin (document)"
+            )
+            insert = (
+                f"INSERT INTO {POSTGRES_TABLE} (product_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'A') || "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B')) "
+                f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document"
+            )
+        else:
+            return
+
+    Product = apps.get_model('shop', 'Product')
+    last_pk = 0
+    while True:
+        batch = list(Product.objects.filter(pk__gt=last_pk).order_by('pk').only('name', 'description')[:BATCH_SIZE])
+        if not batch:
+            break
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                insert, [(product.pk, normalize(product.name), normalize(product.description)) for product in batch],
+            )
+        last_pk = batch[-1].pk
+
+
+def remove_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'DROP TABLE IF EXISTS {POSTGRES_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_daily_sales'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_index, remove_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_orderitem_unit_price_no_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='event',
+            field=models.CharField(choices=[('placed', 'Заказ оформлен'), ('confirmed', 'Заказ подтверждён'), ('rejected', 'Заказ отклонён')], max_length=20, verbose_name='Событие'),
+        ),
+    ]
@@ -1,10 +1,9 @@
-import os
-from io import BytesIO
-from django.core.files.base import ContentFile
-from PIL import Image
-from django.db import models
+from django.core.files.storage import default_storage
+from django.db import models, transaction
 from django.utils import timezone
 
+from .images import build_derivatives, convert_to_webp, delete_derivatives
+
 
 class Size(models.Model):
     size = models.CharField(max_length=10, verbose_name='Размер')
@@ -31,27 +30,86 @@ class Product(models.Model):
         verbose_name_plural = 'Продукты'
 
 
+class CatalogVersion(models.Model):
+    """
+    Версия каталога (единственная строка). Повышается при каждом изменении товаров,
+    изображений и размеров; по ней все процессы узнают, что снимок каталога устарел.
+    """
+    version = models.PositiveBigIntegerField(default=1, verbose_name='Версия')
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name='Дата изменения')
+
+    def __str__(self):
+        return f"Каталог, версия {self.version}"
+
+    class Meta:
+        verbose_name = 'Версия каталога'
+        verbose_name_plural = 'Версии каталога'
+
+
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images', verbose_name='Продукт')
     image = models.ImageField(upload_to='products/', verbose_name='Фото')
+    width = models.PositiveIntegerField(blank=True, null=True, verbose_name='Ширина')
+    height = models.PositiveIntegerField(blank=True, null=True, verbose_name='Высота')
+    derivatives = models.JSONField(default=dict, blank=True, verbose_name='Уменьшенные копии')
 
-    def save(self, *args, **kwargs):
-        if self.image:
-            try:
-                ext = os.path.splitext(self.image.name)[-1].lower()
-                if ext != '.webp':
-                    img = Image.open(self.image)
-                    img = img.convert('RGB')
-                    output = BytesIO()
-                    img.save(output, format='WEBP', quality=85)
-                    output.seek(0)
-
-                    new_name = f"{os.path.splitext(self.image.name)[0]}.webp"
-                    self.image = ContentFile(output.read(), new_name)
-            except Exception as e:
-                print(f"Ошибка при обработке изображения: {e}")
+    _loaded_image_name = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image_name = instance.__dict__.get('image')
+        return instance
 
+    def save(self, *args, **kwargs):
+        image_changed = bool(self.image) and self.image.name != self._loaded_image_name
         super().save(*args, **kwargs)
+        self._loaded_image_name = self.image.name if self.image else None
+
+        if image_changed:
+            # Перекодирование и уменьшенные копии создаются фоновой задачей.
+            from .jobs import enqueue
+            enqueue('shop.process_product_image', image_id=self.pk)
+
+    def process_image(self):
+        """Перекодирует изображение в WEBP и создаёт уменьшенные копии с их размерами."""
+        original_name = self.image.name
+        webp = convert_to_webp(self.image)
+        if webp:
+            self.image.save(webp.name, webp, save=False)
+            self._loaded_image_name = self.image.name
+
+        old_derivatives = self.derivatives
+        self.width, self.height, self.derivatives = build_derivatives(self.image.name)
+        self.save(update_fields=['image', 'width', 'height', 'derivatives'])
+
+        if webp:
+            self.image.storage.delete(original_name)
+        stale = {k: v for k, v in (old_derivatives or {}).items() if v not in self.derivatives.values()}
+        delete_derivatives(stale)
+
+    def derivative_url(self, kind):
+        derivative = self.derivatives.get(kind)
+        return default_storage.url(derivative['name']) if derivative else self.image.url
+
+    @property
+    def thumb_url(self):
+        return self.derivative_url('thumb')
+
+    @property
+    def card_url(self):
+        return self.derivative_url('card')
+
+    @property
+    def srcset(self):
+        """Значение атрибута srcset: все уменьшенные копии и оригинал с их шириной."""
+        candidates = [
+            f"{default_storage.url(d['name'])} {d['width']}w"
+            for d in sorted(self.derivatives.values(), key=lambda d: d['width'])
+        ]
+        if self.width:
+            candidates.append(f"{self.image.url} {self.width}w")
+        return ', '.join(candidates)
 
     class Meta:
         verbose_name = 'Изображение продукта'
@@ -73,22 +131,78 @@ class Order(models.Model):
     is_rejected = models.BooleanField(verbose_name='Отклоненный', default=False)
     rejected_at = models.DateTimeField(verbose_name='Дата отклонения', blank=True, null=True)
 
+    _loaded_status = (False, False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = (instance.__dict__.get('is_confirmed'), instance.__dict__.get('is_rejected'))
+        return instance
+
     def save(self, *args, **kwargs):
         if self.is_confirmed and not self.confirmed_at:
             self.confirmed_at = timezone.now()
         if self.is_rejected and not self.rejected_at:
             self.rejected_at = timezone.now()
-        super().save(*args, **kwargs)
+
+        adding = self._state.adding
+        loaded_confirmed, loaded_rejected = self._loaded_status
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Уведомление о смене статуса записывается в той же транзакции.
+            if self.is_confirmed and not loaded_confirmed:
+                Notification.for_status_change(self, Notification.EVENT_CONFIRMED).save()
+            if self.is_rejected and not loaded_rejected:
+                Notification.for_status_change(self, Notification.EVENT_REJECTED).save()
+            self._record_daily_sales(adding, loaded_confirmed, loaded_rejected)
+        self._loaded_status = (self.is_confirmed, self.is_rejected)
+
+    def _record_daily_sales(self, adding, loaded_confirmed, loaded_rejected):
+        """Учитывает новый заказ и смену его статусов в дневной сводке продаж."""
+        deltas = {}
+        if adding:
+            deltas.update(orders_count=1, revenue=self.total_price)
+        for prefix, flag, loaded in (('confirmed', self.is_confirmed, loaded_confirmed),
+                                     ('rejected', self.is_rejected, loaded_rejected)):
+            sign = int(bool(flag)) - int(bool(loaded))
+            if sign:
+                deltas[f'{prefix}_count'] = sign
+                deltas[f'{prefix}_revenue'] = sign * self.total_price
+        if deltas:
+            DailySales.add(timezone.localdate(self.created_at), **deltas)
+
+    def delete(self, *args, **kwargs):
+        # Сводка продаж вычитается по значениям из базы: объект в памяти мог устареть
+        # (например, после массового подтверждения через set_orders_status).
+        self.refresh_from_db(fields=['total_price', 'is_confirmed', 'is_rejected'])
+        return super().delete(*args, **kwargs)
+
+    def remove_from_daily_sales(self):
+        """Вычитает удалённый заказ из дневной сводки (его элементы вычитаются каждый отдельно)."""
+        deltas = {'orders_count': -1, 'revenue': -self.total_price}
+        for prefix, flag in (('confirmed', self.is_confirmed), ('rejected', self.is_rejected)):
+            if flag:
+                deltas[f'{prefix}_count'] = -1
+                deltas[f'{prefix}_revenue'] = -self.total_price
+        DailySales.add(timezone.localdate(self.created_at), **deltas)
 
     def calculate_total_price(self):
         """
-        Рассчитывает общую стоимость заказа на основе связанных товаров.
+        Рассчитывает общую стоимость заказа по зафиксированным суммам его элементов.
         """
-        self.total_price = sum(
-            item.quantity * item.product.price
-            for item in self.orderitem_set.all()
-        )
-        self.save()
+        old_total = self.total_price
+        with transaction.atomic():
+            self.total_price = self.orderitem_set.aggregate(total=models.Sum('line_total'))['total'] or 0
+            self.save(update_fields=['total_price'])
+
+            delta = self.total_price - old_total
+            if delta:
+                deltas = {'revenue': delta}
+                if self.is_confirmed:
+                    deltas['confirmed_revenue'] = delta
+                if self.is_rejected:
+                    deltas['rejected_revenue'] = delta
+                DailySales.add(timezone.localdate(self.created_at), **deltas)
 
     def __str__(self):
         return f"Заказ #{self.id} от {self.name or 'Неизвестного пользователя'}"
@@ -97,6 +211,19 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-created_at']
+        indexes = [
+            # История заказов в боте: WHERE user_id = ? ORDER BY created_at DESC, id DESC.
+            models.Index(fields=['user_id', '-created_at', '-id'], name='shop_order_user_created_idx'),
+            # Список заказов в админке (сортировка по умолчанию и фильтр по дате).
+            models.Index(fields=['-created_at', '-id'], name='shop_order_created_idx'),
+            models.Index(
+                fields=['-created_at', '-id'], name='shop_order_pending_idx',
+                condition=models.Q(is_confirmed=False, is_rejected=False),
+            ),
+            models.Index(fields=['is_confirmed', '-created_at', '-id'], name='shop_order_confirmed_idx'),
+            models.Index(fields=['is_rejected', '-created_at', '-id'], name='shop_order_rejected_idx'),
+            models.Index(fields=['phone_number'], name='shop_order_phone_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -105,10 +232,71 @@ class OrderItem(models.Model):
     product = models.ForeignKey('Product', on_delete=models.CASCADE, verbose_name='Продукт')
     size = models.ForeignKey('Size', on_delete=models.SET_NULL, verbose_name='Размер', null=True, blank=True)
     quantity = models.PositiveIntegerField(default=1, verbose_name='Количество')
+    product_name = models.CharField(max_length=255, blank=True, default='', verbose_name='Название товара')
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Цена за единицу')
+    line_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Общая стоимость')
+
+    # Загруженные из базы (id заказа, id товара, количество, сумма) — для сводок продаж при изменении.
+    _loaded_line = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_line = tuple(
+            instance.__dict__.get(field) for field in ('order_id', 'product_id', 'quantity', 'line_total')
+        )
+        return instance
+
+    def snapshot_price(self, product=None):
+        """Фиксирует название и цену товара на момент оформления заказа."""
+        product = product or self.product
+        self.product_name = product.name
+        self.unit_price = product.price
+        self.line_total = self.unit_price * self.quantity
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        loaded = self._loaded_line
+        if not adding and (loaded is None or None in loaded):
+            loaded = OrderItem.objects.filter(pk=self.pk).values_list(
+                'order_id', 'product_id', 'quantity', 'line_total',
+            ).first()
+
+        # При замене товара название и цена фиксируются заново; нулевая цена — допустимый снимок.
+        product_changed = loaded is not None and self.product_id != loaded[1]
+        if product_changed or not self.product_name or self.unit_price is None:
+            self.snapshot_price()
+        else:
+            self.line_total = self.unit_price * self.quantity
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                DailyProductSales.add_items(timezone.localdate(self.order.created_at), [self])
+            elif loaded is not None:
+                self._record_change(*loaded)
+        self._loaded_line = (self.order_id, self.product_id, self.quantity, self.line_total)
+
+    def delete(self, *args, **kwargs):
+        # Как и у заказа: вычитаются сохранённые в базе количество и сумма.
+        self.refresh_from_db(fields=['order', 'product', 'quantity', 'line_total'])
+        return super().delete(*args, **kwargs)
+
+    def _record_change(self, order_id, product_id, quantity, line_total):
+        """Переносит в сводках продаж старые количество и сумму элемента на новые."""
+        removed = (product_id, -quantity, -line_total)
+        added = (self.product_id, self.quantity, self.line_total)
+        date = timezone.localdate(self.order.created_at)
+        if order_id == self.order_id:
+            DailyProductSales.add_lines(date, [removed, added])
+            return
+        old_created_at = Order.objects.filter(pk=order_id).values_list('created_at', flat=True).first()
+        if old_created_at is not None:
+            DailyProductSales.add_lines(timezone.localdate(old_created_at), [removed])
+        DailyProductSales.add_lines(date, [added])
 
     def __str__(self):
         size_info = f" | Размер: {self.size}" if self.size else ""
-        return f"{self.product.name} (x{self.quantity}){size_info}"
+        return f"{self.product_name} (x{self.quantity}){size_info}"
 
     class Meta:
         verbose_name = 'Элемент заказа'
@@ -124,6 +312,262 @@ class UserProfile(models.Model):
     class Meta:
         verbose_name = "Профиль пользователя"
         verbose_name_plural = "Профили пользователей"
+        indexes = [
+            models.Index(fields=['phone_number'], name='shop_profile_phone_idx'),
+        ]
 
     def __str__(self):
         return f"Профиль {self.user_id}"
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди, хранящейся в базе данных проекта."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Выполнена'),
+        (STATUS_FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(max_length=100, verbose_name='Задача')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Параметры')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='Статус')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name='Максимум попыток')
+    run_at = models.DateTimeField(default=timezone.now, verbose_name='Запустить после')
+    locked_until = models.DateTimeField(blank=True, null=True, verbose_name='Заблокирована до')
+    last_error = models.TextField(blank=True, default='', verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='shop_job_status_run_at_idx'),
+        ]
+
+
+class Notification(models.Model):
+    """Исходящее сообщение покупателю в Telegram (outbox), отправляется командой send_notifications."""
+    EVENT_PLACED = 'placed'
+    EVENT_CONFIRMED = 'confirmed'
+    EVENT_REJECTED = 'rejected'
+    EVENT_CHOICES = (
+        (EVENT_PLACED, 'Заказ оформлен'),
+        (EVENT_CONFIRMED, 'Заказ подтверждён'),
+        (EVENT_REJECTED, 'Заказ отклонён'),
+    )
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Ожидает отправки'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_FAILED, 'Ошибка'),
+    )
+
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Заказ')
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES, verbose_name='Событие')
+    chat_id = models.BigIntegerField(verbose_name='ID чата в Telegram')
+    text = models.TextField(verbose_name='Текст')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='Статус')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    last_error = models.TextField(blank=True, default='', verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    sent_at = models.DateTimeField(blank=True, null=True, verbose_name='Дата отправки')
+
+    STATUS_TEXTS = {
+        EVENT_PLACED: (
+            "✅ <b>Заказ №{id} оформлен!</b>\n\n"
+            "💳 <b>Общая стоимость:</b> <code>{total:,} UZS</code>\n"
+            "Мы свяжемся с вами для подтверждения заказа."
+        ),
+        EVENT_CONFIRMED: "✅ <b>Ваш заказ №{id} подтверждён!</b>\n\n💳 Общая стоимость: <code>{total:,} UZS</code>",
+        EVENT_REJECTED: "❌ <b>Ваш заказ №{id} отклонён.</b>\n\nЕсли у вас есть вопросы, свяжитесь с нами.",
+    }
+
+    @classmethod
+    def for_status_change(cls, order, event):
+        """Создаёт (не сохраняя) уведомление об оформлении заказа или смене его статуса."""
+        return cls(
+            order_id=order.id,
+            event=event,
+            chat_id=order.user_id,
+            text=cls.STATUS_TEXTS[event].format(id=order.id, total=order.total_price),
+        )
+
+    def __str__(self):
+        return f"Уведомление #{self.id} для {self.chat_id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='shop_notif_status_next_idx'),
+        ]
+
+
+class Broadcast(models.Model):
+    """Рассылка сообщения всем пользователям бота."""
+    STATUS_DRAFT = 'draft'
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_CHOICES = (
+        (STATUS_DRAFT, 'Черновик'),
+        (STATUS_QUEUED, 'В очереди'),
+        (STATUS_RUNNING, 'Отправляется'),
+        (STATUS_DONE, 'Завершена'),
+    )
+
+    text = models.TextField(verbose_name='Текст (HTML)')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_DRAFT, verbose_name='Статус')
+    last_profile_id = models.BigIntegerField(default=0, verbose_name='Обработано до профиля')
+    sent_count = models.PositiveIntegerField(default=0, verbose_name='Отправлено')
+    failed_count = models.PositiveIntegerField(default=0, verbose_name='Ошибок')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name='Начало отправки')
+    heartbeat_at = models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность')
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')
+
+    def __str__(self):
+        return f"Рассылка #{self.id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = 'Рассылка'
+        verbose_name_plural = 'Рассылки'
+        ordering = ['-created_at']
+
+
+class BroadcastDelivery(models.Model):
+    """Статус доставки рассылки одному пользователю."""
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_SENDING, 'Отправляется'),
+        (STATUS_SENT, 'Доставлено'),
+        (STATUS_FAILED, 'Ошибка'),
+    )
+
+    broadcast = models.ForeignKey(Broadcast, on_delete=models.CASCADE, related_name='deliveries',
+                                  verbose_name='Рассылка')
+    user_id = models.BigIntegerField(verbose_name='ID пользователя в Telegram')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_SENDING, verbose_name='Статус')
+    error = models.TextField(blank=True, default='', verbose_name='Ошибка')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+
+    def __str__(self):
+        return f"{self.user_id}: {self.get_status_display()}"
+
+    class Meta:
+        verbose_name = 'Доставка рассылки'
+        verbose_name_plural = 'Доставки рассылки'
+        constraints = [
+            models.UniqueConstraint(fields=['broadcast', 'user_id'], name='shop_broadcast_delivery_unique'),
+        ]
+
+
+class Cart(models.Model):
+    """Сохранённая корзина: основное хранилище — кэш, сюда данные записываются с задержкой (write-behind)."""
+    key = models.CharField(max_length=64, unique=True, verbose_name='Ключ')
+    items = models.JSONField(default=list, blank=True, verbose_name='Товары [id товара, id размера, количество]')
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name='Дата изменения')
+
+    def __str__(self):
+        return f"Корзина {self.key}"
+
+    class Meta:
+        verbose_name = 'Корзина'
+        verbose_name_plural = 'Корзины'
+
+
+class DailySales(models.Model):
+    """
+    Сводка продаж за день по дате создания заказа.
+
+    Обновляется инкрементно при оформлении, изменении и удалении заказов и смене их статусов;
+    пересобирается командой ``rebuild_sales``.
+    """
+    date = models.DateField(unique=True, verbose_name='Дата')
+    orders_count = models.IntegerField(default=0, verbose_name='Заказов')
+    items_count = models.IntegerField(default=0, verbose_name='Товаров (шт.)')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Сумма заказов')
+    confirmed_count = models.IntegerField(default=0, verbose_name='Подтверждено')
+    confirmed_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                            verbose_name='Сумма подтверждённых')
+    rejected_count = models.IntegerField(default=0, verbose_name='Отклонено')
+    rejected_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                           verbose_name='Сумма отклонённых')
+
+    @classmethod
+    def add(cls, date, **deltas):
+        """Атомарно прибавляет значения к строке дня, создавая её при необходимости."""
+        cls.objects.bulk_create([cls(date=date)], ignore_conflicts=True)
+        cls.objects.filter(date=date).update(**{field: models.F(field) + value for field, value in deltas.items()})
+
+    def __str__(self):
+        return f"Продажи за {self.date}"
+
+    class Meta:
+        verbose_name = 'Продажи за день'
+        verbose_name_plural = 'Продажи по дням'
+        ordering = ['-date']
+
+
+class DailyProductSales(models.Model):
+    """Продажи товара за день: количество и сумма по всем оформленным заказам."""
+    date = models.DateField(verbose_name='Дата')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Продукт')
+    quantity = models.IntegerField(default=0, verbose_name='Количество')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Сумма')
+
+    @classmethod
+    def add_items(cls, date, items):
+        """Учитывает элементы заказа в сводках товаров и в общем числе проданных штук."""
+        cls.add_lines(date, [(item.product_id, item.quantity, item.line_total) for item in items])
+
+    @classmethod
+    def add_lines(cls, date, lines):
+        """
+        Прибавляет к сводкам товаров и к числу проданных штук изменения
+        ``[(id товара, количество, сумма)]``; значения могут быть отрицательными.
+        """
+        totals = {}
+        for product_id, quantity, revenue in lines:
+            total_quantity, total_revenue = totals.get(product_id, (0, 0))
+            totals[product_id] = (total_quantity + quantity, total_revenue + revenue)
+        totals = {product_id: delta for product_id, delta in totals.items() if any(delta)}
+        if not totals:
+            return
+
+        cls.objects.bulk_create(
+            [cls(date=date, product_id=product_id) for product_id in totals], ignore_conflicts=True,
+        )
+        for product_id, (quantity, revenue) in totals.items():
+            cls.objects.filter(date=date, product_id=product_id).update(
+                quantity=models.F('quantity') + quantity, revenue=models.F('revenue') + revenue,
+            )
+        items_count = sum(quantity for quantity, _ in totals.values())
+        if items_count:
+            DailySales.add(date, items_count=items_count)
+
+    def __str__(self):
+        return f"{self.product} за {self.date}"
+
+    class Meta:
+        verbose_name = 'Продажи товара за день'
+        verbose_name_plural = 'Продажи товаров по дням'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='shop_daily_product_sales_unique'),
+        ]
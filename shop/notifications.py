@@ -0,0 +1,103 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import backoff_delay
+from .models import DailySales, Notification, Order
+from .telegram_delivery import deliver
+
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_LEASE = 60  # секунд, на которые захваченное уведомление скрыто от других отправителей
+NOTIFICATION_MAX_ATTEMPTS = 5
+
+
+def set_orders_status(queryset, event):
+    """
+    Массово подтверждает или отклоняет заказы и ставит уведомления в outbox.
+
+    Изменение статуса, запись уведомлений и обновление дневной сводки
+    продаж выполняются в одной транзакции; затрагиваются только заказы,
+    статус которых действительно меняется.
+    Возвращает количество изменённых заказов.
+    """
+    if event == Notification.EVENT_CONFIRMED:
+        flag, stamp, prefix = 'is_confirmed', 'confirmed_at', 'confirmed'
+    else:
+        flag, stamp, prefix = 'is_rejected', 'rejected_at', 'rejected'
+
+    with transaction.atomic():
+        changed = Order.objects.filter(pk__in=queryset.values('pk'), **{flag: False})
+        orders = list(changed.select_for_update().only('id', 'user_id', 'total_price', 'created_at'))
+        if not orders:
+            return 0
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(
+            **{flag: True, stamp: timezone.now()}
+        )
+        Notification.objects.bulk_create(
+            [Notification.for_status_change(order, event) for order in orders],
+            batch_size=500,
+        )
+
+        daily = {}
+        for order in orders:
+            date = timezone.localdate(order.created_at)
+            count, revenue = daily.get(date, (0, 0))
+            daily[date] = (count + 1, revenue + order.total_price)
+        for date, (count, revenue) in daily.items():
+            DailySales.add(date, **{f'{prefix}_count': count, f'{prefix}_revenue': revenue})
+    return len(orders)
+
+
+def claim_notifications(limit=NOTIFICATION_BATCH_SIZE):
+    """Захватывает готовые к отправке уведомления на время аренды и возвращает их."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = Notification.objects.filter(status=Notification.STATUS_PENDING, next_attempt_at__lte=now)
+        notifications = list(due.select_for_update(skip_locked=True).order_by('next_attempt_at', 'id')[:limit])
+        if notifications:
+            Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(
+                next_attempt_at=now + timedelta(seconds=NOTIFICATION_LEASE)
+            )
+    return notifications
+
+
+def record_result(notification, result):
+    now = timezone.now()
+    if result.ok:
+        Notification.objects.filter(pk=notification.pk).update(
+            status=Notification.STATUS_SENT, sent_at=now, attempts=notification.attempts + 1, last_error='',
+        )
+        return
+
+    if result.retry_after is not None:
+        # Ограничение Telegram не считается неудачной попыткой.
+        Notification.objects.filter(pk=notification.pk).update(
+            next_attempt_at=now + timedelta(seconds=result.retry_after), last_error=result.error,
+        )
+        return
+
+    attempts = notification.attempts + 1
+    if result.permanent or attempts >= NOTIFICATION_MAX_ATTEMPTS:
+        Notification.objects.filter(pk=notification.pk).update(
+            status=Notification.STATUS_FAILED, attempts=attempts, last_error=result.error,
+        )
+    else:
+        Notification.objects.filter(pk=notification.pk).update(
+            attempts=attempts, last_error=result.error,
+            next_attempt_at=now + timedelta(seconds=backoff_delay(attempts)),
+        )
+
+
+async def send_notifications(bot, limiter):
+    """Отправляет одну пачку уведомлений параллельно с учётом лимитов. Возвращает размер пачки."""
+    notifications = await sync_to_async(claim_notifications)()
+
+    async def send(notification):
+        result = await deliver(bot, limiter, notification.chat_id, notification.text)
+        await sync_to_async(record_result)(notification, result)
+
+    await asyncio.gather(*(send(notification) for notification in notifications))
+    return len(notifications)
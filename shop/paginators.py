@@ -0,0 +1,49 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import AutoField, BigAutoField, Max
+from django.utils.functional import cached_property
+
+EXACT_COUNT_LIMIT = 10000
+
+
+def estimate_row_count(model, using):
+    """
+    Приблизительное число строк таблицы без COUNT(*) или None, если оценить нельзя.
+
+    PostgreSQL отдаёт статистику планировщика, SQLite — наибольший id
+    (расходится с числом строк только на число удалённых записей).
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        # reltuples = -1, пока таблица ни разу не анализировалась.
+        return row[0] if row and row[0] >= 0 else None
+    if connection.vendor == 'sqlite' and isinstance(model._meta.pk, (AutoField, BigAutoField)):
+        return model._base_manager.using(using).aggregate(max_id=Max('pk'))['max_id'] or 0
+    return None
+
+
+def capped_count(queryset, limit=EXACT_COUNT_LIMIT):
+    """Считает строки, но просматривает не больше ``limit + 1`` из них."""
+    return queryset.order_by()[:limit + 1].count()
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки для больших таблиц.
+
+    Без фильтров число строк берётся из оценки базы данных, с фильтрами
+    считается не больше EXACT_COUNT_LIMIT строк. Так страница списка
+    не выполняет COUNT(*) по всей таблице.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+                return estimate
+        return capped_count(queryset)
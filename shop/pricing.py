@@ -0,0 +1,96 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from .catalog import get_catalog
+
+
+class CartError(Exception):
+    """Ошибка проверки товара или размера в корзине."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@dataclass
+class CartLine:
+    product: object
+    size: object
+    quantity: int
+    subtotal: Decimal
+
+    @property
+    def size_id(self):
+        return self.size.id if self.size else None
+
+    @property
+    def image(self):
+        """Первое изображение товара из предзагруженного снимка каталога."""
+        images = self.product.images.all()
+        return images[0] if images else None
+
+
+@dataclass
+class PricedCart:
+    lines: list = field(default_factory=list)
+    total: Decimal = Decimal('0')
+
+    def __bool__(self):
+        return bool(self.lines)
+
+
+def parse_cart_key(key):
+    """Разбирает ключ корзины формата "productID-sizeID" в (product_id, size_id)."""
+    parts = str(key).split('-')
+    try:
+        product_id = int(parts[0])
+        size_id = int(parts[1]) if len(parts) == 2 else None
+    except ValueError:
+        return None, None
+    return product_id, size_id
+
+
+def validate_item(product_id, size_id, catalog=None):
+    """Проверяет, что товар существует и размер доступен для него. Возвращает (product, size)."""
+    catalog = catalog or get_catalog()
+    product = catalog.get_product(product_id)
+    if not product:
+        raise CartError('Товар не найден', status=404)
+
+    size = catalog.get_size(size_id)
+    if not size:
+        raise CartError('Размер не найден', status=404)
+
+    if not catalog.has_size(product_id, size_id):
+        raise CartError('Этот размер недоступен для данного товара')
+
+    return product, size
+
+
+def price_cart(cart_items, catalog=None):
+    """
+    Рассчитывает корзину (строки CartItem) по индексу цен снимка каталога.
+
+    Строки с удалёнными товарами пропускаются. Запросы к базе выполняются
+    только при пересборке снимка после изменения каталога.
+    """
+    catalog = catalog or get_catalog()
+    priced = PricedCart()
+
+    for product_id, size_id, quantity in cart_items:
+        product = catalog.get_product(product_id)
+        if not product or quantity <= 0:
+            continue
+
+        size = catalog.get_size(size_id) if size_id else None
+        subtotal = product.price * quantity
+        priced.lines.append(CartLine(product=product, size=size, quantity=quantity, subtotal=subtotal))
+        priced.total += subtotal
+
+    return priced
+
+
+def format_price(value):
+    """Форматирует сумму с пробелами между разрядами: 150000 -> "150 000"."""
+    return f"{value:,}".replace(",", " ")
@@ -0,0 +1,115 @@
+import re
+
+from django.db import connections, router
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 50
+SEARCH_MAX_TERMS = 10
+
+# Таблицы индекса создаёт миграция 0012_product_search.
+SQLITE_TABLE = 'shop_product_fts'
+POSTGRES_TABLE = 'shop_product_search'
+POSTGRES_CONFIG = 'russian'
+
+# Апострофы узбекской латиницы (oʻ, gʻ, ʼ) пишут по-разному; в индексе и запросе их убираем.
+_APOSTROPHES = str.maketrans('', '', "'`‘’ʻʼ")
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Текст для индекса и запроса: нижний регистр, «ё» как «е», без апострофов."""
+    return (text or '').lower().replace('ё', 'е').translate(_APOSTROPHES)
+
+
+def query_terms(query):
+    return _TOKEN_RE.findall(normalize(query))[:SEARCH_MAX_TERMS]
+
+
+def _connection():
+    return connections[router.db_for_write(Product)]
+
+
+def index_products(products, connection=None):
+    """Добавляет или обновляет товары (объекты с id, name, description) в поисковом индексе."""
+    connection = connection or _connection()
+    rows = [(product.id, normalize(product.name), normalize(product.description)) for product in products]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.executemany(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(f'INSERT INTO {SQLITE_TABLE} (rowid, name, description) VALUES (%s, %s, %s)', rows)
+        elif connection.vendor == 'postgresql':
+            cursor.executemany(
+                f"INSERT INTO {POSTGRES_TABLE} (product_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'A') || "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B')) "
+                f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+
+def unindex_product(product_id, connection=None):
+    connection = connection or _connection()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [product_id])
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'DELETE FROM {POSTGRES_TABLE} WHERE product_id = %s', [product_id])
+
+
+def _match(connection, terms):
+    """Условие поиска и его параметры: все слова запроса, каждое — как начало слова."""
+    if connection.vendor == 'sqlite':
+        return f'{SQLITE_TABLE} MATCH %s', [' '.join(f'"{term}"*' for term in terms)]
+    return (
+        f"document @@ to_tsquery('{POSTGRES_CONFIG}', %s)",
+        [' & '.join(f'{term}:*' for term in terms)],
+    )
+
+
+def search_product_ids(query, offset=0, limit=SEARCH_PAGE_SIZE):
+    """
+    Возвращает id товаров по релевантности (совпадения в названии весят больше)
+    и признак следующей страницы.
+
+    Сортируются все совпадения, поэтому лучший товар не теряется среди частых
+    слов; с LIMIT база держит в памяти только offset + limit лучших строк.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+
+    connection = connections[router.db_for_read(Product)]
+    condition, params = _match(connection, terms)
+    if connection.vendor == 'sqlite':
+        sql = (
+            f'SELECT rowid FROM {SQLITE_TABLE} WHERE {condition} '
+            f'ORDER BY bm25({SQLITE_TABLE}, 10.0, 1.0), rowid LIMIT %s OFFSET %s'
+        )
+    else:
+        sql = (
+            f"SELECT product_id FROM {POSTGRES_TABLE} WHERE {condition} "
+            f"ORDER BY ts_rank(document, to_tsquery('{POSTGRES_CONFIG}', %s)) DESC, product_id LIMIT %s OFFSET %s"
+        )
+        params = params + params
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit + 1, offset])
+        ids = [row[0] for row in cursor.fetchall()]
+    return ids[:limit], len(ids) > limit
+
+
+def filter_products(queryset, query):
+    """Ограничивает queryset товарами, найденными в поисковом индексе (без сортировки по релевантности)."""
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none()
+
+    connection = connections[queryset.db]
+    condition, params = _match(connection, terms)
+    column = 'rowid' if connection.vendor == 'sqlite' else 'product_id'
+    table = SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE
+    return queryset.filter(pk__in=RawSQL(f'SELECT {column} FROM {table} WHERE {condition}', params))
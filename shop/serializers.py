@@ -0,0 +1,116 @@
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from .models import Order, OrderItem, Product, ProductImage, Size
+
+
+class SparseFieldsMixin:
+    """
+    Оставляет в ответе только поля из параметра ``?fields=id,name,price``.
+
+    Без параметра сериализуются все поля; неизвестные имена игнорируются.
+    """
+
+    @classmethod
+    def requested_fields(cls, request):
+        fields = request.query_params.get('fields') if request is not None else None
+        if not fields:
+            return None
+        return {name.strip() for name in fields.split(',') if name.strip()}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.requested_fields(self.context.get('request'))
+        if requested is not None:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        return fields
+
+
+class SizeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Size
+        fields = ['id', 'size']
+
+
+class ProductImageSerializer(serializers.ModelSerializer):
+    url = serializers.CharField(source='card_url')
+    thumb_url = serializers.CharField()
+    srcset = serializers.CharField()
+
+    class Meta:
+        model = ProductImage
+        fields = ['url', 'thumb_url', 'srcset', 'width', 'height']
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    images = ProductImageSerializer(many=True, read_only=True)
+    sizes = SizeSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'description', 'price', 'images', 'sizes']
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None):
+        """Подгружает изображения и размеры отдельными запросами, только если эти поля запрошены."""
+        requested = cls.requested_fields(request)
+        if requested is None or 'images' in requested:
+            queryset = queryset.prefetch_related(
+                Prefetch('images', queryset=ProductImage.objects.exclude(image='').order_by('id')),
+            )
+        if requested is None or 'sizes' in requested:
+            queryset = queryset.prefetch_related('sizes')
+        return queryset
+
+
+class CartItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(min_value=1)
+    size_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(default=1)
+
+
+class CartLineSerializer(serializers.Serializer):
+    """Строка рассчитанной корзины (pricing.CartLine)."""
+    key = serializers.SerializerMethodField()
+    product_id = serializers.IntegerField(source='product.id')
+    name = serializers.CharField(source='product.name')
+    price = serializers.DecimalField(source='product.price', max_digits=10, decimal_places=2)
+    size_id = serializers.IntegerField(allow_null=True)
+    size = serializers.CharField(source='size.size', allow_null=True, default=None)
+    quantity = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+    def get_key(self, line):
+        """Ключ строки в формате "productID-sizeID", как в адресе удаления из корзины."""
+        return f'{line.product.id}-{line.size_id}' if line.size_id else str(line.product.id)
+
+
+class CheckoutSerializer(serializers.Serializer):
+    """Контакты для заказа; незаполненные берутся из профиля пользователя."""
+    name = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    phone_number = serializers.CharField(required=False, allow_blank=True, max_length=15)
+    address = serializers.CharField(required=False, allow_blank=True)
+    comment = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    size = serializers.CharField(source='size.size', allow_null=True, default=None)
+
+    class Meta:
+        model = OrderItem
+        fields = ['product_id', 'product_name', 'size_id', 'size', 'quantity', 'unit_price', 'line_total']
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    """Заказ без контактов покупателя (имени, телефона и адреса)."""
+    items = OrderItemSerializer(source='orderitem_set', many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'created_at', 'comment', 'total_price', 'items']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(
+            Prefetch('orderitem_set', queryset=OrderItem.objects.select_related('size').order_by('id')),
+        )
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .catalog import invalidate_catalog
+from .models import DailyProductSales, DailySales, Order, OrderItem, Product, ProductImage, Size
+from .search import index_products, unindex_product
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Size)
+@receiver(post_delete, sender=Size)
+def catalog_changed(sender, **kwargs):
+    """Сбрасывает снимок каталога при изменении товаров, изображений или размеров."""
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(m2m_changed, sender=Product.sizes.through)
+def product_sizes_changed(sender, action, **kwargs):
+    """Сбрасывает снимок каталога при изменении размеров товара."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    """Обновляет товар в поисковом индексе в той же транзакции, что и сохранение."""
+    index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    unindex_product(instance.pk)
+
+
+@receiver(post_delete, sender=OrderItem)
+def order_item_deleted(sender, instance, origin=None, **kwargs):
+    """Вычитает удалённый элемент заказа из сводок продаж (и при удалении запросом или каскадом)."""
+    # Элементы удаляются раньше заказа, поэтому его дата ещё доступна.
+    created_at = Order.objects.filter(pk=instance.order_id).values_list('created_at', flat=True).first()
+    if created_at is None:
+        return
+    date = timezone.localdate(created_at)
+    if isinstance(origin, Product) or (isinstance(origin, QuerySet) and origin.model is Product):
+        # Сводки удаляемого товара удаляются вместе с ним; остаётся только общее число штук.
+        DailySales.add(date, items_count=-instance.quantity)
+        return
+    DailyProductSales.add_lines(date, [(instance.product_id, -instance.quantity, -instance.line_total)])
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    instance.remove_from_daily_sales()
@@ -0,0 +1,165 @@
+import gzip
+import logging
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него собираются только .gz
+    brotli = None
+
+# Сторонние CSS/JS: имя -> (путь в static, исходный адрес на CDN).
+# Локальные копии скачивает команда vendor_static; пока их нет, страницы ссылаются на CDN.
+VENDOR_ASSETS = {
+    'bootstrap.css': (
+        'shop/vendor/bootstrap/css/bootstrap.min.css',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    ),
+    'bootstrap.js': (
+        'shop/vendor/bootstrap/js/bootstrap.bundle.min.js',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    ),
+    'fontawesome.css': (
+        'shop/vendor/fontawesome/css/all.min.css',
+        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css',
+    ),
+}
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml', '.ttf', '.eot')
+COMPRESS_MIN_SIZE = 1024
+# Файлы с хэшем в имени не меняются никогда.
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+_ACCEPT_ENCODING_RE = re.compile(r'([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?')
+
+
+def compress_file(path):
+    """Сохраняет рядом с файлом .gz (и .br, если установлен brotli), если сжатие даёт выигрыш."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return
+
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Хранилище статики с хэшем содержимого в именах файлов и сжатыми копиями
+    (.gz, .br), которые создаются при collectstatic.
+
+    Пока collectstatic не запускался (манифеста нет), файлы адресуются
+    по исходным именам — так работают runserver и тесты.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        """Добавляет хэши в имена и сжатые копии; предупреждает, если сторонние файлы не скачаны."""
+        missing = sorted(path for path, _ in VENDOR_ASSETS.values() if path not in paths)
+        if missing:
+            logger.warning(
+                'Нет локальных копий сторонних файлов (%s), страницы загружают их с CDN. '
+                'Скачайте их командой `manage.py vendor_static`.', ', '.join(missing),
+            )
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(paths) | set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                compress_file(self.path(name))
+
+    @cached_property
+    def immutable_names(self):
+        return set(self.hashed_files.values())
+
+
+def accepted_encodings(request):
+    accepted = set()
+    for coding, quality in _ACCEPT_ENCODING_RE.findall(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        try:
+            if not quality or float(quality) > 0:
+                accepted.add(coding.lower())
+        except ValueError:
+            continue
+    return accepted
+
+
+def serve_file(request, path, document_root, max_age, immutable=False):
+    """
+    Отдаёт файл из ``document_root`` со сроком кэширования ``max_age``.
+
+    Если клиент принимает br/gzip и рядом лежит сжатая копия, отдаётся она.
+    """
+    try:
+        fullpath = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    mtime = os.stat(fullpath).st_mtime
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime):
+        response = HttpResponseNotModified()
+    else:
+        content_type, _ = mimetypes.guess_type(fullpath)
+        served, content_encoding = fullpath, None
+        accepted = accepted_encodings(request)
+        for coding, suffix in ENCODINGS:
+            if coding in accepted and os.path.isfile(fullpath + suffix):
+                served, content_encoding = fullpath + suffix, coding
+                break
+        response = FileResponse(
+            open(served, 'rb'), content_type=content_type or 'application/octet-stream',
+            filename=os.path.basename(fullpath),
+        )
+        response['Last-Modified'] = http_date(mtime)
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+
+    if fullpath.endswith(COMPRESSIBLE_EXTENSIONS):
+        patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, public=True, max_age=max_age)
+    if immutable:
+        patch_cache_control(response, immutable=True)
+    return response
+
+
+def static_view(request, path):
+    """Статика из STATIC_ROOT; файлы с хэшем в имени кэшируются браузером на год."""
+    immutable = path in getattr(staticfiles_storage, 'immutable_names', ())
+    max_age = IMMUTABLE_MAX_AGE if immutable else settings.STATIC_MAX_AGE
+    return serve_file(request, path, settings.STATIC_ROOT, max_age, immutable)
+
+
+def media_view(request, path):
+    """
+    Загруженные файлы (фото товаров и их производные) из MEDIA_ROOT.
+
+    Имена загрузок не переиспользуются, а производные пересобираются из того
+    же оригинала, поэтому срок кэширования долгий.
+    """
+    return serve_file(request, path, settings.MEDIA_ROOT, settings.MEDIA_MAX_AGE)
@@ -0,0 +1,42 @@
+from .broadcast import run_broadcast
+from .jobs import job
+from .models import Notification, Order, ProductImage
+
+
+@job('shop.process_product_image')
+def process_product_image(image_id):
+    """Перекодирует загруженное изображение товара и создаёт уменьшенные копии."""
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image and image.image:
+        image.process_image()
+
+
+@job('shop.recalculate_order_total')
+def recalculate_order_total(order_id):
+    """Пересчитывает общую стоимость заказа после изменений в админке."""
+    order = Order.objects.filter(pk=order_id).first()
+    if order:
+        order.calculate_total_price()
+
+
+@job('shop.notify_order_placed')
+def notify_order_placed(order_id):
+    """
+    Ставит в outbox подтверждение оформленного заказа; отправляет его send_notifications
+    с общими лимитами и повторами. Повторный запуск задачи второе уведомление не создаёт.
+    """
+    order = Order.objects.filter(pk=order_id).first()
+    if not order:
+        return
+
+    notification = Notification.for_status_change(order, Notification.EVENT_PLACED)
+    Notification.objects.get_or_create(
+        order=order, event=Notification.EVENT_PLACED,
+        defaults={'chat_id': notification.chat_id, 'text': notification.text},
+    )
+
+
+@job('shop.run_broadcast')
+def run_broadcast_job(broadcast_id):
+    """Отправляет рассылку (или продолжает её с контрольной точки)."""
+    run_broadcast(broadcast_id)
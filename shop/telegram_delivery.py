@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+
+class TokenBucket:
+    """Корзина токенов: не более ``rate`` событий в секунду со всплесками до ``capacity``."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        # Во время паузы ``updated`` указывает в будущее, и токены не пополняются.
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(max(self.updated - time.monotonic(), 0) + (1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Не выдаёт токены ``seconds`` секунд, затем пополняется с нуля, без всплеска."""
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+
+class TelegramRateLimiter:
+    """
+    Ограничитель отправки под лимиты Telegram: общий (по умолчанию 30 сообщений
+    в секунду) и для каждого чата (по умолчанию 1 сообщение в секунду).
+    """
+
+    def __init__(self, global_rate=None, per_chat_rate=None, max_chats=10000):
+        self.global_bucket = TokenBucket(global_rate or settings.TELEGRAM_GLOBAL_RATE)
+        self.per_chat_rate = per_chat_rate or settings.TELEGRAM_PER_CHAT_RATE
+        self.max_chats = max_chats
+        self.chat_buckets = OrderedDict()
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.pop(chat_id, None) or TokenBucket(self.per_chat_rate, 1)
+        self.chat_buckets[chat_id] = bucket
+        if len(self.chat_buckets) > self.max_chats:
+            self.chat_buckets.popitem(last=False)
+        return bucket
+
+    async def wait(self, chat_id):
+        await self._chat_bucket(chat_id).acquire()
+        await self.global_bucket.acquire()
+
+    def pause(self, seconds):
+        """Приостанавливает все отправки через этот ограничитель (ответ Telegram RetryAfter)."""
+        self.global_bucket.pause(seconds)
+
+
+class DeliveryResult:
+    """Результат отправки: ``ok``, ``error``, ``retry_after`` (секунд) и ``permanent`` (повтор бесполезен)."""
+
+    def __init__(self, ok, error='', retry_after=None, permanent=False):
+        self.ok = ok
+        self.error = error
+        self.retry_after = retry_after
+        self.permanent = permanent
+
+
+async def deliver(bot, limiter, chat_id, text, parse_mode='HTML'):
+    """Отправляет сообщение с соблюдением лимитов и классифицирует ошибку."""
+    await limiter.wait(chat_id)
+    try:
+        await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+    except RetryAfter as e:
+        retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+        # Лимит превышен для всего бота, поэтому ждут все отправки, а не только это сообщение.
+        limiter.pause(retry_after)
+        return DeliveryResult(False, str(e), retry_after=retry_after)
+    except (Forbidden, BadRequest) as e:
+        # Пользователь заблокировал бота или чат не существует.
+        return DeliveryResult(False, str(e), permanent=True)
+    except TelegramError as e:
+        return DeliveryResult(False, str(e))
+    return DeliveryResult(True)
@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+from django import template
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+
+from shop.static_files import VENDOR_ASSETS
+
+register = template.Library()
+
+
+@lru_cache(maxsize=None)
+def _is_vendored(path):
+    return finders.find(path) is not None
+
+
+@register.simple_tag
+def vendor_asset(name):
+    """
+    Адрес стороннего CSS/JS: локальная копия из static, если она скачана
+    командой vendor_static, иначе исходный адрес на CDN.
+    """
+    path, cdn_url = VENDOR_ASSETS[name]
+    return static(path) if _is_vendored(path) else cdn_url
@@ -1,3 +1,1620 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, router, transaction
+from django.db.models import F
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from PIL import Image
+from telegram.error import RetryAfter
+
+from shop.analytics import rebuild_daily_sales
+from shop import catalog as catalog_module
+from shop.bot_processing import PerUserUpdateProcessor
+from shop.bot_repository import get_or_create_profile, save_profile_fields
+from shop.bot_webhook import TelegramWebhookMiddleware
+from shop.broadcast import run_broadcast
+from shop.cart import CartContents, CartItem, CartStore, WriteBehind, write_behind
+from shop.catalog import (
+    CATALOG_MAX_PAGE_SIZE, CATALOG_PAGE_SIZE, PRICE_BUCKETS, build_catalog_snapshot, get_catalog,
+    invalidate_catalog, price_bucket,
+)
+from shop.db_routing import REPLICA_DB_ALIAS, REPLICA_PIN_KEY, replica_reads
+from shop.divakidsbot import (
+    MESSAGE_LIMIT, ORDERS_CALLBACK_PREFIX, ORDERS_PAGE_SIZE, encode_orders_cursor, get_orders_page, orders_keyboard,
+    split_message,
+)
+from shop.exports import EXPORT_HEADER, export_rows, orders_csv_response
+from shop.jobs import backoff_delay, claim_jobs, enqueue, job, run_job
+from shop.management.commands.bench_bot_updates import make_updates
+from shop.models import (
+    Broadcast, BroadcastDelivery, Cart, CatalogVersion, DailyProductSales, DailySales, Job, Notification, Order,
+    OrderItem, Product, ProductImage, Size, UserProfile,
+)
+from shop.notifications import set_orders_status
+from shop.pricing import CartError, format_price, price_cart, validate_item
+from shop.search import index_products, search_product_ids
+from shop.static_files import VENDOR_ASSETS
+from shop.templatetags.assets import _is_vendored
+from shop.webapp_auth import init_data_hash
+from shop.tasks import notify_order_placed
+from shop.telegram_delivery import TelegramRateLimiter, deliver
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'carts': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'carts'},
+}
+
+
+def reset_carts():
+    """
+    Корзины живут вне транзакции теста: кэш и буфер фонового сброса очищаются вручную,
+    иначе корзина достанется следующему тесту или сбросится в базу посреди него.
+    """
+    caches['carts'].clear()
+    with write_behind.lock:
+        write_behind.dirty.clear()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogVersionTests(TestCase):
+    """Версия каталога хранится в базе, поэтому снимок устаревает во всех процессах сразу."""
+
+    def test_invalidation_from_another_process(self):
+        size = Size.objects.create(size='M')
+        product = Product.objects.create(name='Платье', description='', price=1000)
+        product.sizes.add(size)
+        invalidate_catalog()
+        self.assertEqual(get_catalog().get_product(product.pk).price, 1000)
+
+        # Так каталог меняет обработчик задач или другой воркер: у него свой кэш
+        # в памяти, общая только база, где он и повышает версию.
+        Product.objects.filter(pk=product.pk).update(price=900)
+        CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1, changed_at=timezone.now())
+
+        self.assertEqual(get_catalog().get_product(product.pk).price, 900)
+        self.assertEqual(price_cart([CartItem(product.pk, size.pk, 2)]).total, 1800)
+
+
+class CatalogFacetTests(TestCase):
+    """Фильтры и счётчики фасетов по битовым маскам совпадают с прямым перебором товаров."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.s, cls.m, cls.l = (Size.objects.create(size=size) for size in ('S', 'M', 'L'))
+        prices = [50000, 150000, 250000, 350000, 600000, 120000, 80000, 450000, 700000, 180000, 90000, 260000]
+        for i, price in enumerate(prices):
+            product = Product.objects.create(name=f'Товар {i}', description='', price=price)
+            product.sizes.set([cls.s, cls.m, cls.l][:i % 3 + 1] if i % 4 else [cls.l])
+
+    def setUp(self):
+        self.snapshot = build_catalog_snapshot(version=1)
+
+    def matching(self, size_ids=(), price_keys=()):
+        """Id товаров, подходящих под фильтр: любой из размеров и любой из ценовых диапазонов."""
+        return [
+            product.id for product in self.snapshot
+            if (not size_ids or {size.id for size in product.sizes.all()} & set(size_ids))
+            and (not price_keys or price_bucket(product.price) in price_keys)
+        ]
+
+    def ids(self, mask):
+        return [product.id for position, product in enumerate(self.snapshot) if mask >> position & 1]
+
+    def test_filter_mask(self):
+        self.assertIsNone(self.snapshot.filter_mask())
+        # Внутри фасета — ИЛИ.
+        self.assertEqual(self.ids(self.snapshot.filter_mask(size_ids=[self.s.id, self.m.id])),
+                         self.matching(size_ids=[self.s.id, self.m.id]))
+        self.assertEqual(self.ids(self.snapshot.filter_mask(price_keys=['to100', 'from500'])),
+                         self.matching(price_keys=['to100', 'from500']))
+        # Между фасетами — И.
+        filters = {'size_ids': [self.s.id], 'price_keys': ['to100', '100-200']}
+        self.assertEqual(self.ids(self.snapshot.filter_mask(**filters)), self.matching(**filters))
+        self.assertTrue(self.matching(**filters))
+        self.assertLess(len(self.matching(**filters)), len(self.matching(size_ids=[self.s.id])))
+        # Неизвестный размер ничего не находит, а не снимает фильтр.
+        self.assertEqual(self.snapshot.filter_mask(size_ids=[0]), 0)
+
+    def test_facet_counts_use_the_other_facet_filter(self):
+        size_ids, price_keys = [self.m.id], ['to100', '200-300']
+        counts = self.snapshot.facet_counts(size_ids=size_ids, price_keys=price_keys)
+
+        self.assertEqual(
+            [(row['id'], row['count'], row['selected']) for row in counts['sizes']],
+            [(size.id, len(self.matching([size.id], price_keys)), size.id in size_ids)
+             for size in (self.s, self.m, self.l)],
+        )
+        self.assertEqual(
+            [(row['key'], row['count'], row['selected']) for row in counts['prices']],
+            [(key, len(self.matching(size_ids, [key])), key in price_keys) for key, *_ in PRICE_BUCKETS],
+        )
+
+        unfiltered = self.snapshot.facet_counts()
+        self.assertEqual([row['count'] for row in unfiltered['prices']],
+                         [len(self.matching(price_keys=[key])) for key, *_ in PRICE_BUCKETS])
+
+    def test_filtered_pages_continue_without_gaps(self):
+        filters = {'size_ids': [self.s.id, self.l.id], 'price_keys': ['to100', '100-200', 'from500']}
+        mask = self.snapshot.filter_mask(**filters)
+        expected = self.matching(**filters)
+        self.assertGreater(len(expected), 2)
+
+        for limit in (1, 2, len(expected), len(expected) + 1):
+            seen, after = [], None
+            while True:
+                products, after = self.snapshot.page(after=after, limit=limit, mask=mask)
+                self.assertLessEqual(len(products), limit)
+                seen += [product.id for product in products]
+                if after is None:
+                    break
+                self.assertEqual(after, seen[-1])
+            self.assertEqual(seen, expected, f'limit={limit}')
+
+        self.assertEqual(self.snapshot.page(mask=0), ([], None))
+
+
+class OrderItemSnapshotTests(TestCase):
+    """Название и цена элемента заказа фиксируются при создании и при замене товара."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dress = Product.objects.create(name='Платье', description='', price=1000)
+        cls.gift = Product.objects.create(name='Подарок', description='', price=0)
+        cls.order = Order.objects.create(user_id=42, name='Анна', phone_number='+998901234567', address='Ташкент')
+
+    def test_product_change_takes_new_snapshot(self):
+        item = OrderItem.objects.create(order=self.order, product=self.dress, quantity=2)
+        Product.objects.filter(pk=self.dress.pk).update(name='Платье (новое)', price=1200)
+
+        item = OrderItem.objects.get(pk=item.pk)
+        item.quantity = 3
+        item.save()
+        self.assertEqual((item.product_name, item.unit_price, item.line_total), ('Платье', 1000, 3000))
+
+        item.product = self.gift
+        item.save()
+        item.refresh_from_db()
+        self.assertEqual((item.product_name, item.unit_price, item.line_total), ('Подарок', 0, 0))
+
+    def test_zero_price_is_kept(self):
+        item = OrderItem.objects.create(order=self.order, product=self.gift, quantity=1)
+        Product.objects.filter(pk=self.gift.pk).update(price=500)
+
+        item = OrderItem.objects.get(pk=item.pk)
+        item.quantity = 2
+        item.save()
+        self.assertEqual((item.unit_price, item.line_total), (0, 0))
+
+
+class ProductImageProcessingTests(TestCase):
+    """Загруженное фото перекодируется в WEBP, а уменьшенные копии попадают в derivatives и srcset."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, MEDIA_URL='/media/')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_process_image(self):
+        output = BytesIO()
+        Image.new('RGB', (1200, 600), 'red').save(output, format='PNG')
+        product = Product.objects.create(name='Платье', description='', price=1000)
+        image = ProductImage.objects.create(
+            product=product, image=SimpleUploadedFile('dress.png', output.getvalue(), 'image/png'),
+        )
+        original_name = image.image.name
+
+        image.process_image()
+        image.refresh_from_db()
+
+        self.assertTrue(image.image.name.endswith('.webp'))
+        self.assertFalse(default_storage.exists(original_name))
+        self.assertEqual((image.width, image.height), (1200, 600))
+        self.assertEqual(
+            {kind: (d['width'], d['height']) for kind, d in image.derivatives.items()},
+            {'thumb': (160, 80), 'card': (480, 240), 'full': (1080, 540)},
+        )
+        for derivative in image.derivatives.values():
+            with default_storage.open(derivative['name']) as f:
+                self.assertEqual(Image.open(f).format, 'WEBP')
+
+        names = {kind: d['name'] for kind, d in image.derivatives.items()}
+        self.assertEqual(image.thumb_url, f"/media/{names['thumb']}")
+        self.assertEqual(image.srcset, ', '.join([
+            f"/media/{names['thumb']} 160w",
+            f"/media/{names['card']} 480w",
+            f"/media/{names['full']} 1080w",
+            f"/media/{image.image.name} 1200w",
+        ]))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CheckoutAtomicityTests(TestCase):
+    """Сбой на любом шаге оформления не оставляет ни заказа, ни сводок, ни задач, а корзина сохраняется."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.size = Size.objects.create(size='M')
+        cls.product = Product.objects.create(name='Платье', description='', price=1000)
+        cls.product.sizes.add(cls.size)
+
+    def setUp(self):
+        self.addCleanup(reset_carts)
+        self.store = CartStore('u:42')
+        self.store.save(CartContents({(self.product.pk, self.size.pk): 2}))
+
+    def place_order(self):
+        response = self.client.post('/shop/place_order/', {
+            'user_id': 42, 'name': 'Анна', 'phone_number': '+998901234567', 'address': 'Ташкент',
+        })
+        return response.json()
+
+    def assertNothingSaved(self, cart_items):
+        for model in (Order, OrderItem, DailySales, DailyProductSales, Job):
+            self.assertFalse(model.objects.exists(), model.__name__)
+        self.assertEqual(self.store.load().items(), cart_items)
+
+    def test_missing_product(self):
+        contents = self.store.load()
+        contents.add(self.product.pk + 1000, self.size.pk, 1)
+        self.store.save(contents)
+
+        result = self.place_order()
+        self.assertFalse(result['success'])
+        self.assertIn('не найден', result['message'])
+        self.assertNothingSaved(contents.items())
+
+    def test_failure_after_order_is_written(self):
+        cart_items = self.store.load().items()
+        failures = (
+            mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=RuntimeError('сбой')),
+            mock.patch.object(DailyProductSales, 'add_items', side_effect=RuntimeError('сбой')),
+            mock.patch('shop.checkout.enqueue', side_effect=RuntimeError('сбой')),
+        )
+        for failure in failures:
+            with self.subTest(failure=failure.attribute), failure:
+                result = self.place_order()
+                self.assertFalse(result['success'])
+                self.assertNothingSaved(cart_items)
+
+
+@job('shop.tests.failing')
+def failing_task():
+    raise RuntimeError('сбой задачи')
+
+
+class JobQueueTests(TestCase):
+    """Повторы задач с нарастающей задержкой, перевод в «Ошибка» и задачи без обработчика."""
+
+    def claim_and_run(self, job_obj):
+        self.assertEqual(claim_jobs(10, visibility_timeout=60), [job_obj.pk])
+        with self.assertLogs('shop.jobs', 'ERROR'):
+            self.assertFalse(run_job(job_obj.pk))
+        job_obj.refresh_from_db()
+
+    def test_retry_with_backoff_then_fail(self):
+        job_obj = enqueue('shop.tests.failing', max_attempts=2)
+
+        before = timezone.now()
+        self.claim_and_run(job_obj)
+        self.assertEqual((job_obj.status, job_obj.attempts), (Job.STATUS_PENDING, 1))
+        self.assertIsNone(job_obj.locked_until)
+        self.assertIn('сбой задачи', job_obj.last_error)
+        self.assertGreaterEqual(job_obj.run_at, before + timedelta(seconds=backoff_delay(1)))
+        self.assertLessEqual(job_obj.run_at, timezone.now() + timedelta(seconds=backoff_delay(1)))
+        self.assertEqual(claim_jobs(10, visibility_timeout=60), [])
+
+        Job.objects.filter(pk=job_obj.pk).update(run_at=timezone.now())
+        self.claim_and_run(job_obj)
+        self.assertEqual((job_obj.status, job_obj.attempts), (Job.STATUS_FAILED, 2))
+        self.assertIsNotNone(job_obj.finished_at)
+        self.assertEqual(claim_jobs(10, visibility_timeout=60), [])
+
+    def test_backoff_delay(self):
+        self.assertEqual([backoff_delay(n) for n in (1, 2, 3)], [10, 20, 40])
+        self.assertEqual(backoff_delay(20), 3600)
+
+    def test_unknown_task(self):
+        with self.assertRaises(KeyError):
+            enqueue('shop.tests.missing')
+
+        # Задача, обработчик которой удалили после постановки в очередь.
+        job_obj = Job.objects.create(name='shop.tests.missing', payload={}, max_attempts=1)
+        self.claim_and_run(job_obj)
+        self.assertEqual(job_obj.status, Job.STATUS_FAILED)
+        self.assertIn('Неизвестная задача: shop.tests.missing', job_obj.last_error)
+
+    def test_order_placed_notification_goes_to_outbox(self):
+        order = Order.objects.create(
+            user_id=42, name='Анна', phone_number='+998901234567', address='Ташкент', total_price=2000,
+        )
+        job_obj = enqueue('shop.notify_order_placed', order_id=order.pk)
+        claim_jobs(10, visibility_timeout=60)
+        self.assertTrue(run_job(job_obj.pk))
+        notify_order_placed(order_id=order.pk)  # повторный запуск после сбоя обработчика
+
+        notification = Notification.objects.get(order=order)
+        self.assertEqual((notification.event, notification.chat_id), (Notification.EVENT_PLACED, 42))
+        self.assertEqual(notification.status, Notification.STATUS_PENDING)
+        self.assertIn(f'Заказ №{order.pk} оформлен', notification.text)
+
+
+class DailySalesConsistencyTests(TestCase):
+    """Инкрементные сводки продаж после любых изменений заказов совпадают с пересборкой rebuild_sales."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dress = Product.objects.create(name='Платье', description='', price=1000)
+        cls.shirt = Product.objects.create(name='Рубашка', description='', price=500)
+        cls.hat = Product.objects.create(name='Шапка', description='', price=200)
+
+    def create_order(self, *lines, created_at=None):
+        with mock.patch('django.utils.timezone.now', return_value=created_at or timezone.now()):
+            order = Order.objects.create(user_id=42, name='Анна', phone_number='+998901234567', address='Ташкент')
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity)
+        order.calculate_total_price()
+        return order
+
+    def rollups(self):
+        days = {}
+        for row in DailySales.objects.values():
+            row.pop('id')
+            date = row.pop('date')
+            if any(row.values()):
+                days[date] = row
+        products = {
+            (date, product_id): (quantity, revenue)
+            for date, product_id, quantity, revenue in DailyProductSales.objects.values_list(
+                'date', 'product_id', 'quantity', 'revenue',
+            )
+            if quantity or revenue
+        }
+        return days, products
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollups()
+        today = timezone.localdate()
+        rebuild_daily_sales(today - timedelta(days=3), today)
+        self.assertEqual(incremental, self.rollups())
+
+    def test_add_confirm_edit_delete(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        first = self.create_order((self.dress, 1), (self.hat, 2), created_at=yesterday)
+        second = self.create_order((self.dress, 2), (self.shirt, 1))
+        third = self.create_order((self.shirt, 3))
+        self.assertMatchesRebuild()
+
+        first.is_confirmed = True
+        first.save()
+        set_orders_status(Order.objects.filter(pk=third.pk), Notification.EVENT_REJECTED)
+        self.assertMatchesRebuild()
+
+        item = OrderItem.objects.get(order=second, product=self.dress)
+        item.quantity = 4
+        item.save()
+        item = OrderItem.objects.get(order=second, product=self.shirt)
+        item.product = self.hat
+        item.save()
+        item.order = first
+        item.save()
+        first.calculate_total_price()
+        second.calculate_total_price()
+        self.assertMatchesRebuild()
+
+        OrderItem.objects.get(order=first, product=self.dress).delete()
+        first.calculate_total_price()
+        OrderItem.objects.filter(order=second).delete()
+        second.calculate_total_price()
+        self.assertMatchesRebuild()
+
+        third.delete()
+        Product.objects.get(pk=self.hat.pk).delete()
+        self.assertMatchesRebuild()
+        Order.objects.all().delete()
+        self.assertMatchesRebuild()
+        self.assertEqual(self.rollups(), ({}, {}))
+
+
+class NotificationOutboxTests(TestCase):
+    """Смена статуса заказа записывает ровно одно уведомление в outbox."""
+
+    def create_order(self, user_id, **kwargs):
+        return Order.objects.create(
+            user_id=user_id, name='Анна', phone_number='+998901234567', address='Ташкент', total_price=1000, **kwargs,
+        )
+
+    def test_set_orders_status(self):
+        orders = [self.create_order(user_id) for user_id in (1, 2, 3)]
+        already_confirmed = self.create_order(4, is_confirmed=True)
+        self.assertEqual(Notification.objects.filter(event=Notification.EVENT_CONFIRMED).count(), 1)
+
+        queryset = Order.objects.filter(pk__in=[order.pk for order in orders] + [already_confirmed.pk])
+        self.assertEqual(set_orders_status(queryset, Notification.EVENT_CONFIRMED), 3)
+        self.assertEqual(set_orders_status(queryset, Notification.EVENT_CONFIRMED), 0)
+
+        notifications = Notification.objects.filter(event=Notification.EVENT_CONFIRMED)
+        self.assertEqual(sorted(notifications.values_list('order_id', flat=True)),
+                         sorted(order.pk for order in orders + [already_confirmed]))
+        self.assertEqual(sorted(notifications.values_list('chat_id', flat=True)), [1, 2, 3, 4])
+        self.assertFalse(Order.objects.filter(is_confirmed=False).exists())
+
+    def test_resave_does_not_duplicate(self):
+        order = self.create_order(1)
+        order.is_rejected = True
+        order.save()
+        order.save()
+        order.comment = 'Перезвонить'
+        order.save()
+
+        order = Order.objects.get(pk=order.pk)
+        order.save()
+        set_orders_status(Order.objects.filter(pk=order.pk), Notification.EVENT_REJECTED)
+
+        self.assertEqual(list(Notification.objects.values_list('order_id', 'event')),
+                         [(order.pk, Notification.EVENT_REJECTED)])
+
+
+class FakeBot:
+    """Бот без сети: запоминает отправки и падает на вызове номер ``fail_on``."""
+
+    def __init__(self, fail_on=None, error=None):
+        self.fail_on = fail_on
+        self.error = error or RuntimeError('процесс остановлен')
+        self.calls = []
+        self.sent = []
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.calls.append(chat_id)
+        if len(self.calls) == self.fail_on:
+            raise self.error
+        self.sent.append(chat_id)
+
+
+class BroadcastTests(TestCase):
+    """Прерванная рассылка продолжается без повторной отправки и без потерянных получателей."""
+
+    def test_resume_after_interruption(self):
+        for user_id in range(1, 6):
+            UserProfile.objects.create(user_id=user_id)
+        broadcast = Broadcast.objects.create(text='Скидки!', status=Broadcast.STATUS_QUEUED)
+
+        crashed = FakeBot(fail_on=3)
+        with self.assertRaises(RuntimeError):
+            run_broadcast(broadcast.pk, chunk_size=2, concurrency=1, bot=crashed)
+        self.assertEqual(crashed.calls[:3], [1, 2, 3])
+
+        resumed = FakeBot()
+        self.assertTrue(run_broadcast(broadcast.pk, chunk_size=2, concurrency=1, bot=resumed))
+
+        # Каждому получателю не больше одной попытки отправки за обе попытки рассылки.
+        self.assertEqual(sorted(crashed.calls + resumed.calls), [1, 2, 3, 4, 5])
+        self.assertEqual(sorted(crashed.sent + resumed.sent), [1, 2, 4, 5])
+        self.assertEqual(dict(broadcast.deliveries.values_list('user_id', 'status')), {
+            1: BroadcastDelivery.STATUS_SENT,
+            2: BroadcastDelivery.STATUS_SENT,
+            # Результат прерванной отправки неизвестен, поэтому повторно её не делаем.
+            3: BroadcastDelivery.STATUS_FAILED,
+            4: BroadcastDelivery.STATUS_SENT,
+            5: BroadcastDelivery.STATUS_SENT,
+        })
+        broadcast.refresh_from_db()
+        self.assertEqual((broadcast.status, broadcast.sent_count, broadcast.failed_count),
+                         (Broadcast.STATUS_DONE, 4, 1))
+
+    def test_retry_after_pauses_all_chats(self):
+        limiter = TelegramRateLimiter(global_rate=1000, per_chat_rate=1000)
+        result = asyncio.run(deliver(FakeBot(fail_on=1, error=RetryAfter(1)), limiter, 1, 'Скидки!'))
+        self.assertEqual(result.retry_after, 1)
+        self.assertGreater(limiter.global_bucket.updated - time.monotonic(), 0.5)
+
+        limiter = TelegramRateLimiter(global_rate=1000, per_chat_rate=1000)
+        limiter.pause(0.2)
+        started = time.monotonic()
+        asyncio.run(limiter.wait(2))
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+
+class UpdateProcessorTests(SimpleTestCase):
+    """Обновления разных пользователей идут параллельно, одного пользователя — по порядку."""
+
+    def replay(self, processor, updates):
+        handled = {}
+        running = {'total': 0, 'max': 0}
+        per_user = {}
+
+        async def handle(update):
+            user_id = update.effective_user.id
+            per_user[user_id] = per_user.get(user_id, 0) + 1
+            running['total'] += 1
+            running['max'] = max(running['max'], running['total'])
+            self.assertEqual(per_user[user_id], 1, 'два обновления одного пользователя одновременно')
+            # Разное время обработки, чтобы поздние обновления могли обогнать ранние.
+            await asyncio.sleep(0.001 * (update.update_id % 3))
+            handled.setdefault(user_id, []).append(update.update_id)
+            running['total'] -= 1
+            per_user[user_id] -= 1
+
+        async def run():
+            async with processor:
+                await asyncio.gather(*(
+                    asyncio.create_task(processor.process_update(update, handle(update)))
+                    for update in updates
+                ))
+
+        asyncio.run(run())
+        return handled, running['max']
+
+    def test_per_user_order_and_concurrency_limit(self):
+        updates = make_updates(200, users=10)
+        handled, max_running = self.replay(PerUserUpdateProcessor(max_concurrent_updates=4), updates)
+
+        expected = {}
+        for update in updates:
+            expected.setdefault(update.effective_user.id, []).append(update.update_id)
+        self.assertEqual(handled, expected)
+        self.assertLessEqual(max_running, 4)
+        # Обновления разных пользователей действительно обрабатывались параллельно.
+        self.assertGreater(max_running, 1)
+
+    def test_updates_without_user_share_the_limit(self):
+        processor = PerUserUpdateProcessor(max_concurrent_updates=2)
+        running = {'total': 0, 'max': 0}
+
+        async def handle():
+            running['total'] += 1
+            running['max'] = max(running['max'], running['total'])
+            await asyncio.sleep(0.001)
+            running['total'] -= 1
+
+        async def run():
+            async with processor:
+                await asyncio.gather(*(processor.process_update(object(), handle()) for _ in range(10)))
+
+        asyncio.run(run())
+        self.assertEqual(running['max'], 2)
+        self.assertEqual(processor._user_locks, {})
+
+
+class FakeBotApplication:
+    """Приложение бота без сети: запоминает вызовы жизненного цикла и принятые обновления."""
+
+    def __init__(self, fail_on_start=False):
+        self.fail_on_start = fail_on_start
+        self.calls = []
+        self.update_queue = asyncio.Queue()
+        self.bot = mock.Mock(set_webhook=mock.AsyncMock())
+
+    async def initialize(self):
+        self.calls.append('initialize')
+
+    async def start(self):
+        if self.fail_on_start:
+            raise RuntimeError('нет связи с Telegram')
+        self.calls.append('start')
+
+    async def stop(self):
+        self.calls.append('stop')
+
+    async def shutdown(self):
+        self.calls.append('shutdown')
+
+
+@override_settings(TELEGRAM_WEBHOOK_PATH='/telegram/webhook/', TELEGRAM_WEBHOOK_SECRET='s3cret',
+                   TELEGRAM_WEBHOOK_URL='https://example.com/telegram/webhook/')
+class WebhookTests(SimpleTestCase):
+    """ASGI-обёртка webhook: проверка запросов и запуск бота вместе с сервером."""
+
+    UPDATE = {'update_id': 1, 'message': {
+        'message_id': 1, 'date': 0, 'chat': {'id': 7, 'type': 'private'},
+        'from': {'id': 7, 'is_bot': False, 'first_name': 'Тест'}, 'text': '/start',
+    }}
+
+    def setUp(self):
+        self.django_app = mock.AsyncMock()
+        self.middleware = TelegramWebhookMiddleware(self.django_app)
+        self.bot_app = FakeBotApplication()
+
+    def call(self, scope, messages):
+        """Выполняет ASGI-вызов и возвращает отправленные сообщения."""
+        sent = []
+        incoming = iter(messages)
+
+        async def receive():
+            return next(incoming)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.middleware(scope, receive, send))
+        return sent
+
+    def post(self, body, secret='s3cret', method='POST', path='/telegram/webhook/'):
+        headers = [(b'x-telegram-bot-api-secret-token', secret.encode())] if secret is not None else []
+        chunks = [body[:10], body[10:]]
+        messages = [{'type': 'http.request', 'body': chunk, 'more_body': i == 0} for i, chunk in enumerate(chunks)]
+        sent = self.call({'type': 'http', 'method': method, 'path': path, 'headers': headers}, messages)
+        return sent[0]['status'] if sent else None
+
+    def test_accepts_update(self):
+        self.middleware.bot_app = self.bot_app
+        self.assertEqual(self.post(json.dumps(self.UPDATE).encode()), 200)
+        self.assertEqual(self.bot_app.update_queue.get_nowait().update_id, 1)
+
+    def test_rejected_requests(self):
+        self.middleware.bot_app = self.bot_app
+        self.assertEqual(self.post(b'', method='GET'), 405)
+        self.assertEqual(self.post(json.dumps(self.UPDATE).encode(), secret='wrong'), 403)
+        self.assertEqual(self.post(json.dumps(self.UPDATE).encode(), secret=None), 403)
+        for body in (b'not json', b'null', b'[]', b'[1, 2]', b'"text"', b'{}'):
+            self.assertEqual(self.post(body), 400, body)
+        self.assertTrue(self.bot_app.update_queue.empty())
+
+        # Бот ещё не запущен или уже остановлен.
+        self.middleware.bot_app = None
+        self.assertEqual(self.post(json.dumps(self.UPDATE).encode()), 503)
+
+    def test_other_paths_go_to_django(self):
+        self.post(b'', path='/shop/products/')
+        self.django_app.assert_awaited_once()
+
+    def test_lifespan(self):
+        lifespan = {'type': 'lifespan'}
+        with mock.patch('shop.divakidsbot.build_application', return_value=self.bot_app) as build:
+            sent = self.call(lifespan, [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        build.assert_called_once_with(updater=False)
+        self.assertEqual([m['type'] for m in sent], ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        self.assertEqual(self.bot_app.calls, ['initialize', 'start', 'stop', 'shutdown'])
+        self.bot_app.bot.set_webhook.assert_awaited_once_with(
+            url='https://example.com/telegram/webhook/', secret_token='s3cret', allowed_updates=mock.ANY,
+        )
+        self.assertIsNone(self.middleware.bot_app)
+
+    def test_lifespan_startup_failure(self):
+        with mock.patch('shop.divakidsbot.build_application', return_value=FakeBotApplication(fail_on_start=True)):
+            with self.assertLogs('shop.bot_webhook', 'ERROR'):
+                sent = self.call({'type': 'lifespan'}, [{'type': 'lifespan.startup'}])
+        self.assertEqual(sent[0]['type'], 'lifespan.startup.failed')
+
+
+class BotOrdersTests(TestCase):
+    """История заказов в боте: деление на сообщения Telegram и листание кнопками."""
+
+    def test_split_at_order_boundaries(self):
+        header = '<b>📦 Ваши заказы:</b>\n\n'
+        blocks = [f'Заказ №{i}\n' + 'строка товара\n' * (40 + i * 30) for i in range(8)]
+        messages = split_message(blocks, header=header)
+
+        self.assertGreater(len(messages), 1)
+        self.assertTrue(all(len(message) <= MESSAGE_LIMIT for message in messages))
+        self.assertEqual(''.join(messages), header + ''.join(blocks))
+        self.assertTrue(messages[0].startswith(header + blocks[0]))
+        # Каждое следующее сообщение начинается с заказа, а не с его середины.
+        for message in messages[1:]:
+            self.assertTrue(message.startswith('Заказ №'), message[:30])
+
+    def test_oversized_first_order_keeps_header(self):
+        header = '<b>📦 Ваши заказы:</b>\n\n'
+        huge = 'Заказ №1\n' + 'строка товара\n' * 500
+        messages = split_message([huge, 'Заказ №2\n'], header=header)
+
+        self.assertTrue(all(len(message) <= MESSAGE_LIMIT for message in messages))
+        self.assertNotEqual(messages[0], header)
+        self.assertTrue(messages[0].startswith(header + 'Заказ №1\n'))
+        self.assertEqual(''.join(messages), header + huge + 'Заказ №2\n')
+        self.assertEqual(split_message([], header=header), [header])
+
+    def test_keyboard_cursors_walk_all_orders(self):
+        orders = [
+            Order.objects.create(user_id=42, name='Анна', phone_number='+998901234567', address='Ташкент')
+            for _ in range(ORDERS_PAGE_SIZE * 2 + 2)
+        ]
+        # Часть заказов с одинаковым временем: порядок между ними задаёт id.
+        Order.objects.filter(pk__in=[o.pk for o in orders[3:8]]).update(created_at=orders[3].created_at)
+        Order.objects.create(user_id=7, name='Борис', phone_number='+998901234568', address='Ташкент')
+        expected = list(Order.objects.filter(user_id=42).order_by('-created_at', '-id').values_list('id', flat=True))
+
+        def buttons(page, has_prev, has_next):
+            markup = orders_keyboard(page, has_prev, has_next)
+            if markup is None:
+                return {}
+            result = {}
+            for button in markup.inline_keyboard[0]:
+                prefix, direction, cursor = button.callback_data.split(':', 2)
+                self.assertEqual(prefix, ORDERS_CALLBACK_PREFIX)
+                self.assertLessEqual(len(button.callback_data.encode()), 64)
+                result[direction] = cursor
+            return result
+
+        pages = []
+        page, has_prev, has_next = get_orders_page(42)
+        while True:
+            pages.append([order.id for order in page])
+            cursor = buttons(page, has_prev, has_next).get('next')
+            if cursor is None:
+                break
+            page, has_prev, has_next = get_orders_page(42, cursor, 'next')
+        self.assertEqual([order_id for page_ids in pages for order_id in page_ids], expected)
+        self.assertEqual(len(pages), 3)
+
+        # Обратно кнопкой «Новее» — те же страницы в обратном порядке, до первой без кнопки.
+        back = [pages[-1]]
+        while True:
+            cursor = buttons(page, has_prev, has_next).get('prev')
+            if cursor is None:
+                break
+            page, has_prev, has_next = get_orders_page(42, cursor, 'prev')
+            back.append([order.id for order in page])
+        self.assertEqual(back, pages[::-1])
+
+
+class BotProfileTests(TransactionTestCase):
+    """Шаги ввода данных в боте сохраняют только своё поле профиля (запись идёт из пула потоков бота)."""
+
+    def test_save_profile_fields(self):
+        asyncio.run(save_profile_fields(42, name='Анна'))
+        profile = UserProfile.objects.get(user_id=42)
+        self.assertEqual((profile.name, profile.phone_number, profile.delivery_address), ('Анна', None, None))
+
+        asyncio.run(save_profile_fields(42, phone_number='+998901234567'))
+        asyncio.run(save_profile_fields(42, delivery_address='Ташкент'))
+        asyncio.run(save_profile_fields(42, name='Анна Иванова'))
+        profile = UserProfile.objects.get(user_id=42)
+        self.assertEqual((profile.name, profile.phone_number, profile.delivery_address),
+                         ('Анна Иванова', '+998901234567', 'Ташкент'))
+        self.assertEqual(UserProfile.objects.count(), 1)
+
+        profile, created = asyncio.run(get_or_create_profile(42))
+        self.assertFalse(created)
+        self.assertEqual(profile.phone_number, '+998901234567')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PricingTests(TestCase):
+    """Корзина проверяется и считается по ценам снимка каталога, а не по тому, что прислал клиент."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.m, cls.l = Size.objects.create(size='M'), Size.objects.create(size='L')
+        cls.dress = Product.objects.create(name='Платье', description='', price=1000)
+        cls.dress.sizes.add(cls.m)
+        cls.shirt = Product.objects.create(name='Рубашка', description='', price=250)
+        cls.shirt.sizes.add(cls.m, cls.l)
+
+    def tearDown(self):
+        cache.clear()
+        reset_carts()
+
+    def test_validate_item(self):
+        product, size = validate_item(self.dress.pk, self.m.pk)
+        self.assertEqual((product.pk, size.pk), (self.dress.pk, self.m.pk))
+
+        cases = [
+            ((0, self.m.pk), 404),
+            ((self.shirt.pk + 100, self.m.pk), 404),
+            ((self.dress.pk, self.l.pk + 100), 404),
+            # Размер существует, но у этого товара его нет.
+            ((self.dress.pk, self.l.pk), 400),
+        ]
+        for args, status in cases:
+            with self.assertRaises(CartError) as error:
+                validate_item(*args)
+            self.assertEqual(error.exception.status, status, args)
+
+        # Удалённый товар перестаёт проходить проверку после обновления снимка.
+        Product.objects.filter(pk=self.shirt.pk).delete()
+        invalidate_catalog()
+        with self.assertRaises(CartError):
+            validate_item(self.shirt.pk, self.m.pk)
+
+    def test_cart_total_uses_current_prices(self):
+        items = [
+            CartItem(self.dress.pk, self.m.pk, 2),
+            CartItem(self.shirt.pk, self.l.pk, 3),
+            # Строки с удалённым товаром и неположительным количеством не считаются.
+            CartItem(self.shirt.pk + 100, self.m.pk, 1),
+            CartItem(self.shirt.pk, self.m.pk, 0),
+            CartItem(self.shirt.pk, self.m.pk, -4),
+        ]
+        priced = price_cart(items)
+        self.assertEqual(priced.total, 2 * 1000 + 3 * 250)
+        self.assertEqual([(line.product.pk, line.quantity, line.subtotal) for line in priced.lines],
+                         [(self.dress.pk, 2, 2000), (self.shirt.pk, 3, 750)])
+
+        Product.objects.filter(pk=self.dress.pk).update(price=1200)
+        invalidate_catalog()
+        self.assertEqual(price_cart(items).total, 2 * 1200 + 3 * 250)
+        self.assertFalse(price_cart([]))
+
+    def test_client_price_is_ignored(self):
+        response = self.client.post('/shop/add_to_cart/', json.dumps({
+            'product_id': self.dress.pk, 'size_id': self.m.pk, 'quantity': 2, 'user_id': 42,
+            'price': 1, 'total_price': 1,
+        }), content_type='application/json')
+        self.assertEqual(response.json()['total_price'], format_price(Decimal('2000.00')))
+
+        response = self.client.post('/shop/add_to_cart/', json.dumps({
+            'product_id': self.dress.pk, 'size_id': self.l.pk, 'user_id': 42,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CartStoreTests(TestCase):
+    """Корзина читается из кэша сразу после записи и попадает в таблицу Cart при сбросе буфера."""
+
+    def setUp(self):
+        write_behind.flush()
+        self.addCleanup(reset_carts)
+
+    def test_read_your_writes(self):
+        CartStore('u:1').save(CartContents({(10, 1): 2}))
+        self.assertEqual(CartStore('u:1').load().items(), [CartItem(10, 1, 2)])
+        self.assertFalse(Cart.objects.filter(key='u:1').exists())
+
+        write_behind.flush()
+        self.assertEqual(Cart.objects.get(key='u:1').items, [[10, 1, 2]])
+        # После вытеснения из кэша корзина читается из таблицы.
+        caches['carts'].clear()
+        self.assertEqual(CartStore('u:1').load().items(), [CartItem(10, 1, 2)])
+
+    def test_flush_keeps_last_write(self):
+        store = CartStore('u:1')
+        store.save(CartContents({(10, 1): 1}))
+        CartStore('u:2').save(CartContents({(20, None): 1}))
+        write_behind.flush()
+
+        store.save(CartContents({(10, 1): 1, (11, 2): 3}))
+        store.save(CartContents({(11, 2): 3}))
+        CartStore('u:2').clear()
+        write_behind.flush()
+
+        self.assertEqual(dict(Cart.objects.values_list('key', 'items')), {'u:1': [[11, 2, 3]], 'u:2': []})
+
+    def test_older_write_from_another_process_is_ignored(self):
+        # Другой процесс изменил корзину раньше, но сбрасывает свой буфер позже.
+        other_process = WriteBehind()
+        other_process.mark_dirty('u:1', [[10, 1, 1]], timezone.now())
+        CartStore('u:1').save(CartContents({(10, 1): 5}))
+        CartStore('u:2').clear()
+        write_behind.flush()
+
+        other_process.mark_dirty('u:2', [[20, None, 1]], timezone.now() - timedelta(seconds=1))
+        other_process.flush()
+        self.assertEqual(dict(Cart.objects.values_list('key', 'items')), {'u:1': [[10, 1, 5]], 'u:2': []})
+
+    def test_session_cart_merged_on_identification(self):
+        size = Size.objects.create(size='M')
+        product = Product.objects.create(name='Платье', description='', price=1000)
+        product.sizes.add(size)
+        invalidate_catalog()
+        self.addCleanup(cache.clear)
+        CartStore.for_user(42).save(CartContents({(product.pk, size.pk): 1}))
+
+        response = self.client.post('/shop/add_to_cart/', {'product_id': product.pk, 'size_id': size.pk, 'quantity': 2},
+                                    content_type='application/json')
+        self.assertEqual(response.json()['status'], 'success')
+        session_key = self.client.session.session_key
+
+        response = self.client.get('/shop/cart/state/', {'user_id': 42})
+        self.assertEqual(response.json()['quantities'], {str(product.pk): 3})
+        self.assertEqual(len(CartStore(f's:{session_key}').load()), 0)
+
+        response = self.client.post('/shop/place_order/', {
+            'user_id': 42, 'name': 'Анна', 'phone_number': '+998901234567', 'address': 'Ташкент',
+        })
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(OrderItem.objects.get().quantity, 3)
+
+    def test_failed_flush_does_not_override_newer_write(self):
+        store = CartStore('u:1')
+        store.save(CartContents({(10, 1): 1}))
+        with mock.patch.object(Cart.objects, 'bulk_create', side_effect=RuntimeError('база недоступна')):
+            with self.assertRaises(RuntimeError):
+                write_behind.flush()
+        store.save(CartContents({(10, 1): 5}))
+        write_behind.flush()
+        self.assertEqual(Cart.objects.get(key='u:1').items, [[10, 1, 5]])
+
+    def test_flush_at_exit(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Отдельный процесс получает копию схемы только для SQLite.')
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE tbl_name = 'shop_cart' AND sql IS NOT NULL")
+            schema = [sql for sql, in cursor.fetchall()]
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        db_name = os.path.join(tmp.name, 'carts.sqlite3')
+        with sqlite3.connect(db_name) as db:
+            for sql in schema:
+                db.execute(sql)
+
+        # Фоновый поток за время жизни процесса не срабатывает: корзину сохраняет только atexit.
+        script = (
+            'import django; django.setup()\n'
+            'from shop.cart import CartContents, CartStore\n'
+            'CartStore("u:7").save(CartContents({(10, 1): 2}))\n'
+        )
+        env = {
+            **os.environ, 'DJANGO_SETTINGS_MODULE': 'DivaKids.settings', 'DB_ENGINE': 'sqlite', 'DB_NAME': db_name,
+            'CART_CACHE_DIR': os.path.join(tmp.name, 'cache'), 'CART_FLUSH_INTERVAL': '3600',
+        }
+        subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, check=True, timeout=60)
+
+        with closing(sqlite3.connect(db_name)) as db:
+            rows = db.execute('SELECT key, items FROM shop_cart').fetchall()
+        self.assertEqual([(key, json.loads(items)) for key, items in rows], [('u:7', [[10, 1, 2]])])
+
+
+class OrderExportTests(TestCase):
+    """Выгрузка заказов в CSV: строка на элемент заказа, экранирование формул и фильтры списка в админке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        size = Size.objects.create(size='M')
+        dress = Product.objects.create(name='Платье', description='', price=1000)
+        hat = Product.objects.create(name='Шапка', description='', price=200)
+        cls.confirmed = Order.objects.create(
+            user_id=42, name='=HYPERLINK("http://evil")', phone_number='+998901234567', address='Ташкент',
+            comment='@SUM(A1)', is_confirmed=True,
+        )
+        OrderItem.objects.create(order=cls.confirmed, product=dress, size=size, quantity=2)
+        OrderItem.objects.create(order=cls.confirmed, product=hat, quantity=1)
+        cls.confirmed.calculate_total_price()
+        cls.new = Order.objects.create(user_id=7, name='Анна', phone_number='998901112233', address='-')
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def read_csv(self, response):
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        return list(csv.reader(io.StringIO(content[1:]), delimiter=';'))
+
+    def test_streamed_rows(self):
+        rows = list(export_rows(Order.objects.all(), chunk_size=1))
+        self.assertEqual(rows[0], EXPORT_HEADER)
+        self.assertEqual([(row[0], row[9]) for row in rows[1:]], [
+            (self.confirmed.pk, 'Платье'), (self.confirmed.pk, 'Шапка'), (self.new.pk, ''),
+        ])
+
+        rows = self.read_csv(orders_csv_response(Order.objects.all()))
+        self.assertEqual(len(rows), 4)
+        first = dict(zip(EXPORT_HEADER, rows[1]))
+        self.assertEqual(first['Имя'], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(first['Телефон'], "'+998901234567")
+        self.assertEqual(first['Комментарий'], "'@SUM(A1)")
+        self.assertEqual((first['Статус'], first['Сумма заказа'], first['Размер']), ('Подтверждён', '2200.00', 'M'))
+        last = dict(zip(EXPORT_HEADER, rows[3]))
+        self.assertEqual((last['Телефон'], last['Адрес'], last['Статус']), ('998901112233', "'-", 'Новый'))
+
+    def test_admin_export_uses_changelist_filters(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:shop_order_export'), {'is_confirmed__exact': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        rows = self.read_csv(response)
+        self.assertEqual({row[0] for row in rows[1:]}, {str(self.confirmed.pk)})
+
+        rows = self.read_csv(self.client.get(reverse('admin:shop_order_export'), {'q': 'Анна'}))
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.new.pk)])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryPlanTests(TestCase):
+    """
+    Проверяет через EXPLAIN, что основные запросы бота, магазина и админки
+    используют индексы, а не полный просмотр таблиц заказов и профилей.
+    """
+    TABLES = ('shop_order', 'shop_orderitem', 'shop_userprofile', 'shop_cart')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.size = Size.objects.create(size='M')
+        cls.product = Product.objects.create(name='Платье', description='', price=1000)
+        cls.product.sizes.add(cls.size)
+        UserProfile.objects.create(user_id=42, name='Анна', phone_number='+998901234567', delivery_address='Ташкент')
+        now = timezone.now()
+        for i in range(10):
+            order = Order.objects.create(user_id=42, name='Анна', phone_number='+998901234567', address='Ташкент')
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(hours=i))
+            OrderItem.objects.create(order=order, product=cls.product, size=cls.size, quantity=1)
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # На маленьких тестовых таблицах планировщик иначе всегда выбирает seq scan.
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def explain(self, sql):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def full_scans(self, plan):
+        if connection.vendor == 'sqlite':
+            return [
+                line for line in plan.splitlines()
+                if re.match(r'SCAN (%s)\b' % '|'.join(self.TABLES), line) and 'USING' not in line
+            ]
+        return [line for line in plan.splitlines() if 'Seq Scan' in line]
+
+    def plans(self, queries):
+        """Планы запросов SELECT/UPDATE/DELETE к проверяемым таблицам: [(sql, план)]."""
+        return [
+            (query['sql'], self.explain(query['sql'])) for query in queries
+            if query['sql'].startswith(('SELECT', 'UPDATE', 'DELETE'))
+            and any(f'"{table}"' in query['sql'] for table in self.TABLES)
+        ]
+
+    def assertQueriesUseIndexes(self, queries):
+        plans = self.plans(queries)
+        self.assertTrue(plans)
+        for sql, plan in plans:
+            self.assertEqual(self.full_scans(plan), [], f'{sql}\n{plan}')
+
+    def assertUsesIndex(self, queries, index_name):
+        plans = [plan for _, plan in self.plans(queries)]
+        self.assertTrue(any(index_name in plan for plan in plans), '\n'.join(plans))
+
+    def test_bot_order_history(self):
+        with CaptureQueriesContext(connection) as first:
+            orders, _, _ = get_orders_page(42)
+        self.assertQueriesUseIndexes(first.captured_queries)
+        self.assertUsesIndex(first.captured_queries, 'shop_order_user_created_idx')
+
+        cursor = encode_orders_cursor(orders[-1])
+        with CaptureQueriesContext(connection) as following:
+            get_orders_page(42, cursor, 'next')
+        self.assertQueriesUseIndexes(following.captured_queries)
+        self.assertUsesIndex(following.captured_queries, 'shop_order_user_created_idx')
+
+    def test_place_order(self):
+        self.addCleanup(reset_carts)
+        store = CartStore('u:42')
+        store.save(CartContents({(self.product.pk, self.size.pk): 2}))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/shop/place_order/', {'user_id': 42})
+        self.assertTrue(response.json()['success'])
+        self.assertQueriesUseIndexes(queries.captured_queries)
+
+        with CaptureQueriesContext(connection) as queries:
+            write_behind.flush()
+        self.assertQueriesUseIndexes(queries.captured_queries)
+
+    def test_admin_order_changelist(self):
+        self.client.force_login(self.admin)
+        cases = [
+            ('', 'shop_order_created_idx'),
+            ('?is_confirmed__exact=0&is_rejected__exact=0', 'shop_order_pending_idx'),
+            ('?is_confirmed__exact=1', 'shop_order_confirmed_idx'),
+            ('?is_rejected__exact=1', 'shop_order_rejected_idx'),
+            ('?q=%2B998901234567', 'shop_order_phone_idx'),
+        ]
+        for params, index_name in cases:
+            with self.subTest(params=params), CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/admin/shop/order/' + params)
+                self.assertEqual(response.status_code, 200)
+                self.assertQueriesUseIndexes(queries.captured_queries)
+                self.assertUsesIndex(queries.captured_queries, index_name)
+
+    def test_admin_profile_search(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/shop/userprofile/?q=998901234567')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Анна')
+        self.assertQueriesUseIndexes(queries.captured_queries)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AdminChangelistQueryCountTests(TestCase):
+    """Число запросов страницы списка в админке не зависит от размера таблицы."""
+    URLS = (
+        '/admin/shop/order/',
+        '/admin/shop/order/?is_confirmed__exact=0&is_rejected__exact=0',
+        '/admin/shop/orderitem/',
+        '/admin/shop/userprofile/',
+        '/admin/shop/job/',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.size = Size.objects.create(size='M')
+        cls.product = Product.objects.create(name='Платье', description='', price=1000)
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user_id=42, name='Анна', phone_number='+998901234567')
+            OrderItem.objects.create(order=order, product=self.product, size=self.size, quantity=1)
+
+    def changelist_queries(self):
+        counts = {}
+        for url in self.URLS:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts[url] = len(queries)
+        return counts
+
+    def test_query_count_is_bounded(self):
+        self.client.force_login(self.admin)
+        self.add_orders(2)
+        small = self.changelist_queries()
+        self.add_orders(30)
+        self.assertEqual(self.changelist_queries(), small)
+
+    def test_status_tabs(self):
+        self.client.force_login(self.admin)
+        self.add_orders(3)
+        Order.objects.filter(pk=Order.objects.first().pk).update(is_confirmed=True)
+        response = self.client.get('/admin/shop/order/')
+        self.assertContains(response, 'Новые: 2')
+        self.assertContains(response, 'Подтверждённые: 1')
+        self.assertContains(response, 'Отклонённые: 0')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductSearchTests(TestCase):
+    """Поисковый индекс товаров обновляется при сохранении и ранжирует совпадения в названии выше."""
+
+    def test_search(self):
+        in_description = Product.objects.create(name='Юбка', description='Подходит к платью', price=100)
+        in_name = Product.objects.create(name='Платье летнее', description='Хлопок', price=200)
+        uzbek = Product.objects.create(name='Koʻylak', description='Bolalar uchun', price=300)
+
+        response = self.client.get('/shop/products/search/', {'q': 'плать'})
+        self.assertEqual([p['id'] for p in response.json()['results']], [in_name.pk, in_description.pk])
+
+        response = self.client.get('/shop/products/search/', {'q': "ko'ylak"})
+        self.assertEqual([p['id'] for p in response.json()['results']], [uzbek.pk])
+
+        in_name.name = 'Сарафан'
+        in_name.save()
+        in_description.delete()
+        response = self.client.get('/shop/products/search/', {'q': 'плать'})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_best_match_among_many(self):
+        # Лучшее совпадение добавлено последним: ранжироваться должны все совпадения, а не первые попавшиеся.
+        products = Product.objects.bulk_create(
+            [Product(name=f'Юбка {i}', description='Подходит к платью', price=100) for i in range(1100)]
+            + [Product(name='Платье', description='Хлопок', price=200)]
+        )
+        index_products(products)
+
+        ids, has_next = search_product_ids('плать', limit=3)
+        self.assertEqual(ids, [products[-1].pk, products[0].pk, products[1].pk])
+        self.assertTrue(has_next)
+        ids, has_next = search_product_ids('плать', offset=1099, limit=3)
+        self.assertEqual(ids, [products[1098].pk, products[1099].pk])
+        self.assertFalse(has_next)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogHttpCacheTests(TestCase):
+    """Страница каталога одинакова для всех и поддерживает условные запросы; корзина грузится отдельно."""
+
+    def tearDown(self):
+        # Снимок каталога в кэше пережил бы откат транзакции и достался следующим тестам.
+        cache.clear()
+        reset_carts()
+
+    def test_conditional_get(self):
+        size = Size.objects.create(size='M')
+        product = Product.objects.create(name='Платье', description='', price=1000)
+        product.sizes.add(size)
+        CartStore('u:42').save(CartContents({(product.pk, size.pk): 3}))
+
+        response = self.client.get('/shop/products/?user_id=42')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertFalse(response.cookies)
+        etag = response['ETag']
+
+        response = self.client.get('/shop/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get('/shop/cart/state/', {'user_id': 42})
+        self.assertEqual(response.json()['quantities'], {str(product.pk): 3})
+        self.assertEqual(response.json()['total_price'], '3 000.00')
+
+        product.price = 900
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        response = self.client.get('/shop/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_validators_shared_between_workers(self):
+        Product.objects.create(name='Платье', description='', price=1000)
+        response = self.client.get('/shop/products/')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        # Другой воркер или перезапуск: ни снимка в памяти, ни общего кэша.
+        catalog_module._local.update(state=None, snapshot=None)
+        cache.clear()
+        response = self.client.get('/shop/products/')
+        self.assertEqual((response['ETag'], response['Last-Modified']), (etag, last_modified))
+        response = self.client.get('/shop/products/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        # Процесс с отстающими часами меняет каталог: ETag новый, Last-Modified не идёт назад.
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() - timedelta(hours=1)):
+            invalidate_catalog()
+        response = self.client.get('/shop/products/')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response['Last-Modified'], last_modified)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductPageTests(TestCase):
+    """Страницы каталога по курсору: проверка параметров, предел размера, сплошной обход."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.size = Size.objects.create(size='M')
+        for i in range(CATALOG_MAX_PAGE_SIZE + 30):
+            product = Product.objects.create(name=f'Товар {i}', description='', price=1000 + i)
+            product.sizes.add(cls.size)
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_page(self, **params):
+        return self.client.get(reverse('shop:product_page'), params)
+
+    def test_invalid_parameters(self):
+        for params in ({'after': 'x'}, {'after': '-1'}, {'limit': 'many'}, {'limit': '-5'}, {'limit': ''}):
+            response = self.get_page(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(response.json()['status'], 'error')
+
+    def test_limit_is_capped(self):
+        response = self.get_page(limit=CATALOG_MAX_PAGE_SIZE * 10)
+        self.assertEqual(len(response.json()['results']), CATALOG_MAX_PAGE_SIZE)
+        self.assertEqual(len(self.get_page(limit=0).json()['results']), 1)
+        self.assertEqual(len(self.get_page().json()['results']), CATALOG_PAGE_SIZE)
+
+    def test_cursor_walks_catalog_without_gaps(self):
+        expected = list(Product.objects.order_by('id').values_list('id', flat=True))
+        seen, params = [], {'limit': 7}
+        while True:
+            data = self.get_page(**params).json()
+            seen += [product['id'] for product in data['results']]
+            if data['next_cursor'] is None:
+                break
+            self.assertEqual(data['next_cursor'], seen[-1])
+            params['after'] = data['next_cursor']
+        self.assertEqual(seen, expected)
+
+        # Курсор удалённого товара всё равно указывает на место в каталоге.
+        Product.objects.filter(pk=expected[10]).delete()
+        invalidate_catalog()
+        data = self.get_page(after=expected[10], limit=2).json()
+        self.assertEqual([product['id'] for product in data['results']], expected[11:13])
+
+    def test_deep_pages_cost_the_same(self):
+        last = Product.objects.order_by('-id').values_list('id', flat=True)[5]
+        self.get_page()
+
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.get_page().status_code, 200)
+        with CaptureQueriesContext(connection) as deep:
+            response = self.get_page(after=last)
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertEqual(len(deep), len(first))
+        self.assertLessEqual(len(deep), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnonymousSessionTests(TestCase):
+    """Просмотр каталога без покупок не создаёт сессий и ничего не пишет в базу."""
+
+    def tearDown(self):
+        cache.clear()
+        reset_carts()
+
+    def test_browsing_does_not_write(self):
+        size = Size.objects.create(size='M')
+        product = Product.objects.create(name='Платье', description='', price=1000)
+        product.sizes.add(size)
+        get_catalog()
+
+        with CaptureQueriesContext(connection) as queries:
+            for url in ('/shop/products/', '/shop/products/page/', '/shop/cart/state/'):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200, url)
+                self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies, url)
+        writes = [q['sql'] for q in queries if re.match(r'\s*(INSERT|UPDATE|DELETE)', q['sql'], re.I)]
+        self.assertEqual(writes, [])
+        self.assertFalse(Session.objects.exists())
+
+        response = self.client.post('/shop/add_to_cart/', json.dumps({'product_id': product.pk, 'size_id': size.pk}),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['status'], 'success')
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEqual(Session.objects.count(), 1)
+
+        # Следующие запросы работают с той же сессией и той же корзиной.
+        self.client.post('/shop/add_to_cart/', json.dumps({'product_id': product.pk, 'size_id': size.pk}),
+                         content_type='application/json')
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(self.client.get('/shop/cart/state/').json()['quantities'], {str(product.pk): 2})
+
+    def test_purge_sessions(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key='alive', session_data='', expire_date=now + timedelta(days=1))
+
+        out = io.StringIO()
+        call_command('purge_sessions', batch_size=2, pause=0, stdout=out)
+        self.assertIn('5', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['alive'])
+
+        with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies'):
+            with self.assertRaises(CommandError):
+                call_command('purge_sessions', stdout=io.StringIO())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Чтения на реплику только внутри replica_reads и вне транзакции; после заказа — с основной базы.
+
+    Реплика в тестах — зеркало тестовой базы (TEST MIRROR), отдельное соединение
+    с теми же данными, поэтому видно, какое из соединений выполнило запрос.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        replica = {**connections.settings[DEFAULT_DB_ALIAS], 'TEST': {'MIRROR': DEFAULT_DB_ALIAS}}
+        cls.enterClassContext(mock.patch.dict(settings.DATABASES, {REPLICA_DB_ALIAS: replica}))
+        cls.addClassCleanup(cls.drop_replica_connection)
+        # Псевдоним появляется только здесь, поэтому тестовый раннер не создаёт для него базу.
+        cls.databases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        super().setUpClass()
+
+    @staticmethod
+    def drop_replica_connection():
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+
+    def setUp(self):
+        self.size = Size.objects.create(size='M')
+        self.product = Product.objects.create(name='Платье', description='', price=1000)
+        self.product.sizes.add(self.size)
+
+    def tearDown(self):
+        cache.clear()
+        reset_carts()
+
+    def reads(self, func):
+        """Выполняет ``func`` и возвращает число запросов к основной базе и к реплике."""
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica:
+            func()
+        return len(primary), len(replica)
+
+    def test_reads_go_to_replica_only_inside_replica_reads(self):
+        self.assertEqual(self.reads(lambda: list(Product.objects.all())), (1, 0))
+
+        with replica_reads():
+            products = []
+            self.assertEqual(self.reads(lambda: products.extend(Product.objects.all())), (0, 1))
+            self.assertEqual(products, [self.product])
+            # Связанные объекты читаются оттуда же, откуда исходный.
+            self.assertEqual(self.reads(lambda: list(products[0].sizes.all())), (0, 1))
+            self.assertEqual(self.reads(lambda: list(self.product.sizes.all())), (1, 0))
+            # Модели других приложений и записи остаются на основной базе.
+            self.assertEqual(self.reads(lambda: get_user_model().objects.exists()), (1, 0))
+            self.assertEqual(self.reads(lambda: Size.objects.create(size='L'))[1], 0)
+            self.assertEqual(router.db_for_write(Product), DEFAULT_DB_ALIAS)
+
+    def test_atomic_block_uses_primary(self):
+        def inside():
+            with transaction.atomic(), replica_reads():
+                Product.objects.filter(pk=self.product.pk).update(price=900)
+                self.assertEqual(Product.objects.get(pk=self.product.pk).price, 900)
+        self.assertEqual(self.reads(inside)[1], 0)
+
+    def test_pinned_to_primary_after_checkout(self):
+        self.client.post('/shop/add_to_cart/', json.dumps({
+            'product_id': self.product.pk, 'size_id': self.size.pk, 'user_id': 42,
+        }), content_type='application/json')
+        response = self.client.post('/shop/place_order/', {
+            'user_id': 42, 'name': 'Анна', 'phone_number': '+998901234567', 'address': 'Ташкент',
+        })
+        self.assertTrue(response.json()['success'], response.json())
+
+        # Только что оформленный заказ читается с основной базы, пока реплика догоняет.
+        primary, replica = self.reads(lambda: self.assertEqual(len(get_orders_page(42)[0]), 1))
+        self.assertEqual(replica, 0)
+        # Другие покупатели продолжают читать с реплики.
+        self.assertGreater(self.reads(lambda: get_orders_page(7))[1], 0)
+
+        caches[settings.DB_REPLICA_PIN_CACHE_ALIAS].delete(REPLICA_PIN_KEY.format(user_id=42))
+        self.assertGreater(self.reads(lambda: get_orders_page(42))[1], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ApiTests(TestCase):
+    """REST API: число запросов каталога не зависит от числа товаров, условные ответы, корзина и заказ."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.size = Size.objects.create(size='M')
+        cls.products = [Product.objects.create(name=f'Платье {i}', description='', price=1000 + i) for i in range(5)]
+        for product in cls.products:
+            product.sizes.add(cls.size)
+
+    def tearDown(self):
+        cache.clear()
+        reset_carts()
+
+    def test_products(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/products/', {'limit': 2})
+        # Версия каталога (для ETag), товары, изображения, размеры.
+        self.assertEqual(len(queries), 4)
+        data = response.json()
+        self.assertEqual([p['id'] for p in data['results']], [p.pk for p in self.products[:2]])
+        self.assertEqual(data['results'][0]['sizes'], [{'id': self.size.pk, 'size': 'M'}])
+
+        next_url = data['next'] + '&fields=id,price'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(next_url)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(response.json()['results'][0], {'id': self.products[2].pk, 'price': '1002.00'})
+
+        etag = response['ETag']
+        response = self.client.get(next_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def init_data(self, user_id, auth_date=None, bot_token=None):
+        data = {
+            'auth_date': str(int(auth_date or time.time())),
+            'query_id': 'AAH',
+            'user': json.dumps({'id': user_id, 'first_name': 'Анна'}),
+        }
+        data['hash'] = init_data_hash(data, bot_token or settings.TELEGRAM_BOT_TOKEN)
+        return urlencode(data)
+
+    def auth(self, user_id, **kwargs):
+        return {'HTTP_AUTHORIZATION': f'tma {self.init_data(user_id, **kwargs)}'}
+
+    def test_cart_and_checkout(self):
+        product = self.products[0]
+        UserProfile.objects.create(user_id=42, name='Анна', phone_number='+998901234567', delivery_address='Ташкент')
+        response = self.client.post(
+            '/api/v1/cart/items/', {'product_id': product.pk, 'size_id': self.size.pk, 'quantity': 2},
+            content_type='application/json', **self.auth(42),
+        )
+        self.assertEqual(response.json()['total_price'], '2000.00')
+
+        response = self.client.get('/api/v1/cart/', **self.auth(42))
+        self.assertEqual(response.json()['items'][0]['key'], f'{product.pk}-{self.size.pk}')
+        response = self.client.get('/api/v1/cart/', HTTP_IF_NONE_MATCH=response['ETag'], **self.auth(42))
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.post('/api/v1/checkout/', {}, content_type='application/json', **self.auth(42))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total_price'], '2000.00')
+        self.assertEqual(response.json()['items'][0]['size'], 'M')
+        # Контакты взяты из профиля и в ответ не попадают.
+        self.assertEqual(Order.objects.get().phone_number, '+998901234567')
+        self.assertFalse({'name', 'phone_number', 'address'} & set(response.json()))
+        self.assertEqual(self.client.get('/api/v1/cart/', **self.auth(42)).json()['items'], [])
+
+    def test_customer_endpoints_require_init_data(self):
+        CartStore.for_user(42).save(CartContents({(self.products[0].pk, self.size.pk): 1}))
+        forged = self.init_data(42, bot_token='123:forged')
+        expired = self.init_data(42, auth_date=time.time() - settings.WEBAPP_INIT_DATA_MAX_AGE - 60)
+        requests = [
+            ('get', '/api/v1/cart/?user_id=42', {}),
+            ('post', '/api/v1/cart/items/', {'user_id': 42, 'product_id': self.products[0].pk, 'size_id': self.size.pk}),
+            ('delete', f'/api/v1/cart/items/{self.products[0].pk}-{self.size.pk}/?user_id=42', {}),
+            ('post', '/api/v1/checkout/', {'user_id': 42}),
+        ]
+        for headers in ({}, {'HTTP_AUTHORIZATION': f'tma {forged}'}, {'HTTP_AUTHORIZATION': f'tma {expired}'}):
+            for method, url, data in requests:
+                with self.subTest(url=url, method=method, headers=bool(headers)):
+                    response = getattr(self.client, method)(url, data, content_type='application/json', **headers)
+                    self.assertEqual(response.status_code, 401)
+
+        # Подпись другого пользователя даёт доступ только к его корзине, параметр user_id игнорируется.
+        response = self.client.get('/api/v1/cart/', {'user_id': 42}, **self.auth(7))
+        self.assertEqual(response.json()['items'], [])
+        self.assertEqual(len(CartStore.for_user(42).load()), 1)
+        self.assertFalse(Order.objects.exists())
+
+
+class StaticFilesTests(SimpleTestCase):
+    """collectstatic создаёт файлы с хэшем в имени и сжатые копии, приложение отдаёт их с долгим кэшированием."""
+
+    def vendor_dir(self):
+        """Каталог static с заглушками сторонних файлов вместо скачанных vendor_static."""
+        vendor_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(vendor_dir.cleanup)
+        for path, _ in VENDOR_ASSETS.values():
+            target = os.path.join(vendor_dir.name, *path.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w') as f:
+                f.write('/* vendor */\n')
+        return vendor_dir.name
+
+    def setUp(self):
+        _is_vendored.cache_clear()
+        self.addCleanup(_is_vendored.cache_clear)
+
+    def test_missing_vendor_assets(self):
+        """Пока сторонние файлы не скачаны, страницы берут их с CDN, а collectstatic предупреждает."""
+        with tempfile.TemporaryDirectory() as static_root, override_settings(STATIC_ROOT=static_root):
+            with self.assertLogs('shop.static_files', 'WARNING') as logs:
+                call_command('collectstatic', interactive=False, verbosity=0)
+            self.assertIn('vendor_static', logs.output[0])
+            self.assertEqual(
+                Template('{% load assets %}{% vendor_asset "bootstrap.css" %}').render(Context()),
+                VENDOR_ASSETS['bootstrap.css'][1],
+            )
+
+    def test_hashed_precompressed_static(self):
+        with tempfile.TemporaryDirectory() as static_root, override_settings(
+            STATIC_ROOT=static_root, STATICFILES_DIRS=[self.vendor_dir()],
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = static('admin/css/base.css')
+            self.assertRegex(url, r'^/static/admin/css/base\.[0-9a-f]{12}\.css$')
+            self.assertRegex(
+                Template('{% load assets %}{% vendor_asset "bootstrap.css" %}').render(Context()),
+                r'^/static/shop/vendor/bootstrap/css/bootstrap\.min\.[0-9a-f]{12}\.css$',
+            )
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('Accept-Encoding', response['Vary'])
+            b''.join(response.streaming_content)
+
+            response = self.client.get('/static/admin/css/base.css')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertNotIn('immutable', response['Cache-Control'])
+            b''.join(response.streaming_content)
@@ -1,10 +1,13 @@
 from django.urls import path
-from shop.views import product_list, cart, add_to_cart, place_order, remove_from_cart
+from shop.views import product_list, product_page, product_search, cart, cart_state, add_to_cart, place_order, remove_from_cart
 
 app_name = 'shop'
 urlpatterns = [
     path('products/', product_list, name='product_list'),
+    path('products/page/', product_page, name='product_page'),
+    path('products/search/', product_search, name='product_search'),
     path('cart/', cart, name='cart'),
+    path('cart/state/', cart_state, name='cart_state'),
     path('add_to_cart/', add_to_cart, name='add_to_cart'),
     path('remove-from-cart/', remove_from_cart, name='remove_from_cart'),
 
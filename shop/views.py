@@ -1,64 +1,171 @@
-from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.conf import settings
+from django.shortcuts import render
+from django.http import JsonResponse, QueryDict
+from django.views.decorators.cache import cache_control, never_cache
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from django.utils.formats import localize
-from .models import Product, Order, OrderItem, UserProfile, Size
+from django.utils.http import urlencode
+from .cart import CartStore
+from .catalog import (
+    get_catalog, get_catalog_changed_at, get_catalog_state, parse_filters, serialize_product,
+    CATALOG_PAGE_SIZE, CATALOG_MAX_PAGE_SIZE,
+)
+from .checkout import CheckoutError, create_order, order_contacts
+from .db_routing import pin_to_primary, replica_reads
+from .pricing import CartError, format_price, price_cart, validate_item
+from .search import SEARCH_MAX_PAGE_SIZE, SEARCH_PAGE_SIZE, search_product_ids
+import hashlib
 import json
 
 
+def get_user_id(request, data=None):
+    """
+    Telegram user_id из параметров запроса, иначе из уже существующей сессии.
+
+    Сессия при этом не создаётся и не сохраняется.
+    """
+    user_id = (data or {}).get('user_id') or request.GET.get('user_id') or request.POST.get('user_id')
+    if user_id and str(user_id).isdigit():
+        return int(user_id)
+    return request.session.get('user_id')
+
+
+def filter_params(size_ids, price_keys):
+    """Фильтры каталога в каноническом порядке: [('size', id), ..., ('price', ключ), ...]."""
+    return [('size', size_id) for size_id in size_ids] + [('price', key) for key in price_keys]
+
+
+def facet_links(facets, size_ids, price_keys):
+    """
+    Добавляет к каждому значению фасета ссылку, которая включает или выключает этот фильтр.
+
+    В ссылку попадают только фильтры, поэтому страницы каталога одинаковы для всех покупателей.
+    """
+    for param, items, value_key in (('size', facets['sizes'], 'id'), ('price', facets['prices'], 'key')):
+        for item in items:
+            value = str(item[value_key])
+            params = QueryDict(urlencode(filter_params(size_ids, price_keys)), mutable=True)
+            values = [v for v in params.getlist(param) if v != value]
+            params.setlist(param, values if item['selected'] else values + [value])
+            item['url'] = '?' + params.urlencode()
+    return facets
+
+
+def catalog_etag(request):
+    """
+    ETag страницы каталога: версия снимка, время его смены и выбранные фильтры.
+
+    Версия и время хранятся в базе, поэтому ETag одинаков во всех воркерах
+    и не меняется после перезапуска, пока не изменится сам каталог.
+    """
+    size_ids, price_keys = parse_filters(request.GET)
+    version, changed_at = get_catalog_state()
+    state = f'{version}:{changed_at.timestamp():.0f}:{urlencode(filter_params(size_ids, price_keys))}'
+    return 'catalog-' + hashlib.sha1(state.encode()).hexdigest()[:20]
+
+
+def catalog_last_modified(request):
+    return get_catalog_changed_at()
+
+
+@cache_control(public=True, max_age=0, s_maxage=settings.CATALOG_HTTP_MAX_AGE)
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
 def product_list(request):
-    if 'cart' not in request.session:
-        request.session['cart'] = {}
+    """
+    Страница каталога, одинаковая для всех покупателей.
+
+    Корзина и user_id сюда не попадают (их подгружает cart_state), сессия не
+    читается, поэтому ответ можно кэшировать в прокси, а повторное открытие
+    Web App обходится запросом с If-None-Match и ответом 304.
+    """
+    size_ids, price_keys = parse_filters(request.GET)
+    catalog = get_catalog()
+    mask = catalog.filter_mask(size_ids, price_keys)
+    products, next_cursor = catalog.page(limit=CATALOG_PAGE_SIZE, mask=mask)
+    return render(request, 'shop/product_list.html', {
+        'products': products,
+        'next_cursor': next_cursor,
+        'facets': facet_links(catalog.facet_counts(size_ids, price_keys), size_ids, price_keys),
+        'filter_query': urlencode(filter_params(size_ids, price_keys)),
+    })
+
 
-    user_id = request.GET.get('user_id')
-    if user_id and user_id.isdigit():
-        request.session['user_id'] = int(user_id)
+@never_cache
+def cart_state(request):
+    """Состояние корзины покупателя для страницы каталога: сумма и количество по каждому товару."""
+    user_id = get_user_id(request)
+    store = CartStore.for_request(request, user_id)
+    items = store.load().items() if store else []
+    quantities = {}
+    for product_id, _, quantity in items:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return JsonResponse({
+        'status': 'success',
+        'total_price': format_price(price_cart(items).total),
+        'quantities': quantities,
+    })
 
-    products = Product.objects.all()
-    return render(request, 'shop/product_list.html', {'products': products})
 
+def product_page(request):
+    """
+    Страница каталога в JSON с курсором по id (?after=<id>&limit=<n>) и счётчиками фасетов.
 
-def cart(request):
-    cart_items = request.session.get('cart', {})
-    cart_product_ids = []
-    cart_size_ids = []
-
-    for key in cart_items.keys():
-        parts = key.split('-')
-        if len(parts) == 2:  # Проверяем, что ключ в формате "productID-sizeID"
-            product_id, size_id = parts
-            cart_product_ids.append(int(product_id))
-            cart_size_ids.append(int(size_id))
-
-    products = Product.objects.filter(id__in=cart_product_ids).prefetch_related('sizes')
-    sizes = {size.id: size for size in Size.objects.filter(id__in=cart_size_ids)}
-
-    total_price = 0
-    cart_display = []
-
-    for key, quantity in cart_items.items():
-        parts = key.split('-')
-        product_id = int(parts[0])
-        size_id = int(parts[1]) if len(parts) == 2 else None
-
-        product = next((p for p in products if p.id == product_id), None)
-        size = sizes.get(size_id) if size_id else None
-
-        if product:
-            total_price += product.price * quantity
-            cart_display.append({
-                'product': product,
-                'size': size.size if size else "Без размера",
-                'quantity': quantity,
-                'subtotal': product.price * quantity
-            })
+    Принимает те же фильтры, что и каталог: ?size=<id>&price=<ключ>.
+    """
+    after = request.GET.get('after')
+    limit = request.GET.get('limit', str(CATALOG_PAGE_SIZE))
+
+    if (after and not after.isdigit()) or not limit.isdigit():
+        return JsonResponse({'status': 'error', 'message': 'Некорректные параметры страницы'}, status=400)
+
+    after = int(after) if after else None
+    limit = min(max(int(limit), 1), CATALOG_MAX_PAGE_SIZE)
 
-    formatted_total_price = localize(total_price)
-    user_id = request.session.get('user_id')
+    size_ids, price_keys = parse_filters(request.GET)
+    catalog = get_catalog()
+    mask = catalog.filter_mask(size_ids, price_keys)
+    products, next_cursor = catalog.page(after=after, limit=limit, mask=mask)
+    return JsonResponse({
+        'status': 'success',
+        'results': [serialize_product(product) for product in products],
+        'next_cursor': next_cursor,
+        'facets': catalog.facet_counts(size_ids, price_keys),
+    })
+
+
+def product_search(request):
+    """Поиск товаров в JSON, по убыванию релевантности (?q=<запрос>&offset=<n>&limit=<n>)."""
+    query = request.GET.get('q', '')
+    offset = request.GET.get('offset', '0')
+    limit = request.GET.get('limit', str(SEARCH_PAGE_SIZE))
+
+    if not offset.isdigit() or not limit.isdigit():
+        return JsonResponse({'status': 'error', 'message': 'Некорректные параметры страницы'}, status=400)
+
+    offset = int(offset)
+    limit = min(max(int(limit), 1), SEARCH_MAX_PAGE_SIZE)
+
+    # Индекс поиска читается с реплики: отставание на секунды для поиска незаметно.
+    with replica_reads():
+        ids, has_next = search_product_ids(query, offset, limit)
+    catalog = get_catalog()
+    products = [product for product in map(catalog.get_product, ids) if product]
+    return JsonResponse({
+        'status': 'success',
+        'results': [serialize_product(product) for product in products],
+        'next_cursor': offset + limit if has_next else None,
+    })
+
+
+def cart(request):
+    user_id = get_user_id(request)
+    store = CartStore.for_request(request, user_id)
+    priced = price_cart(store.load().items() if store else [])
 
     return render(request, 'shop/cart.html', {
-        'cart_items': cart_display,
-        'total_price': formatted_total_price,
+        'cart_items': priced.lines,
+        'total_price': localize(priced.total),
         'user_id': user_id
     })
 
@@ -76,40 +183,20 @@ def add_to_cart(request):
             if not product_id.isdigit() or not size_id.isdigit():
                 return JsonResponse({'status': 'error', 'message': 'Некорректный ID товара или размера'}, status=400)
 
-            # Проверка существования товара и размера
-            product = Product.objects.filter(id=product_id).first()
-            size = Size.objects.filter(id=size_id).first()
+            # Проверка существования товара и доступности размера по снимку каталога
+            catalog = get_catalog()
+            try:
+                validate_item(int(product_id), int(size_id), catalog)
+            except CartError as e:
+                return JsonResponse({'status': 'error', 'message': e.message}, status=e.status)
 
-            if not product:
-                return JsonResponse({'status': 'error', 'message': 'Товар не найден'}, status=404)
-            if not size:
-                return JsonResponse({'status': 'error', 'message': 'Размер не найден'}, status=404)
+            store = CartStore.for_request(request, get_user_id(request, data), create=True)
+            cart = store.load()
+            cart.add(int(product_id), int(size_id), quantity)
+            store.save(cart)
 
-            # Проверка, что размер доступен для данного товара
-            if size not in product.sizes.all():
-                return JsonResponse({'status': 'error', 'message': 'Этот размер недоступен для данного товара'},
-                                    status=400)
-
-            cart = request.session.get('cart', {})
-            cart_key = f"{product_id}-{size_id}"  # Формат ключа: "productID-sizeID"
-
-            if cart_key in cart:
-                cart[cart_key] += quantity
-                if cart[cart_key] <= 0:
-                    del cart[cart_key]
-            else:
-                if quantity > 0:
-                    cart[cart_key] = quantity
-
-            request.session['cart'] = cart
-
-            # Пересчет общей стоимости корзины
-            total_price = sum(
-                Product.objects.get(id=int(pid.split('-')[0])).price * qty for pid, qty in cart.items()
-            )
-            formatted_total_price = f"{total_price:,}".replace(",", " ")
-
-            return JsonResponse({'status': 'success', 'total_price': formatted_total_price})
+            priced = price_cart(cart.items(), catalog)
+            return JsonResponse({'status': 'success', 'total_price': format_price(priced.total)})
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
@@ -119,52 +206,30 @@ def place_order(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'message': 'Неверный метод запроса.'})
 
-    user_id = request.POST.get('user_id') or request.session.get('user_id')
-    if not user_id or not str(user_id).isdigit():
+    user_id = get_user_id(request)
+    if not user_id:
         return JsonResponse({'success': False, 'message': 'Некорректный user_id.'})
 
-    user_id = int(user_id)
-    try:
-        user_profile = UserProfile.objects.get(user_id=user_id)
-        name = user_profile.name or request.POST.get('name')
-        phone_number = user_profile.phone_number or request.POST.get('phone_number')
-        address = user_profile.delivery_address or request.POST.get('address')
-    except UserProfile.DoesNotExist:
-        name = request.POST.get('name')
-        phone_number = request.POST.get('phone_number')
-        address = request.POST.get('address')
-
+    name, phone_number, address = order_contacts(
+        user_id, request.POST.get('name'), request.POST.get('phone_number'), request.POST.get('address'),
+    )
     if not all([name, phone_number, address]):
         return JsonResponse({'success': False, 'message': 'Не удалось получить полные данные пользователя.'})
 
-    cart_items = request.session.get('cart', {})
-    if not cart_items:
+    store = CartStore.for_request(request, user_id)
+    cart = store.load() if store else None
+    if not cart:
         return JsonResponse({'success': False, 'message': 'Ваша корзина пуста.'})
 
     comment = request.POST.get('comment', '')
 
     try:
-        order = Order.objects.create(
-            user_id=user_id,
-            name=name,
-            phone_number=phone_number,
-            address=address,
-            comment=comment,
-        )
-
-        for key, quantity in cart_items.items():
-            parts = key.split('-')
-            product_id = int(parts[0])
-            size_id = int(parts[1]) if len(parts) == 2 else None
-
-            product = get_object_or_404(Product, id=product_id)
-            size = get_object_or_404(Size, id=size_id) if size_id else None
-
-            OrderItem.objects.create(order=order, product=product, size=size, quantity=quantity)
-
-        order.calculate_total_price()
-        request.session['cart'] = {}
+        create_order(user_id, name, phone_number, address, comment, cart.items())
+        store.clear()
+        pin_to_primary(user_id)
         return JsonResponse({'success': True, 'message': 'Заказ успешно оформлен!'})
+    except CheckoutError as e:
+        return JsonResponse({'success': False, 'message': str(e)})
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Ошибка при оформлении заказа: {e}'})
 
@@ -180,22 +245,15 @@ def remove_from_cart(request):
             if not product_id.isdigit() or not size_id.isdigit():
                 return JsonResponse({'status': 'error', 'message': 'Некорректный ID товара или размера'}, status=400)
 
-            cart = request.session.get('cart', {})
-            cart_key = f"{product_id}-{size_id}"
-
-            if cart_key in cart:
-                del cart[cart_key]
-
-            request.session['cart'] = cart
-
-            total_price = sum(
-                Product.objects.get(id=int(pid.split('-')[0])).price * qty for pid, qty in cart.items()
-            )
-            formatted_total_price = f"{total_price:,}".replace(",", " ")
+            store = CartStore.for_request(request, get_user_id(request, data), create=True)
+            cart = store.load()
+            cart.remove(int(product_id), int(size_id))
+            store.save(cart)
 
+            priced = price_cart(cart.items())
             return JsonResponse({
                 'status': 'success',
-                'total_price': formatted_total_price,
+                'total_price': format_price(priced.total),
                 'cart_empty': len(cart) == 0
             })
         except Exception as e:
@@ -0,0 +1,71 @@
+"""
+Проверка Telegram Web App initData: API корзины и заказа доверяет только
+user_id, подписанному ботом, а не присланному клиентом параметру.
+
+Клиент передаёт строку ``Telegram.WebApp.initData`` в заголовке
+``Authorization: tma <initData>``.
+"""
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import parse_qsl
+
+from django.conf import settings
+from rest_framework import authentication, exceptions
+
+AUTH_SCHEME = 'tma'
+
+
+class InitDataError(ValueError):
+    pass
+
+
+def init_data_hash(data, bot_token):
+    """Подпись initData: HMAC-SHA256 от отсортированных пар ``key=value`` ключом, выведенным из токена бота."""
+    secret_key = hmac.new(b'WebAppData', bot_token.encode(), hashlib.sha256).digest()
+    check_string = '\n'.join(f'{key}={value}' for key, value in sorted(data.items()))
+    return hmac.new(secret_key, check_string.encode(), hashlib.sha256).hexdigest()
+
+
+def parse_init_data(init_data, bot_token, max_age):
+    """Проверяет подпись и срок initData и возвращает данные пользователя Telegram (dict с ``id``)."""
+    data = dict(parse_qsl(init_data, keep_blank_values=True))
+    received_hash = data.pop('hash', '')
+    if not received_hash or not hmac.compare_digest(received_hash, init_data_hash(data, bot_token)):
+        raise InitDataError('Неверная подпись initData.')
+
+    auth_date = data.get('auth_date', '')
+    if not auth_date.isdigit() or time.time() - int(auth_date) > max_age:
+        raise InitDataError('Срок действия initData истёк.')
+
+    try:
+        user = json.loads(data['user'])
+        int(user['id'])
+    except (KeyError, TypeError, ValueError):
+        raise InitDataError('В initData нет пользователя.')
+    return user
+
+
+class WebAppUser:
+    """Пользователь Telegram, подтверждённый подписью initData."""
+    is_authenticated = True
+
+    def __init__(self, data):
+        self.id = int(data['id'])
+        self.data = data
+
+
+class TelegramWebAppAuthentication(authentication.BaseAuthentication):
+    def authenticate(self, request):
+        scheme, _, init_data = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if scheme.lower() != AUTH_SCHEME:
+            return None
+        try:
+            user = parse_init_data(init_data, settings.TELEGRAM_BOT_TOKEN, settings.WEBAPP_INIT_DATA_MAX_AGE)
+        except InitDataError as e:
+            raise exceptions.AuthenticationFailed(str(e))
+        return WebAppUser(user), init_data
+
+    def authenticate_header(self, request):
+        return AUTH_SCHEME